@@ -0,0 +1,364 @@
+"""
+Benchmark every search backend on a labeled query set.
+
+Usage examples:
+    python scripts/benchmark_retrieval.py
+    python scripts/benchmark_retrieval.py --backend chunks --backend minsearch-docs -k 10
+    python scripts/benchmark_retrieval.py --output output/bench.json --repeats 5
+    python scripts/benchmark_retrieval.py --backend chunks --dims 256,128,64 --reduction pca
+
+Labels (input/retrieval_benchmark.json) name M2 identifiers, which are
+resolved to expected `source` files through the parsed docs, so the set
+survives re-chunking. Results are ranked by source file (first hit of each
+file counts), then scored with recall@k, MRR and nDCG@k. Build time, resident
+memory growth and query-latency percentiles are reported per backend. The
+JSON output is stable and sorted so runs can be diffed across commits.
+
+With `--dims`, each embedding backend is also scored at reduced dimensions
+(see `src/db/reduction.py`). The corpus is encoded once; every target
+dimension re-indexes the same vectors, so rows differ only in the reduction.
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import json
+import math
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from src.cli.search_common import SearchBackend  # noqa: E402
+from src.stats import percentile  # noqa: E402
+
+DEFAULT_QUERIES = ROOT_DIR / "input" / "retrieval_benchmark.json"
+DEFAULT_DOCS = ROOT_DIR / "data" / "m2_docs.jsonl"
+
+
+def all_backends() -> List[SearchBackend]:
+    from src.cli.query_chunk_index import backend as chunk_backend
+    from src.cli.query_index import backend as faiss_backend
+    from src.cli.query_ms_index import backend as ms_backend
+    from src.cli.query_shards import backend as shards_backend
+
+    return [chunk_backend, faiss_backend, ms_backend, shards_backend]
+
+
+def load_docs(path: Path) -> List[Dict]:
+    with path.open("r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def label_sources(label: str, docs: Sequence[Dict]) -> Set[str]:
+    """Source files documenting identifier `label`: exact key match, else the name leading a usage line."""
+    by_key = {doc["source"] for doc in docs if label in (doc.get("keys") or []) and doc.get("source")}
+    if by_key:
+        return by_key
+    leading = re.compile(rf"^\s*{re.escape(label)}\b", re.MULTILINE)
+    return {doc["source"] for doc in docs if doc.get("source") and leading.search(doc.get("usage") or "")}
+
+
+def resolve_labels(queries: Sequence[Dict], docs: Sequence[Dict]) -> List[Dict]:
+    """Attach `expected` source sets; queries with nothing resolvable get an empty set."""
+    resolved = []
+    for item in queries:
+        expected = set(item.get("sources") or [])
+        for label in item.get("relevant") or []:
+            expected |= label_sources(label, docs)
+        resolved.append({**item, "expected": sorted(expected)})
+    return resolved
+
+
+def ranked_sources(results: Sequence[Dict]) -> List[str]:
+    """
+    Result sources in rank order, keeping the first hit of each file. Shard hits
+    are package-qualified (`Macaulay2Doc/functions/x.m2`); the package prefix is
+    dropped so they compare with labels resolved through the parsed docs.
+    """
+    seen: List[str] = []
+    for doc in results:
+        source = doc.get("source")
+        package = doc.get("package")
+        if source and package and source.startswith(f"{package}/"):
+            source = source[len(package) + 1 :]
+        if source and source not in seen:
+            seen.append(source)
+    return seen
+
+
+def recall_at_k(ranked: Sequence[str], expected: Set[str], k: int) -> float:
+    return len(set(ranked[:k]) & expected) / len(expected) if expected else 0.0
+
+
+def reciprocal_rank(ranked: Sequence[str], expected: Set[str]) -> float:
+    for rank, source in enumerate(ranked, start=1):
+        if source in expected:
+            return 1.0 / rank
+    return 0.0
+
+
+def ndcg_at_k(ranked: Sequence[str], expected: Set[str], k: int) -> float:
+    dcg = sum(1.0 / math.log2(rank + 1) for rank, source in enumerate(ranked[:k], start=1) if source in expected)
+    ideal = sum(1.0 / math.log2(rank + 1) for rank in range(1, min(len(expected), k) + 1))
+    return dcg / ideal if ideal else 0.0
+
+
+def rss_mb() -> Optional[float]:
+    """Current resident set size (Linux /proc); None where unavailable."""
+    try:
+        with open("/proc/self/statm", "r", encoding="utf-8") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    import resource
+
+    return pages * resource.getpagesize() / 2**20
+
+
+def _index_dim(index: Any) -> Optional[int]:
+    """Dimension of the vectors a FAISS-backed index stores; None for text-only indexes."""
+    faiss_index = getattr(index, "index", None)
+    if not isinstance(getattr(faiss_index, "ntotal", None), int):
+        return None
+    from src.db.reduction import reduced_dim
+
+    return reduced_dim(faiss_index)
+
+
+def _index_bytes(index: Any) -> Optional[int]:
+    dim = _index_dim(index)
+    return index.index.ntotal * dim * 4 if dim is not None else None
+
+
+def _build(backend: SearchBackend, data_path: Optional[Path]) -> tuple[Any, Dict[str, Any]]:
+    """The backend's index plus the build-cost fields of its report row."""
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    index = backend.create_index(Path(data_path or backend.default_data_path), backend.default_model)
+    build_seconds = time.perf_counter() - started
+    rss_after = rss_mb()
+    return index, {
+        "build_seconds": build_seconds,
+        "rss_growth_mb": round(rss_after - rss_before, 1) if rss_before is not None and rss_after is not None else None,
+        "data_path": str(data_path or backend.default_data_path),
+    }
+
+
+def benchmark_backend(
+    backend: SearchBackend, queries: Sequence[Dict], *, k: int, repeats: int, data_path: Optional[Path] = None
+) -> Dict[str, Any]:
+    index, build = _build(backend, data_path)
+    return score_index(backend.name, index, queries, k=k, repeats=repeats, **build)
+
+
+def benchmark_dimensions(
+    backend: SearchBackend,
+    queries: Sequence[Dict],
+    dims: Sequence[int],
+    *,
+    method: str,
+    k: int,
+    repeats: int,
+    data_path: Optional[Path] = None,
+) -> List[Dict[str, Any]]:
+    """The backend at full dimension, then re-indexed at each of `dims` with `method`; vectors are encoded once."""
+    from src.db.reduction import build_index
+
+    index, build = _build(backend, data_path)
+    faiss_index = getattr(index, "index", None)
+    if not hasattr(faiss_index, "reconstruct_n"):
+        raise ValueError(f"{backend.name} has no embedding vectors to reduce")
+    if _index_dim(index) != faiss_index.d:
+        raise ValueError(f"{backend.name} is already reduced; benchmark a full-dimension index")
+    vectors = faiss_index.reconstruct_n(0, faiss_index.ntotal)
+
+    rows = [score_index(backend.name, index, queries, k=k, repeats=repeats, **build)]
+    for dim in dims:
+        started = time.perf_counter()
+        reduced = copy.copy(index)  # shares the encoder and docs
+        reduced.index = build_index(vectors, dim, method)
+        rows.append(
+            score_index(
+                f"{backend.name}/{method}{dim}",
+                reduced,
+                queries,
+                k=k,
+                repeats=repeats,
+                build_seconds=time.perf_counter() - started,
+                rss_growth_mb=None,
+                data_path=build["data_path"],
+            )
+        )
+    return rows
+
+
+def score_index(
+    name: str,
+    index: Any,
+    queries: Sequence[Dict],
+    *,
+    k: int,
+    repeats: int,
+    build_seconds: float,
+    rss_growth_mb: Optional[float],
+    data_path: str,
+) -> Dict[str, Any]:
+    scored = [q for q in queries if q["expected"]]
+    if scored:
+        index.search(scored[0]["query"], k=k)  # warm-up (lazy model init, caches)
+
+    latencies: List[float] = []
+    per_query = []
+    for item in scored:
+        results: List[Dict] = []
+        for _ in range(max(1, repeats)):
+            t0 = time.perf_counter()
+            results = index.search(item["query"], k=k)
+            latencies.append(1000 * (time.perf_counter() - t0))
+        ranked = ranked_sources(results)
+        expected = set(item["expected"])
+        per_query.append(
+            {
+                "query": item["query"],
+                "expected": item["expected"],
+                "ranked": ranked[:k],
+                f"recall@{k}": round(recall_at_k(ranked, expected, k), 4),
+                "rr": round(reciprocal_rank(ranked, expected), 4),
+                f"ndcg@{k}": round(ndcg_at_k(ranked, expected, k), 4),
+            }
+        )
+
+    def mean(key: str) -> float:
+        return round(sum(row[key] for row in per_query) / len(per_query), 4) if per_query else 0.0
+
+    ordered = sorted(latencies)
+    return {
+        "backend": name,
+        "index_class": type(index).__name__,
+        "data_path": data_path,
+        "build_seconds": round(build_seconds, 3),
+        "rss_growth_mb": rss_growth_mb,
+        "dim": _index_dim(index),
+        "index_bytes": _index_bytes(index),
+        "queries_scored": len(per_query),
+        f"recall@{k}": mean(f"recall@{k}"),
+        "mrr": mean("rr"),
+        f"ndcg@{k}": mean(f"ndcg@{k}"),
+        "latency_ms": {
+            "samples": len(ordered),
+            "p50": round(percentile(ordered, 50), 3),
+            "p95": round(percentile(ordered, 95), 3),
+            "p99": round(percentile(ordered, 99), 3),
+            "mean": round(sum(ordered) / len(ordered), 3) if ordered else 0.0,
+        },
+        "per_query": per_query,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True)
+    except OSError:
+        return None
+    return out.stdout.strip() or None
+
+
+def _print_table(report: Dict[str, Any], k: int) -> None:
+    header = f"{'backend':<20} {'class':<22} {'dim':>5} {'build s':>8} {'rss MB':>8} {f'R@{k}':>6} {'MRR':>6} {f'nDCG@{k}':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    print(header)
+    print("-" * len(header))
+    for row in report["backends"]:
+        if "error" in row:
+            print(f"{row['backend']:<20} error: {row['error']}")
+            continue
+        rss = f"{row['rss_growth_mb']:.1f}" if row["rss_growth_mb"] is not None else "n/a"
+        dim = row["dim"] if row["dim"] is not None else "-"
+        lat = row["latency_ms"]
+        print(
+            f"{row['backend']:<20} {row['index_class']:<22} {dim:>5} {row['build_seconds']:>8.2f} {rss:>8} "
+            f"{row[f'recall@{k}']:>6.3f} {row['mrr']:>6.3f} {row[f'ndcg@{k}']:>8.3f} "
+            f"{lat['p50']:>8.2f} {lat['p95']:>8.2f} {lat['p99']:>8.2f}"
+        )
+
+
+def main(argv: list[str] | None = None) -> None:
+    backends = {backend.name: backend for backend in all_backends()}
+    parser = argparse.ArgumentParser(description="Benchmark retrieval quality and latency for every search backend.")
+    parser.add_argument("--queries", type=Path, default=DEFAULT_QUERIES, help="Labeled query set (JSON).")
+    parser.add_argument("--docs", type=Path, default=DEFAULT_DOCS, help="Parsed docs used to resolve identifier labels.")
+    parser.add_argument(
+        "--backend",
+        action="append",
+        choices=sorted(backends),
+        help="Backend to run (repeatable; default: all).",
+    )
+    parser.add_argument("-k", type=int, default=5, help="Cutoff for recall/nDCG (default: 5).")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed searches per query (default: 3).")
+    parser.add_argument(
+        "--dims",
+        type=lambda value: [int(dim) for dim in value.split(",") if dim.strip()],
+        help="Also score embedding backends reduced to these dimensions, e.g. 256,128,64 (default backend: chunks).",
+    )
+    parser.add_argument(
+        "--reduction",
+        choices=["pca", "truncate"],
+        default="pca",
+        help="Reduction used with --dims (default: pca; truncate suits Matryoshka models).",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        help="JSON report path (default: output/retrieval_benchmark_<timestamp>.json).",
+    )
+    args = parser.parse_args(argv)
+
+    payload = json.loads(args.queries.read_text(encoding="utf-8"))
+    queries = resolve_labels(payload["queries"] if isinstance(payload, dict) else payload, load_docs(args.docs))
+    unresolved = [q["query"] for q in queries if not q["expected"]]
+    if unresolved:
+        print(f"{len(unresolved)} of {len(queries)} queries have no label in this corpus and are not scored.")
+
+    report: Dict[str, Any] = {
+        "commit": _git_commit(),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "k": args.k,
+        "repeats": args.repeats,
+        "queries": len(queries),
+        "unresolved_queries": unresolved,
+        "backends": [],
+    }
+    if args.dims:
+        report["dims"], report["reduction"] = args.dims, args.reduction
+    for name in args.backend or (["chunks"] if args.dims else sorted(backends)):
+        print(f"Benchmarking {name}...", flush=True)
+        try:
+            if args.dims:
+                report["backends"].extend(
+                    benchmark_dimensions(
+                        backends[name], queries, args.dims, method=args.reduction, k=args.k, repeats=args.repeats
+                    )
+                )
+            else:
+                report["backends"].append(benchmark_backend(backends[name], queries, k=args.k, repeats=args.repeats))
+        except Exception as exc:  # noqa: BLE001
+            report["backends"].append({"backend": name, "error": f"{type(exc).__name__}: {exc}"})
+
+    output = args.output or Path("output") / f"retrieval_benchmark_{datetime.now():%Y%m%d_%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, sort_keys=True, ensure_ascii=False) + "\n", encoding="utf-8")
+    print()
+    _print_table(report, args.k)
+    print(f"\nSaved report to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Cold-start import budgets for the CLI entry points.
+
+Usage examples:
+    python scripts/check_import_time.py
+    python scripts/check_import_time.py --module src.cli.query_ms_index --repeats 5
+    python scripts/check_import_time.py --scale 2 --json
+
+Each module is imported in a fresh `python -X importtime` interpreter and its
+cumulative import time (best of --repeats) is compared with its budget. Heavy
+packages (torch, sentence-transformers, faiss, pydantic-ai, sklearn) must stay
+behind the backends that use them, so importing one from a module that forbids
+it fails the check regardless of timing. Exits 1 on any regression.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = ("torch", "sentence_transformers", "faiss", "pydantic_ai", "sklearn", "transformers")
+
+
+@dataclass(frozen=True)
+class Budget:
+    ms: float
+    forbid: Tuple[str, ...] = HEAVY_MODULES
+
+
+# Roughly 3-5x the measured cold import on a laptop, so only real regressions trip them.
+BUDGETS: Dict[str, Budget] = {
+    "src.cli.query_ms_index": Budget(100),
+    "src.cli.query_shards": Budget(250),
+    "src.cli.query_index": Budget(250),
+    "src.cli.query_chunk_index": Budget(250),
+    "src.cli.query_daemon": Budget(100),
+    "src.cli.rag_query": Budget(100),
+    "src.cli.trace_summary": Budget(100),
+    "src.main": Budget(250),
+    "src.server": Budget(250),
+}
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+def parse_importtime(stderr: str) -> Dict[str, Tuple[int, int]]:
+    """Map module name -> (self us, cumulative us) from `-X importtime` output."""
+    modules: Dict[str, Tuple[int, int]] = {}
+    for line in stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            modules[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+    return modules
+
+
+def measure(module: str, python: str = sys.executable) -> Dict[str, Tuple[int, int]]:
+    """Import `module` in a fresh interpreter and return its parsed import timings."""
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    proc = subprocess.run(
+        [python, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        tail = proc.stderr.strip().splitlines()[-1:] or ["unknown error"]
+        raise RuntimeError(f"importing {module} failed: {tail[0]}")
+    return parse_importtime(proc.stderr)
+
+
+def forbidden_imports(modules: Dict[str, Tuple[int, int]], forbid: Sequence[str]) -> List[str]:
+    """Top-level heavy packages that were imported (e.g. `faiss` for `faiss.loader`)."""
+    loaded = {name.split(".")[0] for name in modules}
+    return sorted(loaded & set(forbid))
+
+
+def slowest(modules: Dict[str, Tuple[int, int]], n: int = 5) -> List[Tuple[str, float]]:
+    """Modules with the largest self time, in ms."""
+    ranked = sorted(modules.items(), key=lambda item: -item[1][0])[:n]
+    return [(name, round(self_us / 1000, 1)) for name, (self_us, _) in ranked]
+
+
+def check_module(module: str, budget: Budget, *, repeats: int = 3, scale: float = 1.0) -> Dict[str, Any]:
+    best: Optional[Dict[str, Tuple[int, int]]] = None
+    best_ms = float("inf")
+    for _ in range(max(1, repeats)):
+        modules = measure(module)
+        ms = modules.get(module, (0, 0))[1] / 1000
+        if ms < best_ms:
+            best, best_ms = modules, ms
+    assert best is not None
+    limit = budget.ms * scale
+    heavy = forbidden_imports(best, budget.forbid)
+    return {
+        "module": module,
+        "ms": round(best_ms, 1),
+        "budget_ms": round(limit, 1),
+        "forbidden": heavy,
+        "ok": best_ms <= limit and not heavy,
+        "slowest": slowest(best),
+    }
+
+
+def _print_table(rows: Sequence[Dict[str, Any]]) -> None:
+    header = f"{'module':<28} {'import ms':>10} {'budget ms':>10}  status"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        status = "ok" if row["ok"] else "OVER BUDGET" if not row["forbidden"] else "imports " + ", ".join(row["forbidden"])
+        print(f"{row['module']:<28} {row['ms']:>10.1f} {row['budget_ms']:>10.1f}  {status}")
+        if not row["ok"]:
+            print("    slowest: " + ", ".join(f"{name} {ms}ms" for name, ms in row["slowest"]))
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Fail when a CLI's cold import exceeds its budget.")
+    parser.add_argument(
+        "--module",
+        action="append",
+        choices=sorted(BUDGETS),
+        help="Module to check (repeatable; default: all).",
+    )
+    parser.add_argument("--repeats", type=int, default=3, help="Fresh imports per module; the fastest counts (default: 3).")
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=float(os.getenv("M2_IMPORT_BUDGET_SCALE", "1")),
+        help="Multiply every budget, e.g. on slow CI machines (default: M2_IMPORT_BUDGET_SCALE or 1).",
+    )
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    args = parser.parse_args(argv)
+
+    rows = [
+        check_module(name, BUDGETS[name], repeats=args.repeats, scale=args.scale) for name in args.module or sorted(BUDGETS)
+    ]
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        _print_table(rows)
+    return 0 if all(row["ok"] for row in rows) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
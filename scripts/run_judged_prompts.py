@@ -5,28 +5,40 @@ Usage examples:
     python scripts/run_judged_prompts.py --prompt "What is a monomial ideal?"
     python scripts/run_judged_prompts.py --input prompts.json
 
+    python scripts/run_judged_prompts.py --input prompts.json --concurrency 8 --rag-rpm 120
+    python scripts/run_judged_prompts.py --input prompts.json --concurrency 8 --offline
+    python scripts/run_judged_prompts.py --input prompts.json --output output/run.jsonl --resume
+    python scripts/run_judged_prompts.py --input prompts.json --retrieval-first
+
 When --input is supplied, it should point to a JSON file containing either a
 list of prompt strings or an object with a top-level "prompts" array. Results
-are written to output/judged_prompts_<timestamp>.jsonl.
+are written to output/judged_prompts_<timestamp>.jsonl, in prompt order even
+when prompts run concurrently.
 """
 
 from __future__ import annotations
 
 import argparse
+import asyncio
+import hashlib
 import json
 import os
 import sys
-from dataclasses import is_dataclass, asdict
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass, is_dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Iterable, List
+from typing import Any, Callable, Iterable, List
 
 ROOT_DIR = Path(__file__).resolve().parent.parent
 if str(ROOT_DIR) not in sys.path:
     sys.path.insert(0, str(ROOT_DIR))
 
-from src.agents.judge_agent import build_judge_prompt, judge_agent
+from src.async_utils import TokenBucket
 from src.logging_utils import log_event
+from src.resources import configure_threads, thread_plan_event
+from src.tools.state import tool_state
 
 
 def _ensure_api_key() -> None:
@@ -112,44 +124,92 @@ def _extract_tool_events(result) -> List[dict[str, Any]]:
 
 
 _rag_agent = None
+_judge_agent = None
+
+
+def get_judge_agent():
+    # Imported lazily like the RAG agent: building the OpenAI model needs a key, which --offline runs lack.
+    global _judge_agent
+    if _judge_agent is None:
+        from src.agents.judge_agent import judge_agent as _ja
 
+        _judge_agent = _ja
+    return _judge_agent
 
-def get_rag_agent(index_mode: str | None):
+
+def get_rag_agent():
     global _rag_agent
     if _rag_agent is None:
-        if index_mode:
-            os.environ["M2_INDEX_MODE"] = index_mode
-        else:
-            os.environ.setdefault("M2_INDEX_MODE", "chunks")
         from src.agents.rag_agent import rag_agent as _ra
 
         _rag_agent = _ra
     return _rag_agent
 
 
-def run_prompt(prompt: str, rag_agent) -> dict[str, Any]:
-    try:
-        rag_result = rag_agent.run_sync(prompt)
-    except Exception as exc:  # noqa: BLE001
-        error_msg = f"rag_agent error: {exc}"
-        log_event(
-            {"event": "judged_prompt_error", "query": prompt, "error": error_msg},
-            path=os.getenv("JUDGE_LOG_PATH", "logs/judge.jsonl"),
-        )
-        return {"query": prompt, "error": error_msg}
+def _log_path() -> str:
+    return os.getenv("JUDGE_LOG_PATH", "logs/judge.jsonl")
 
-    rag_output = rag_result.output
-    tool_events = _extract_tool_events(rag_result)
 
+def _rag_error(prompt: str, exc: Exception) -> dict[str, Any]:
+    error_msg = f"rag_agent error: {exc}"
+    log_event({"event": "judged_prompt_error", "query": prompt, "error": error_msg}, path=_log_path())
+    return {"query": prompt, "error": error_msg}
+
+
+def _judge_error(prompt: str, exc: Exception) -> dict[str, Any]:
+    error_msg = f"judge_agent error: {exc}"
+    log_event({"event": "judged_prompt_error", "query": prompt, "error": error_msg}, path=_log_path())
+    return {"query": prompt, "error": error_msg}
+
+
+def _judge_prompt_for(prompt: str, rag_result) -> tuple[str, List[dict[str, Any]]]:
+    from src.agents.judge_agent import build_judge_prompt
+
+    tool_events = _extract_tool_events(rag_result)
     judge_prompt = build_judge_prompt(
         question=prompt,
-        answer=rag_output.answer,
-        references=rag_output.references,
+        answer=rag_result.output.answer,
+        references=rag_result.output.references,
         tool_notes=[event["name"] for event in tool_events if event["type"] == "tool_request"],
     )
-    judge_result = judge_agent.run_sync(judge_prompt)
-    verdict = judge_result.output
+    return judge_prompt, tool_events
+
 
+@contextmanager
+def scoped_env(**values: str | None):
+    """Set environment variables (None leaves one alone) for one run and restore them afterwards."""
+    previous = {name: os.environ.get(name) for name in values}
+    os.environ.update({name: value for name, value in values.items() if value is not None})
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+@dataclass
+class RunOptions:
+    """Per-run settings threaded through the runners."""
+
+    # Search before the first model request instead of waiting for the tool call.
+    retrieval_first: bool = False
+    # AnswerCache consulted before, and filled after, each RAG run (--use-cache).
+    answer_cache: Any = None
+
+
+def _judged_record(
+    prompt: str,
+    rag_result,
+    tool_events: List[dict[str, Any]],
+    judge_result,
+    rag_seconds: float | None = None,
+    options: RunOptions | None = None,
+) -> dict[str, Any]:
+    rag_output = rag_result.output
+    verdict = judge_result.output
     result = {
         "query": prompt,
         "response": rag_output.answer,
@@ -157,20 +217,251 @@ def run_prompt(prompt: str, rag_agent) -> dict[str, Any]:
         "tool_events": tool_events,
         "judge": verdict.model_dump(),
     }
-    log_event(
-        {
-            "event": "judged_prompt",
-            "query": prompt,
-            "response": rag_output.answer,
-            "references": rag_output.references,
-            "tool_events": tool_events,
-            "judge": verdict.model_dump(),
-        },
-        path=os.getenv("JUDGE_LOG_PATH", "logs/judge.jsonl"),
-    )
+    if isinstance(rag_result, CachedRun):
+        result["cached"] = rag_result.match
+    else:
+        result["rag_mode"] = "retrieval_first" if options and options.retrieval_first else "tool_first"
+        result["rag_requests"] = rag_result.usage().requests
+        if rag_seconds is not None:
+            result["rag_latency_ms"] = round(1000 * rag_seconds, 1)
+    log_event({"event": "judged_prompt", **result}, path=_log_path())
     return result
 
 
+@dataclass
+class CachedRun:
+    """Stands in for an agent run result when the answer came from the answer cache."""
+
+    output: Any
+    match: str
+
+    def all_messages(self) -> list:
+        return []
+
+
+def _cached_run(prompt: str, cache) -> CachedRun | None:
+    if cache is None:
+        return None
+    cached = cache.get(prompt)
+    if cached is None:
+        return None
+    from src.agents.rag_agent import RagAgentResponse
+
+    output = RagAgentResponse(answer=cached["answer"], references=cached["references"])
+    return CachedRun(output=output, match=cached["match"])
+
+
+def _remember(prompt: str, rag_result, cache) -> None:
+    if cache is not None:
+        cache.put(prompt, rag_result.output.answer, rag_result.output.references)
+
+
+async def _off_loop(fn: Callable[..., Any], *args: Any) -> Any:
+    """Run a cache call on the search pool: it may load the encoder, encode or write the cache file."""
+    from src.tools.search import get_search_executor
+
+    return await asyncio.get_running_loop().run_in_executor(get_search_executor(), fn, *args)
+
+
+def _run_rag_sync(prompt: str, rag_agent, retrieval_first: bool):
+    if retrieval_first:
+        from src.agents.rag_agent import retrieval_first_history
+
+        return rag_agent.run_sync(None, message_history=retrieval_first_history(prompt))
+    return rag_agent.run_sync(prompt)
+
+
+async def _run_rag(prompt: str, rag_agent, retrieval_first: bool):
+    if retrieval_first:
+        from src.agents.rag_agent import retrieval_first_history_async
+
+        return await rag_agent.run(None, message_history=await retrieval_first_history_async(prompt))
+    return await rag_agent.run(prompt)
+
+
+def run_prompt(prompt: str, rag_agent, options: RunOptions | None = None) -> dict[str, Any]:
+    options = options or RunOptions()
+    rag_result = _cached_run(prompt, options.answer_cache)
+    rag_seconds = None
+    if rag_result is None:
+        started = time.perf_counter()
+        try:
+            with tool_state():
+                rag_result = _run_rag_sync(prompt, rag_agent, options.retrieval_first)
+        except Exception as exc:  # noqa: BLE001
+            return _rag_error(prompt, exc)
+        rag_seconds = time.perf_counter() - started
+        _remember(prompt, rag_result, options.answer_cache)
+
+    judge_prompt, tool_events = _judge_prompt_for(prompt, rag_result)
+    try:
+        judge_result = get_judge_agent().run_sync(judge_prompt)
+    except Exception as exc:  # noqa: BLE001
+        return _judge_error(prompt, exc)
+    return _judged_record(prompt, rag_result, tool_events, judge_result, rag_seconds, options)
+
+
+async def run_prompts_async(
+    prompts: List[str],
+    rag_agent,
+    *,
+    concurrency: int,
+    rag_bucket: TokenBucket | None = None,
+    judge_bucket: TokenBucket | None = None,
+    on_result: Callable[[int, dict[str, Any]], None] | None = None,
+    options: RunOptions | None = None,
+) -> List[dict[str, Any]]:
+    """
+    Run prompts with at most `concurrency` RAG runs and `concurrency` judge runs
+    in flight. The stages are pipelined: a prompt releases its RAG slot before
+    it is judged, so judging prompt i overlaps answering prompt i+1.
+    `on_result` is called in prompt order, whatever order runs finish in.
+    """
+    options = options or RunOptions()
+    cache = options.answer_cache
+    rag_slots = asyncio.Semaphore(concurrency)
+    judge_slots = asyncio.Semaphore(concurrency)
+
+    async def one(prompt: str) -> dict[str, Any]:
+        rag_result = await _off_loop(_cached_run, prompt, cache) if cache is not None else None
+        rag_seconds = None
+        if rag_result is None:
+            async with rag_slots:
+                if rag_bucket is not None:
+                    await rag_bucket.acquire()
+                started = time.perf_counter()
+                try:
+                    with tool_state():
+                        rag_result = await _run_rag(prompt, rag_agent, options.retrieval_first)
+                except Exception as exc:  # noqa: BLE001
+                    return _rag_error(prompt, exc)
+                rag_seconds = time.perf_counter() - started
+            if cache is not None:
+                await _off_loop(_remember, prompt, rag_result, cache)
+
+        judge_prompt, tool_events = _judge_prompt_for(prompt, rag_result)
+        async with judge_slots:
+            if judge_bucket is not None:
+                await judge_bucket.acquire()
+            try:
+                judge_result = await get_judge_agent().run(judge_prompt)
+            except Exception as exc:  # noqa: BLE001
+                return _judge_error(prompt, exc)
+        return _judged_record(prompt, rag_result, tool_events, judge_result, rag_seconds, options)
+
+    tasks = [asyncio.create_task(one(prompt)) for prompt in prompts]
+    results: List[dict[str, Any] | None] = [None] * len(tasks)
+    next_index = 0
+    for task in asyncio.as_completed(tasks):
+        await task
+        # Flush the contiguous prefix of finished prompts, keeping output deterministic.
+        while next_index < len(tasks) and tasks[next_index].done():
+            results[next_index] = tasks[next_index].result()
+            if on_result is not None:
+                on_result(next_index, results[next_index])
+            next_index += 1
+    return [result for result in results if result is not None]
+
+
+@contextmanager
+def offline_agents(rag_agent):
+    """Swap both agents onto deterministic TestModels so runs need no API key or network."""
+    from pydantic_ai.models.test import TestModel
+
+    rag_model = TestModel(
+        call_tools=["search_docs", "summarize_docs"],
+        custom_output_args={"answer": "(offline answer)", "references": ["[offline] synthetic reference"]},
+    )
+    judge_model = TestModel(
+        custom_output_args={"decision": "pass", "score": 1.0, "rationale": "offline run", "required_improvements": []}
+    )
+    with rag_agent.override(model=rag_model), get_judge_agent().override(model=judge_model):
+        yield
+
+
+def _model_name(agent) -> str:
+    model = getattr(agent, "model", None)
+    return getattr(model, "model_name", None) or str(model)
+
+
+def run_config(index_mode: str, rag_agent, offline: bool, retrieval_first: bool = False) -> dict[str, Any]:
+    """Settings that change an answer; a stored result is only reused when these match."""
+    config = {
+        "index_mode": index_mode,
+        "rag_model": "offline-test" if offline else _model_name(rag_agent),
+        "judge_model": "offline-test" if offline else _model_name(get_judge_agent()),
+    }
+    if retrieval_first:
+        # Only present when enabled so hashes of earlier tool-first runs stay valid.
+        config["retrieval_first"] = True
+    return config
+
+
+def config_hash(prompt: str, config: dict[str, Any]) -> str:
+    payload = json.dumps({"prompt": prompt, **config}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def load_results(path: Path) -> List[dict[str, Any]]:
+    """Read an output JSONL, skipping a torn trailing line left by a crash."""
+    records: List[dict[str, Any]] = []
+    if not path.exists():
+        return records
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def append_result(path: Path, result: dict[str, Any]) -> None:
+    """Append one record with a single O_APPEND write, then fsync so it survives a crash."""
+    data = (json.dumps(result, ensure_ascii=False) + "\n").encode("utf-8")
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, data)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def rewrite_results(path: Path, records: List[dict[str, Any]]) -> None:
+    """Atomically replace `path` with `records` (write a temp file, then rename over it)."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with tmp_path.open("w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def plan_resume(
+    prompts: List[str], output_path: Path, hashes: dict[str, str]
+) -> tuple[List[str], List[dict[str, Any]]]:
+    """
+    Split prompts into (still to run, already done). A stored record counts as
+    done when it has no error and its config_hash matches the current run.
+    """
+    done: dict[str, dict[str, Any]] = {}
+    for record in load_results(output_path):
+        prompt = record.get("query")
+        if prompt in hashes and "error" not in record and record.get("config_hash") == hashes[prompt]:
+            done[prompt] = record
+    kept = [done[prompt] for prompt in prompts if prompt in done]
+    return [prompt for prompt in prompts if prompt not in done], kept
+
+
+def _print_result(result: dict[str, Any]) -> None:
+    print(f"Prompt: {result['query']}")
+    if "error" in result:
+        print(f"  Error: {result['error']}")
+    else:
+        print(f"  Judge decision: {result['judge']['decision']} (score={result['judge']['score']:.2f})")
+
+
 def main(argv: list[str] | None = None) -> None:
     parser = argparse.ArgumentParser(description="Run prompts through RAG + judge agents.")
     parser.add_argument(
@@ -188,32 +479,123 @@ def main(argv: list[str] | None = None) -> None:
     )
     parser.add_argument(
         "--index-mode",
-        choices=["docs", "chunks"],
+        choices=["docs", "chunks", "shards"],
         help="Index mode for RAG agent (overrides M2_INDEX_MODE).",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Max RAG runs (and, separately, judge runs) in flight; >1 enables the asyncio pipeline (default: 1).",
+    )
+    parser.add_argument("--rag-rpm", type=float, help="Max RAG agent runs started per minute (default: unlimited).")
+    parser.add_argument("--judge-rpm", type=float, help="Max judge agent runs started per minute (default: unlimited).")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Reuse completed results in --output that match this run's config; rerun missing and errored prompts.",
+    )
+    parser.add_argument(
+        "--use-cache",
+        action="store_true",
+        help="Serve answers from the answer cache when possible (off by default so sweeps measure the agent).",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Use deterministic TestModels instead of OpenAI (no API key needed); useful to measure throughput.",
+    )
+    parser.add_argument(
+        "--retrieval-first",
+        action="store_true",
+        help="Run search_docs before the first model request; compare rag_latency_ms/rag_requests with a default run.",
+    )
+    parser.add_argument(
+        "--cpu-profile",
+        choices=["latency", "throughput"],
+        help="Thread budget profile for the encoder, FAISS and worker pools (default: M2_CPU_PROFILE, else throughput with --concurrency > 1).",
+    )
     args = parser.parse_args(argv)
 
-    _ensure_api_key()
-    prompts = _parse_prompts(args)
-    rag_agent = get_rag_agent(args.index_mode)
+    if args.resume and not args.output:
+        parser.error("--resume needs --output pointing at the interrupted run's file.")
+    if not args.offline:
+        _ensure_api_key()
+
+    index_mode = args.index_mode or os.getenv("M2_INDEX_MODE", "chunks")
+    # The search index reads its mode when it is built, and the agents construct their
+    # OpenAI models at import (offline runs override them before any call). Both
+    # settings only apply for this run, so callers and later runs see their own.
+    offline_key = (os.getenv("OPENAI_API_KEY") or "offline") if args.offline else None
+    with scoped_env(M2_INDEX_MODE=index_mode, OPENAI_API_KEY=offline_key):
+        _run(args, index_mode)
+
+
+def _run(args: argparse.Namespace, index_mode: str) -> None:
+    all_prompts = _parse_prompts(args)
+    configure_threads(args.cpu_profile, default="throughput" if args.concurrency > 1 else "latency")
+    log_event(thread_plan_event(entry="run_judged_prompts", concurrency=args.concurrency), path=_log_path())
+    rag_agent = get_rag_agent()
 
     output_path = Path(args.output) if args.output else Path("output") / f"judged_prompts_{datetime.now():%Y%m%d_%H%M%S}.jsonl"
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
-    summary: list[dict[str, Any]] = []
-    for prompt in prompts:
-        print(f"Running prompt: {prompt}")
-        result = run_prompt(prompt, rag_agent)
-        summary.append(result)
-        with output_path.open("a", encoding="utf-8") as f:
-            f.write(json.dumps(result, ensure_ascii=False) + "\n")
-        if "error" in result:
-            print(f"  Error: {result['error']}")
+    config = run_config(index_mode, rag_agent, args.offline, args.retrieval_first)
+    options = RunOptions(retrieval_first=args.retrieval_first)
+    if args.use_cache:
+        from src.answer_cache import answer_cache_for
+
+        options.answer_cache = answer_cache_for(rag_agent, model_name=config["rag_model"])
+    hashes = {prompt: config_hash(prompt, config) for prompt in all_prompts}
+    prompts, kept = all_prompts, []
+    if args.resume:
+        prompts, kept = plan_resume(all_prompts, output_path, hashes)
+        # Drop errored, stale and torn records so the file holds one good row per prompt.
+        rewrite_results(output_path, kept)
+        print(f"Resuming: {len(kept)} prompts already done, {len(prompts)} to run.")
+
+    def write_result(result: dict[str, Any]) -> None:
+        result["config_hash"] = hashes[result["query"]]
+        append_result(output_path, result)
+        _print_result(result)
+
+    started = time.perf_counter()
+    with offline_agents(rag_agent) if args.offline else nullcontext():
+        if args.concurrency > 1:
+            summary = asyncio.run(
+                run_prompts_async(
+                    prompts,
+                    rag_agent,
+                    concurrency=args.concurrency,
+                    rag_bucket=TokenBucket.per_minute(args.rag_rpm),
+                    judge_bucket=TokenBucket.per_minute(args.judge_rpm),
+                    on_result=lambda _i, result: write_result(result),
+                    options=options,
+                )
+            )
         else:
-            print(f"  Judge decision: {result['judge']['decision']} (score={result['judge']['score']:.2f})")
+            summary = []
+            for prompt in prompts:
+                print(f"Running prompt: {prompt}")
+                result = run_prompt(prompt, rag_agent, options)
+                summary.append(result)
+                write_result(result)
+    if options.answer_cache is not None:
+        options.answer_cache.flush()
+    elapsed = time.perf_counter() - started
+    if kept:
+        # Reruns were appended after the kept rows as they finished; put the file back in prompt order.
+        order = {prompt: index for index, prompt in reversed(list(enumerate(all_prompts)))}
+        rewrite_results(output_path, sorted(kept + summary, key=lambda record: order[record["query"]]))
 
     print(f"\nSaved {len(summary)} results to {output_path}")
-
+    print(f"Throughput: {len(summary) / max(elapsed, 1e-9):.2f} prompts/s ({elapsed:.1f}s, concurrency={args.concurrency})")
+    timed = [result for result in summary if "rag_latency_ms" in result]
+    if timed:
+        mean_ms = sum(result["rag_latency_ms"] for result in timed) / len(timed)
+        mean_requests = sum(result["rag_requests"] for result in timed) / len(timed)
+        mode = "retrieval-first" if args.retrieval_first else "tool-first"
+        print(f"RAG ({mode}): mean latency {mean_ms:.0f} ms, mean model requests {mean_requests:.2f}")
 
 if __name__ == "__main__":
     main()
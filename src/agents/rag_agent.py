@@ -1,12 +1,17 @@
+import os
+from typing import Dict, List, Optional
+
 from pydantic import BaseModel, Field
-from pydantic_ai import Agent, RunContext
+from pydantic_ai import Agent, RunContext, Tool
 from pydantic_ai.exceptions import ModelRetry
-from pydantic_ai.messages import ToolCallPart
+from pydantic_ai.messages import ModelMessage, ModelRequest, ModelResponse, ToolCallPart, ToolReturnPart, UserPromptPart
 from pydantic_ai.models.openai import OpenAIResponsesModel
 
-from src.tools.search import get_last_search_results, search_docs
+from src.tools.search import SearchDocsArgs, get_last_search_results, search_docs, search_docs_async
+from src.tools.state import get_tool_state
 from src.tools.summarize import summarize_docs
-from src.tools.wiki import search_wikipedia
+from src.tools.wiki import search_wikipedia_async
+from src.tracing import traced
 
 # instructions = """
 # You are a Macaulay2 documentation assistant.
@@ -60,25 +65,88 @@ class RagAgentResponse(BaseModel):
 
 rag_agent = Agent(
     model=OpenAIResponsesModel("gpt-4o-mini"),
-    tools=[search_docs, summarize_docs, search_wikipedia],
+    tools=[
+        Tool(search_docs_async, name="search_docs"),
+        summarize_docs,
+        Tool(search_wikipedia_async, name="search_wikipedia"),
+    ],
     instructions=instructions,
     output_type=RagAgentResponse,
 )
 
 
+# Repair missing references / Wikipedia URLs from the run's tool results instead of
+# spending another model request on ModelRetry. Set M2_VALIDATOR_REPAIR=0 to always retry.
+VALIDATOR_REPAIR = os.getenv("M2_VALIDATOR_REPAIR", "1").lower() not in {"0", "false", "no"}
+REPAIR_MAX_REFERENCES = 3
+
+RETRIEVAL_FIRST_K = 5
+RETRIEVAL_FIRST_CALL_ID = "retrieval-first"
+
+
+def _retrieval_first_messages(query: str, k: int, results: List[Dict]) -> List[ModelMessage]:
+    return [
+        ModelRequest(parts=[UserPromptPart(query)]),
+        ModelResponse(
+            parts=[ToolCallPart("search_docs", {"query": query, "k": k}, tool_call_id=RETRIEVAL_FIRST_CALL_ID)]
+        ),
+        ModelRequest(parts=[ToolReturnPart("search_docs", results, tool_call_id=RETRIEVAL_FIRST_CALL_ID)]),
+    ]
+
+
+def retrieval_first_history(query: str, k: int = RETRIEVAL_FIRST_K) -> List[ModelMessage]:
+    """
+    Run `search_docs` on the raw query up front and return a message history
+    holding the user prompt plus a synthetic search_docs call/return, so the
+    model's first request can already answer (or refine the search):
+
+        with tool_state():
+            history = retrieval_first_history(query)
+            result = rag_agent.run_sync(None, message_history=history)
+
+    This saves the round trip the model would spend emitting the predictable
+    first search_docs call. Call it inside the run's tool_state() scope so
+    ensure_references_present sees the results.
+    """
+    return _retrieval_first_messages(query, k, search_docs(SearchDocsArgs(query=query, k=k)))
+
+
+async def retrieval_first_history_async(query: str, k: int = RETRIEVAL_FIRST_K) -> List[ModelMessage]:
+    """Async variant of `retrieval_first_history` (searches on the bounded search pool)."""
+    return _retrieval_first_messages(query, k, await search_docs_async(SearchDocsArgs(query=query, k=k)))
+
+
 @rag_agent.output_validator
+@traced("validator.ensure_search_called")
 def ensure_search_called(ctx: RunContext[None], data: RagAgentResponse) -> RagAgentResponse:
-    """Ensure at least one search_docs tool call occurred before final answer."""
+    """Ensure at least one search_docs tool call occurred before final answer (a retrieval-first call counts)."""
     for message in ctx.messages:
         parts = getattr(message, "parts", None) or []
         for part in parts:
             if isinstance(part, ToolCallPart) and part.tool_name == "search_docs":
                 return data
 
+    get_tool_state().validator_stats["retries"] += 1
     raise ModelRetry("You must call `search_docs` before responding.")
 
 
+def _reference_for(doc: Dict) -> Optional[str]:
+    source = doc.get("source") or ""
+    note = (doc.get("headline") or "").strip()
+    if not source:
+        return None
+    return f"[{source}] {note}" if note else f"[{source}]"
+
+
+def _wikipedia_url_for(ref: str, wiki_results: List[Dict]) -> Optional[str]:
+    """URL of the Wikipedia result whose title `ref` names, else None (so the model is asked instead)."""
+    lowered = ref.lower()
+    named = [item for item in wiki_results if item.get("url") and item.get("title") and item["title"].lower() in lowered]
+    return max(named, key=lambda item: len(item["title"]))["url"] if named else None
+
+
 @rag_agent.output_validator
+@traced("validator.ensure_references_present")
 def ensure_references_present(_, data: RagAgentResponse) -> RagAgentResponse:
     """Ensure references are included when search results were found."""
     search_results = get_last_search_results()
@@ -102,18 +170,32 @@ def ensure_references_present(_, data: RagAgentResponse) -> RagAgentResponse:
             cleaned_refs.append(norm)
 
     if search_results and not cleaned_refs:
-        raise ModelRetry("You must include references sourced from the search results.")
+        repaired = [ref for ref in map(_reference_for, search_results[:REPAIR_MAX_REFERENCES]) if ref]
+        if not (VALIDATOR_REPAIR and repaired):
+            get_tool_state().validator_stats["retries"] += 1
+            raise ModelRetry("You must include references sourced from the search results.")
+        get_tool_state().validator_stats["repairs"] += 1
+        cleaned_refs = repaired
     data.references = cleaned_refs
     return data
 
 
 @rag_agent.output_validator
+@traced("validator.ensure_wikipedia_urls")
 def ensure_wikipedia_urls(_, data: RagAgentResponse) -> RagAgentResponse:
     """Ensure any Wikipedia reference includes a URL."""
+    state = get_tool_state()
     updated_refs: list[str] = []
+    repaired = False
     for ref in data.references:
         if "wikipedia" in ref.lower() and "http" not in ref.lower():
-            raise ModelRetry("Include the full Wikipedia URL in the reference entry.")
+            url = _wikipedia_url_for(ref, state.wiki_results) if VALIDATOR_REPAIR else None
+            if url is None:
+                state.validator_stats["retries"] += 1
+                raise ModelRetry("Include the full Wikipedia URL in the reference entry.")
+            ref, repaired = f"{ref} ({url})", True
         updated_refs.append(ref)
+    if repaired:
+        state.validator_stats["repairs"] += 1
     data.references = updated_refs
     return data
@@ -0,0 +1,188 @@
+"""
+Answer cache consulted before running the RAG agent.
+
+Exact hits match a normalized query hash; near hits match on cosine similarity
+of query embeddings (from the search index's encoder) above a threshold.
+Entries are namespaced by index snapshot and LLM model so a rebuilt index or a
+model swap never serves stale answers, and are bounded by TTL and LRU size.
+The namespace comes from the index files' stats, and the encoder is loaded
+only for a near-hit lookup, so an exact hit never loads the index.
+
+Hits only update recency in memory; the file is rewritten by `put` (at most
+once per `save_interval` seconds) and by `flush`. The cache is thread-safe so
+async callers can run lookups and inserts on a worker pool.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_CACHE_PATH = Path(__file__).resolve().parent.parent / "data" / "answer_cache.json"
+
+EncodeFn = Callable[[str], Optional[np.ndarray]]
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return " ".join(re.sub(r"[^\w\s^*+-]", " ", query.lower()).split())
+
+
+class AnswerCache:
+    def __init__(
+        self,
+        namespace: str,
+        path: Path | None = None,
+        *,
+        ttl: float | None = None,
+        max_entries: int = 512,
+        threshold: float = 0.92,
+        encode: Optional[EncodeFn] = None,
+        save_interval: float = 5.0,
+    ):
+        self.namespace = namespace
+        self.path = Path(path or os.getenv("M2_ANSWER_CACHE", DEFAULT_CACHE_PATH))
+        self.ttl = ttl if ttl is not None else float(os.getenv("M2_ANSWER_CACHE_TTL", 7 * 24 * 3600))
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.encode = encode
+        self.save_interval = save_interval
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._saved_at = float("-inf")
+        self._load()
+
+    def _key(self, query: str) -> str:
+        digest = hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()[:24]
+        return f"{self.namespace}:{digest}"
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            rows = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return  # a corrupt cache is just a cold cache
+        # Least recently used first, so eviction order survives across processes.
+        for row in sorted(rows, key=lambda row: row.get("last_used", row["created"])):
+            self._entries[row["key"]] = row
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps(list(self._entries.values()), ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+    def flush(self) -> None:
+        """Write pending inserts and recency updates to disk."""
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def _expire(self) -> None:
+        cutoff = time.time() - self.ttl
+        for key in [k for k, row in self._entries.items() if row["created"] < cutoff]:
+            del self._entries[key]
+
+    def _embed(self, query: str) -> Optional[np.ndarray]:
+        raw = self.encode(query) if self.encode is not None else None
+        if raw is None:
+            return None
+        vec = np.asarray(raw, dtype="float32").ravel()
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm else None
+
+    def get(self, query: str) -> Optional[Dict[str, Any]]:
+        """Return {"answer", "references", "match", "similarity"} for a hit, else None."""
+        key = self._key(query)
+        with self._lock:
+            self._expire()
+            row = self._entries.get(key)
+            candidates = [] if row is not None else [
+                (other_key, other["embedding"])
+                for other_key, other in self._entries.items()
+                if other["namespace"] == self.namespace and other.get("embedding")
+            ]
+        match, similarity = "exact", 1.0
+
+        if row is None:
+            if not candidates:
+                return None  # nothing to compare against; skip encoding the query
+            vec = self._embed(query)  # outside the lock: this may load the encoder
+            if vec is None:
+                return None
+            best_key, best_sim = None, self.threshold
+            for other_key, embedding in candidates:
+                sim = float(np.dot(vec, np.asarray(embedding, dtype="float32")))
+                if sim >= best_sim:
+                    best_key, best_sim = other_key, sim
+            if best_key is None:
+                return None
+            key, match, similarity = best_key, "near", best_sim
+
+        with self._lock:
+            row = self._entries.get(key)
+            if row is None:
+                return None  # evicted while the query was encoded
+            # Recency is persisted by the next put or flush, not on every hit.
+            row["last_used"] = time.time()
+            self._entries.move_to_end(key)
+            self._dirty = True
+        return {"answer": row["answer"], "references": row["references"], "match": match, "similarity": similarity}
+
+    def put(self, query: str, answer: str, references: List[str]) -> None:
+        vec = self._embed(query)
+        key = self._key(query)
+        with self._lock:
+            self._insert(key, query, answer, references, vec)
+            if time.monotonic() - self._saved_at >= self.save_interval:
+                self._save()
+
+    def _insert(self, key: str, query: str, answer: str, references: List[str], vec: Optional[np.ndarray]) -> None:
+        self._expire()
+        now = time.time()
+        self._entries[key] = {
+            "key": key,
+            "namespace": self.namespace,
+            "query": query,
+            "answer": answer,
+            "references": list(references or []),
+            "created": now,
+            "last_used": now,
+            "embedding": vec.round(5).tolist() if vec is not None else None,
+        }
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self._dirty = True
+
+
+def answer_cache_for(rag_agent, model_name: str | None = None) -> AnswerCache:
+    """
+    Build the cache for the configured search index and `rag_agent`'s model
+    without loading the index. Near hits use the index's SentenceTransformer
+    encoder, loaded on the first near-hit lookup or `put`.
+    """
+    from src.tools import search
+
+    if model_name is None:
+        model = getattr(rag_agent, "model", None)
+        model_name = getattr(model, "model_name", None) or str(model)
+
+    def encode(query: str) -> Optional[np.ndarray]:
+        encoder = getattr(search.get_index(), "model", None)
+        return encoder.encode(query, normalize_embeddings=True) if encoder is not None else None
+
+    return AnswerCache(f"{search.configured_snapshot_version()}:{model_name}", encode=encode)
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+
+from src.stats import percentile
+
+
+class LoopLagMonitor:
+    """
+    Measure event-loop lag: a background task sleeps for `interval` seconds and
+    records how late it wakes up. Sustained lag means something is running CPU
+    work or blocking I/O on the loop thread.
+
+        async with LoopLagMonitor() as lag:
+            ...
+        lag.summary()  # {"samples": ..., "mean_ms": ..., "p95_ms": ..., "max_ms": ...}
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+        self._sleep_started = 0.0
+
+    async def _run(self) -> None:
+        while True:
+            self._sleep_started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - self._sleep_started - self.interval))
+
+    async def __aenter__(self) -> "LoopLagMonitor":
+        self._task = asyncio.create_task(self._run())
+        await asyncio.sleep(0)  # let the sampler start before the body runs
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        if self._task is not None:
+            # Count a wake-up that is already overdue when the body finishes.
+            overdue = time.perf_counter() - self._sleep_started - self.interval
+            if overdue > 0:
+                self.samples.append(overdue)
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def summary(self) -> Dict[str, float]:
+        if not self.samples:
+            return {"samples": 0, "mean_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        ordered = sorted(self.samples)
+        return {
+            "samples": len(ordered),
+            "mean_ms": round(1000 * sum(ordered) / len(ordered), 3),
+            "p95_ms": round(1000 * percentile(ordered, 95), 3),
+            "max_ms": round(1000 * ordered[-1], 3),
+        }
+
+
+class TokenBucket:
+    """
+    Async token-bucket rate limiter: refills at `rate` tokens per second and
+    allows bursts of up to `capacity` tokens (default: one second's worth).
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+    @classmethod
+    def per_minute(cls, per_minute: Optional[float]) -> Optional["TokenBucket"]:
+        """Build a bucket from a per-minute budget; None or <= 0 means unlimited."""
+        if not per_minute or per_minute <= 0:
+            return None
+        return cls(per_minute / 60.0)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
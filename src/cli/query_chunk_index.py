@@ -44,6 +44,7 @@ backend = SearchBackend(
     default_model=DEFAULT_MODEL,
     create_index=lambda data_path, model: create_index(data_path, model_name=model or DEFAULT_MODEL),
     print_results=print_results,
+    name="chunks",
 )
 
 
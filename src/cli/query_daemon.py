@@ -0,0 +1,368 @@
+"""
+Resident query daemon for the search CLIs.
+
+Holds one index per (backend, data path, model) in memory and answers
+newline-delimited JSON requests on a Unix socket, so repeated CLI queries skip
+loading the encoder and re-encoding the corpus:
+
+    uv run python -m src.cli.query_daemon            # start (foreground)
+    uv run python -m src.cli.query_index "ideal"     # served by the daemon
+    uv run python -m src.cli.query_daemon --status
+    uv run python -m src.cli.query_daemon --stop
+
+Requests are `{"op": "search", "backend", "data_path", "model", "query", "k"}`,
+`{"op": "search_batch", ..., "queries": [...]}`, `{"op": "status"}` or
+`{"op": "stop"}`; replies are `{"results": [...]}`, a status dict, or
+`{"error": "..."}`. The daemon exits after M2_QUERY_DAEMON_IDLE seconds
+(default 900) without a request. A resident index is rebuilt when its data
+file or meta.json changes.
+
+The socket lives in $XDG_RUNTIME_DIR, else in a private (0700) per-user
+directory under the temp dir, and clients only connect to a socket owned by
+their own user.
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+import json
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.cli.search_common import SearchBackend, SupportsSearch, search_many
+from src.db.index_store import data_version
+
+# CLI module per backend name; imported on first use so the daemon only loads what it serves.
+BACKEND_MODULES = {
+    "chunks": "src.cli.query_chunk_index",
+    "shards": "src.cli.query_shards",
+    "faiss-docs": "src.cli.query_index",
+    "minsearch-docs": "src.cli.query_ms_index",
+}
+
+IDLE_TIMEOUT = float(os.getenv("M2_QUERY_DAEMON_IDLE", "900"))
+CONNECT_TIMEOUT = 0.5
+# Max wait for a reply; covers building an index on its first query. On timeout the CLI searches in-process.
+REPLY_TIMEOUT = float(os.getenv("M2_QUERY_DAEMON_TIMEOUT", "120"))
+
+
+def default_socket_path() -> Path:
+    env = os.getenv("M2_QUERY_SOCKET")
+    if env:
+        return Path(env)
+    runtime_dir = os.getenv("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return Path(runtime_dir) / "m2rag-query.sock"
+    return Path(tempfile.gettempdir()) / f"m2rag-{os.getuid()}" / "query.sock"
+
+
+def _owned_by_user(path: Path) -> bool:
+    try:
+        return os.lstat(path).st_uid == os.getuid()
+    except OSError:
+        return False
+
+
+def _private_dir(path: Path) -> None:
+    """Create `path` as a 0700 directory, refusing one another user owns or others can write to."""
+    path.mkdir(mode=0o700, parents=True, exist_ok=True)
+    st = os.lstat(path)
+    if st.st_uid != os.getuid() or st.st_mode & 0o022:
+        raise RuntimeError(f"refusing to put the query socket in {path}: not a private directory of this user")
+
+
+def _send(sock: socket.socket, payload: Dict[str, Any]) -> None:
+    sock.sendall(json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8") + b"\n")
+
+
+def _recv(rfile) -> Optional[Dict[str, Any]]:
+    line = rfile.readline()
+    return json.loads(line) if line else None
+
+
+def _options(request: Dict[str, Any]) -> Dict[str, Any]:
+    return {"packages": request["packages"]} if request.get("packages") else {}
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        daemon: QueryDaemon = self.server.daemon  # type: ignore[attr-defined]
+        while True:
+            try:
+                request = _recv(self.rfile)
+            except json.JSONDecodeError as exc:
+                _send(self.connection, {"error": f"invalid request: {exc}"})
+                return
+            if request is None:
+                return
+            _send(self.connection, daemon.dispatch(request))
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class QueryDaemon:
+    """Serve searches from resident indexes until stopped or idle for `idle_timeout` seconds."""
+
+    def __init__(
+        self,
+        socket_path: Optional[Path] = None,
+        idle_timeout: float = IDLE_TIMEOUT,
+        backends: Optional[Dict[str, SearchBackend]] = None,
+    ):
+        self.socket_path = Path(socket_path or default_socket_path())
+        self.idle_timeout = idle_timeout
+        self.started = time.time()
+        self.last_request = time.monotonic()
+        self.requests = 0
+        self.in_flight = 0
+        self._backends = dict(backends or {})
+        # key -> (data_version of the data path when built, index)
+        self._indexes: Dict[Tuple[str, str, Optional[str]], Tuple[List[str], SupportsSearch]] = {}
+        self._build_locks: Dict[Tuple[str, str, Optional[str]], threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._server: Optional[_Server] = None
+        self._stopped = threading.Event()
+
+    def backend(self, name: str) -> SearchBackend:
+        if name not in self._backends:
+            if name not in BACKEND_MODULES:
+                raise ValueError(f"unknown backend {name!r}")
+            self._backends[name] = importlib.import_module(BACKEND_MODULES[name]).backend
+        return self._backends[name]
+
+    def index_for(self, name: str, data_path: str, model: Optional[str]) -> SupportsSearch:
+        """The resident index for this key, (re)built when missing or when its data changed on disk."""
+        key = (name, data_path, model)
+        version = data_version(Path(data_path))
+        with self._lock:
+            cached = self._indexes.get(key)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+        # Build outside the registry lock so other backends keep answering meanwhile.
+        with build_lock:
+            cached = self._indexes.get(key)
+            if cached is None or cached[0] != version:
+                index = self.backend(name).create_index(Path(data_path), model)
+                with self._lock:
+                    self._indexes[key] = (version, index)
+                if cached is not None and hasattr(cached[1], "close"):
+                    cached[1].close()  # e.g. a sharded index's fan-out pool
+                cached = (version, index)
+        return cached[1]
+
+    def dispatch(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.last_request = time.monotonic()
+        try:
+            return self._dispatch(request)
+        finally:
+            # Idle time counts from when a request finishes, so a long first build is not "idle".
+            with self._lock:
+                self.in_flight -= 1
+                self.last_request = time.monotonic()
+
+    def _dispatch(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        op = request.get("op", "search")
+        try:
+            if op == "search":
+                index = self.index_for(request["backend"], request["data_path"], request.get("model"))
+                return {"results": index.search(request["query"], k=int(request.get("k", 5)), **_options(request))}
+            if op == "search_batch":
+                index = self.index_for(request["backend"], request["data_path"], request.get("model"))
+                return {"results": search_many(index, request["queries"], int(request.get("k", 5)), **_options(request))}
+            if op == "status":
+                return self.status()
+            if op == "stop":
+                threading.Thread(target=self.stop, daemon=True).start()
+                return {"stopping": True}
+            return {"error": f"unknown op {op!r}"}
+        except Exception as exc:  # noqa: BLE001 - reported to the client, which falls back
+            return {"error": f"{type(exc).__name__}: {exc}"}
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            loaded = [{"backend": name, "data_path": path, "model": model} for name, path, model in self._indexes]
+            requests, in_flight, last_request = self.requests, self.in_flight, self.last_request
+        return {
+            "pid": os.getpid(),
+            "uptime_s": round(time.time() - self.started, 1),
+            "idle_s": round(time.monotonic() - last_request, 1),
+            "idle_timeout_s": self.idle_timeout,
+            "requests": requests,
+            "in_flight": in_flight,
+            "indexes": loaded,
+        }
+
+    def bind(self) -> None:
+        """Listen on the socket, replacing a stale socket file left by a dead daemon."""
+        if self.socket_path.exists():
+            if ping(self.socket_path):
+                raise RuntimeError(f"a query daemon is already listening on {self.socket_path}")
+            self.socket_path.unlink()
+        if self.socket_path == default_socket_path() and not os.getenv("XDG_RUNTIME_DIR"):
+            _private_dir(self.socket_path.parent)
+        else:
+            self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        self._server = _Server(str(self.socket_path), _Handler)
+        self._server.daemon = self  # type: ignore[attr-defined]
+        os.chmod(self.socket_path, 0o600)
+
+    def serve_forever(self) -> None:
+        if self._server is None:
+            self.bind()
+        assert self._server is not None
+        watchdog = threading.Thread(target=self._watch_idle, name="m2-query-daemon-idle", daemon=True)
+        watchdog.start()
+        try:
+            self._server.serve_forever(poll_interval=0.2)
+        finally:
+            self._server.server_close()
+            self.socket_path.unlink(missing_ok=True)
+            self._stopped.set()
+
+    def _watch_idle(self) -> None:
+        while not self._stopped.wait(min(1.0, max(0.05, self.idle_timeout / 4))):
+            with self._lock:
+                idle = self.in_flight == 0 and time.monotonic() - self.last_request >= self.idle_timeout
+            if self.idle_timeout > 0 and idle:
+                self.stop()
+                return
+
+    def stop(self) -> None:
+        if self._server is not None and not self._stopped.is_set():
+            self._stopped.set()
+            self._server.shutdown()
+
+
+def request(payload: Dict[str, Any], socket_path: Optional[Path] = None, timeout: float = REPLY_TIMEOUT) -> Optional[Dict[str, Any]]:
+    """
+    Send one request; None when no daemon is listening, the socket belongs to
+    another user, or no reply arrives within `timeout` seconds.
+    """
+    path = Path(socket_path or default_socket_path())
+    if not _owned_by_user(path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(CONNECT_TIMEOUT)
+        sock.connect(str(path))
+    except OSError:
+        sock.close()
+        return None
+    with sock:
+        sock.settimeout(timeout)
+        try:
+            _send(sock, payload)
+            with sock.makefile("rb") as rfile:
+                return _recv(rfile)
+        except (OSError, json.JSONDecodeError):  # socket.timeout is an OSError
+            return None
+
+
+def ping(socket_path: Optional[Path] = None) -> bool:
+    return request({"op": "status"}, socket_path, timeout=CONNECT_TIMEOUT) is not None
+
+
+def _search_request(op: str, backend: SearchBackend, data_path: Path, model: Optional[str], k: int, **fields: Any) -> Dict[str, Any]:
+    return {"op": op, "backend": backend.name, "data_path": str(Path(data_path).resolve()), "model": model, "k": k, **fields}
+
+
+def search_via_daemon(
+    backend: SearchBackend,
+    data_path: Path,
+    model: Optional[str],
+    query: str,
+    k: int,
+    socket_path: Optional[Path] = None,
+    **options: Any,
+) -> Optional[List[dict]]:
+    """Results from the daemon, or None if none is running or it failed (callers then search in-process)."""
+    reply = request(_search_request("search", backend, data_path, model, k, query=query, **options), socket_path)
+    if reply is None or "results" not in reply:
+        return None
+    return reply["results"]
+
+
+def search_batch_via_daemon(
+    backend: SearchBackend,
+    data_path: Path,
+    model: Optional[str],
+    queries: List[str],
+    k: int,
+    socket_path: Optional[Path] = None,
+    **options: Any,
+) -> Optional[List[List[dict]]]:
+    """Batch form of `search_via_daemon`: one result list per query, or None."""
+    reply = request(_search_request("search_batch", backend, data_path, model, k, queries=queries, **options), socket_path)
+    if reply is None or "results" not in reply:
+        return None
+    return reply["results"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Keep search indexes resident and serve the query CLIs over a Unix socket.")
+    parser.add_argument("--socket", type=Path, default=None, help="Socket path (default: M2_QUERY_SOCKET, else $XDG_RUNTIME_DIR or a private per-user temp dir).")
+    parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=IDLE_TIMEOUT,
+        help="Exit after this many seconds without a request; 0 disables (default: M2_QUERY_DAEMON_IDLE or 900).",
+    )
+    parser.add_argument(
+        "--preload",
+        action="append",
+        choices=sorted(BACKEND_MODULES),
+        help="Build this backend's default index at startup (repeatable).",
+    )
+    parser.add_argument("--status", action="store_true", help="Print the running daemon's status and exit.")
+    parser.add_argument("--stop", action="store_true", help="Stop the running daemon and exit.")
+    parser.add_argument(
+        "--cpu-profile",
+        choices=["latency", "throughput"],
+        help="Thread budget profile for the encoder, FAISS and worker pools (default: M2_CPU_PROFILE or latency).",
+    )
+    args = parser.parse_args()
+
+    if args.status or args.stop:
+        reply = request({"op": "stop" if args.stop else "status"}, args.socket, timeout=CONNECT_TIMEOUT)
+        if reply is None:
+            raise SystemExit("No query daemon is running.")
+        print(json.dumps(reply, indent=2))
+        return
+
+    from src.logging_utils import log_event
+    from src.resources import configure_threads, thread_plan_event
+
+    configure_threads(args.cpu_profile, default="latency")
+    log_event(thread_plan_event(entry="query_daemon"))
+    daemon = QueryDaemon(args.socket, idle_timeout=args.idle_timeout)
+    try:
+        daemon.bind()
+    except RuntimeError as exc:
+        raise SystemExit(str(exc))
+    for name in args.preload or []:
+        backend = daemon.backend(name)
+        daemon.index_for(name, str(Path(backend.default_data_path).resolve()), backend.default_model)
+    print(f"Query daemon listening on {daemon.socket_path} (idle timeout {args.idle_timeout:g}s)", flush=True)
+    log_event({"event": "query_daemon_started", "socket": str(daemon.socket_path), "pid": os.getpid()})
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    log_event({"event": "query_daemon_stopped", "requests": daemon.requests})
+
+
+if __name__ == "__main__":
+    main()
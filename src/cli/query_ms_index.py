@@ -42,6 +42,7 @@ backend = SearchBackend(
     default_model=None,
     create_index=lambda data_path, _model: create_index(data_path),
     print_results=print_results,
+    name="minsearch-docs",
 )
 
 
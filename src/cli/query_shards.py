@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from src.cli.query_chunk_index import print_results
+from src.cli.search_common import SearchBackend, run_search_cli
+from src.db.chunk_index import DEFAULT_MODEL
+from src.db.shards import SHARDS_DIR, create_index
+
+
+backend = SearchBackend(
+    description="Search the per-package index shards (optionally restricted with --package).",
+    default_data_path=SHARDS_DIR,
+    default_model=DEFAULT_MODEL,
+    create_index=lambda data_path, model: create_index(data_path, model_name=model or DEFAULT_MODEL),
+    print_results=print_results,
+    name="shards",
+    package_filter=True,
+)
+
+
+def main() -> None:
+    run_search_cli(backend)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,8 @@ from __future__ import annotations
 import argparse
 import os
 
+from src.resources import configure_threads, thread_plan_event
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Run the RAG agent against a query.")
@@ -14,10 +16,25 @@ def parse_args() -> argparse.Namespace:
     )
     parser.add_argument(
         "--index-mode",
-        choices=["docs", "chunks"],
+        choices=["docs", "chunks", "shards"],
         default="chunks",
         help="Index mode to use (default: chunks).",
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Bypass the answer cache and always run the agent.",
+    )
+    parser.add_argument(
+        "--retrieval-first",
+        action="store_true",
+        help="Search the query before the first model request instead of waiting for the model to call search_docs.",
+    )
+    parser.add_argument(
+        "--cpu-profile",
+        choices=["latency", "throughput"],
+        help="Thread budget profile for the encoder, FAISS and worker pools (default: M2_CPU_PROFILE or latency).",
+    )
     return parser.parse_args()
 
 
@@ -30,19 +47,42 @@ def main() -> None:
         # If dotenv isn't available for some reason, continue; env may already be set.
         pass
 
-    # Silence tokenizers fork warning from huggingface.
-    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
-
     args = parse_args()
+    # Also silences the huggingface tokenizers fork warning (TOKENIZERS_PARALLELISM=false).
+    configure_threads(args.cpu_profile, default="latency")
     query = args.query or "how do you define a monomial ideal in macaulay 2?"
 
     # Set index mode for this run
     os.environ["M2_INDEX_MODE"] = args.index_mode
 
     # Import after environment is loaded so API keys are available.
-    from src.agents.rag_agent import rag_agent
+    from src.agents.rag_agent import rag_agent, retrieval_first_history
+    from src.answer_cache import answer_cache_for
+    from src.logging_utils import log_event
+    from src.tools.state import tool_state
+    from src.tracing import trace_run
+
+    log_event(thread_plan_event(entry="rag_query"))
+
+    cache = None if args.no_cache else answer_cache_for(rag_agent)
+    cached = cache.get(query) if cache else None
+    if cached:
+        print(cached["answer"])
+        if cached["references"]:
+            print("\nReferences:")
+            for ref in cached["references"]:
+                print(f"- {ref}")
+        print(f"\n(served from answer cache: {cached['match']} match)")
+        cache.flush()  # persist the hit's recency
+        return
 
-    result = rag_agent.run_sync(query)
+    with tool_state(), trace_run():
+        if args.retrieval_first:
+            result = rag_agent.run_sync(None, message_history=retrieval_first_history(query))
+        else:
+            result = rag_agent.run_sync(query)
+    if cache:
+        cache.put(query, result.output.answer, result.output.references)
     print(result.output.answer)
     if result.output.references:
         print("\nReferences:")
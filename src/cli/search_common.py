@@ -1,9 +1,14 @@
 from __future__ import annotations
 
 import argparse
+import itertools
+import json
+import os
+import sys
+import time
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Callable, Protocol
+from typing import Callable, Iterator, List, Protocol, Sequence, Tuple
 
 
 class SupportsSearch(Protocol):
@@ -24,6 +29,10 @@ class SearchBackend:
     default_model: str | None
     create_index: IndexFactory
     print_results: PrintResults
+    # Short identifier used by benchmarks and reports.
+    name: str = ""
+    # Index search accepts `packages=` (adds a repeatable --package flag).
+    package_filter: bool = False
 
 
 def add_common_args(parser: argparse.ArgumentParser, backend: SearchBackend) -> argparse.ArgumentParser:
@@ -41,25 +50,167 @@ def add_common_args(parser: argparse.ArgumentParser, backend: SearchBackend) ->
             default=backend.default_model,
             help=f"SentenceTransformer model name (default: {backend.default_model})",
         )
+    if backend.package_filter:
+        parser.add_argument(
+            "--package",
+            action="append",
+            help="Only search this package (repeatable; default: all loaded packages).",
+        )
     parser.add_argument(
         "--show-scores",
         action="store_true",
         help="Include similarity scores in output.",
     )
+    parser.add_argument(
+        "--queries-file",
+        type=Path,
+        help="Run every query in this file (JSONL with a `query` field, or one query per line; `-` reads stdin).",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=64,
+        help="Queries encoded and searched together in batch mode (default: 64).",
+    )
+    parser.add_argument(
+        "--output-format",
+        choices=["text", "jsonl"],
+        default="text",
+        help="Print results as text, or as one JSON object per query (default: text).",
+    )
+    parser.add_argument(
+        "--no-daemon",
+        action="store_true",
+        help="Search in-process even if a query daemon (src.cli.query_daemon) is running.",
+    )
     return parser
 
 
-def run_search_cli(backend: SearchBackend) -> None:
+def search_many(index: SupportsSearch, queries: Sequence[str], k: int, **options) -> List[list[dict]]:
+    """
+    One result list per query, using the index's vectorized `search_batch` when
+    it has one. `options` (e.g. `packages`) are passed through to the index.
+    """
+    search_batch = getattr(index, "search_batch", None)
+    if callable(search_batch):
+        return search_batch(list(queries), k=k, **options)
+    return [index.search(query, k=k, **options) for query in queries]
+
+
+def search_options(args: argparse.Namespace) -> dict:
+    """Extra search keyword arguments selected on the command line."""
+    packages = getattr(args, "package", None)
+    return {"packages": packages} if packages else {}
+
+
+def read_queries(path: Path) -> Iterator[Tuple[str, str]]:
+    """
+    Yield (id, query) pairs. Lines may be JSON objects with `query` (and an
+    optional `id`), JSON strings, or plain text; ids default to the line number.
+    """
+    f = sys.stdin if str(path) == "-" else Path(path).open("r", encoding="utf-8")
+    try:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError:
+                item = line
+            if isinstance(item, dict):
+                query, query_id = str(item.get("query") or ""), item.get("id", line_no)
+            else:
+                query, query_id = item if isinstance(item, str) else line, line_no
+            if query:
+                yield str(query_id), query
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def _use_daemon(args: argparse.Namespace) -> bool:
+    return not args.no_daemon and os.getenv("M2_QUERY_DAEMON", "1").lower() not in {"0", "false", "no"}
+
+
+def _emit(backend: SearchBackend, args: argparse.Namespace, query_id: str | None, query: str, results: list[dict]) -> None:
+    if args.output_format == "jsonl":
+        record = {"query": query, "results": results}
+        if query_id is not None:
+            record = {"id": query_id, **record}
+        print(json.dumps(record, ensure_ascii=False, default=str), flush=True)
+        return
+    if query_id is not None:
+        print(f"[{query_id}] {query}")
+    backend.print_results(results, args.show_scores)
+    if query_id is not None:
+        print(flush=True)
+
+
+def run_batch(backend: SearchBackend, args: argparse.Namespace) -> None:
+    """Search every query in `args.queries_file` against one index, streaming results per batch."""
+    model_arg = getattr(args, "model", None)
+    index = None
+    via_daemon = _use_daemon(args)
+    load_seconds = 0.0
+
+    def search(queries: List[str]) -> List[list[dict]]:
+        nonlocal index, via_daemon, load_seconds
+        if via_daemon:
+            from src.cli.query_daemon import search_batch_via_daemon
+
+            results = search_batch_via_daemon(backend, args.data_path, model_arg, queries, args.k, **search_options(args))
+            if results is not None:
+                return results
+            via_daemon = False
+        if index is None:
+            load_started = time.perf_counter()
+            index = backend.create_index(args.data_path, model_arg)
+            load_seconds = time.perf_counter() - load_started
+        return search_many(index, queries, args.k, **search_options(args))
+
+    started = time.perf_counter()
+    count = batches = 0
+    pairs = read_queries(args.queries_file)
+    while True:
+        batch = list(itertools.islice(pairs, max(1, args.batch_size)))
+        if not batch:
+            break
+        for (query_id, query), results in zip(batch, search([query for _, query in batch])):
+            _emit(backend, args, query_id, query, results)
+        count += len(batch)
+        batches += 1
+
+    elapsed = time.perf_counter() - started
+    search_seconds = max(elapsed - load_seconds, 1e-9)
+    source = "query daemon" if via_daemon else f"index load {load_seconds:.2f}s"
+    print(
+        f"Searched {count} queries in {batches} batches: {elapsed:.2f}s total, {source}, "
+        f"{count / search_seconds:.1f} queries/s",
+        file=sys.stderr,
+    )
+
+
+def run_search_cli(backend: SearchBackend, argv: list[str] | None = None) -> None:
     parser = argparse.ArgumentParser(description=backend.description)
     parser = add_common_args(parser, backend)
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
+    if args.queries_file:
+        run_batch(backend, args)
+        return
     if not args.query:
         raise SystemExit(
             "Please provide a query (see --help for usage), e.g. `uv run python -m src.cli.query_index \"hilbert polynomial\"`"
         )
 
     model_arg = getattr(args, "model", None)
-    index = backend.create_index(args.data_path, model_arg)
-    results = index.search(args.query, k=args.k)
-    backend.print_results(results, args.show_scores)
+    results = None
+    if _use_daemon(args):
+        from src.cli.query_daemon import search_via_daemon
+
+        results = search_via_daemon(backend, args.data_path, model_arg, args.query, args.k, **search_options(args))
+    if results is None:
+        index = backend.create_index(args.data_path, model_arg)
+        results = index.search(args.query, k=args.k, **search_options(args))
+    _emit(backend, args, None, args.query, results)
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from src.stats import percentile
+
+
+def load_spans(path: Path, run_id: Optional[str] = None) -> Iterable[dict]:
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("event") != "span":
+                continue
+            if run_id and record.get("run_id") != run_id:
+                continue
+            yield record
+
+
+def summarize_spans(spans: Iterable[dict]) -> Dict[str, Dict[str, float]]:
+    """Per span name: count, errors, and mean/p50/p95/p99/max duration in ms."""
+    durations: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    for record in spans:
+        durations[record["name"]].append(float(record["duration_ms"]))
+        if record.get("status", "ok") != "ok":
+            errors[record["name"]] += 1
+
+    summary: Dict[str, Dict[str, float]] = {}
+    for name, values in durations.items():
+        ordered = sorted(values)
+        summary[name] = {
+            "count": len(ordered),
+            "errors": errors[name],
+            "mean_ms": round(sum(ordered) / len(ordered), 3),
+            "p50_ms": percentile(ordered, 50),
+            "p95_ms": percentile(ordered, 95),
+            "p99_ms": percentile(ordered, 99),
+            "max_ms": ordered[-1],
+        }
+    return dict(sorted(summary.items(), key=lambda item: -item[1]["p95_ms"]))
+
+
+def format_table(summary: Dict[str, Dict[str, float]]) -> str:
+    header = f"{'stage':<40} {'count':>6} {'err':>4} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'max ms':>10}"
+    lines = [header, "-" * len(header)]
+    for name, row in summary.items():
+        lines.append(
+            f"{name:<40} {row['count']:>6} {row['errors']:>4} "
+            f"{row['p50_ms']:>10.1f} {row['p95_ms']:>10.1f} {row['p99_ms']:>10.1f} {row['max_ms']:>10.1f}"
+        )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Summarize per-stage span latencies from the run log.")
+    parser.add_argument(
+        "--log",
+        type=Path,
+        default=Path(os.getenv("LOG_PATH", "logs/runs.jsonl")),
+        help="Run log to read (default: LOG_PATH or logs/runs.jsonl).",
+    )
+    parser.add_argument("--run-id", help="Only include spans from this run.")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON.")
+    args = parser.parse_args()
+
+    if not args.log.exists():
+        parser.error(f"{args.log} not found")
+    summary = summarize_spans(load_spans(args.log, args.run_id))
+    if not summary:
+        print("No spans found.")
+        return
+    print(json.dumps(summary, indent=2) if args.json else format_table(summary))
+
+
+if __name__ == "__main__":
+    main()
@@ -7,19 +7,15 @@ from typing import Dict, Iterable, List, TYPE_CHECKING
 
 import numpy as np
 
-try:
-    from sentence_transformers import SentenceTransformer
-except ModuleNotFoundError:  # pragma: no cover - optional dep
-    SentenceTransformer = None  # type: ignore[assignment]
-
-try:  # optional; fallback to text search if missing
-    import faiss  # type: ignore
-except ModuleNotFoundError:  # pragma: no cover - only hit in constrained envs
-    faiss = None  # type: ignore[assignment]
-
-from minsearch import Index
+from src.db import index_store
+from src.db.optional_deps import embeddings_available, load_faiss, load_sentence_transformer
+from src.db.reduction import reduced_dim
+from src.db.stream_build import IndexSink, StreamStats, stream_embed
+from src.m2rag.ingest.dedupe import attach_duplicate_sources, load_duplicates
+from src.tracing import span, traced
 
 CHUNK_DATA_PATH = Path(__file__).resolve().parent.parent.parent / "data" / "m2_chunks.jsonl"
+CHUNK_INDEX_DIR = Path(__file__).resolve().parent.parent.parent / "data" / "m2_chunk_index"
 DEFAULT_MODEL = os.getenv("M2_EMB_MODEL", "all-MiniLM-L6-v2")
 
 if TYPE_CHECKING:  # type hints only
@@ -28,6 +24,10 @@ if TYPE_CHECKING:  # type hints only
 
 def load_chunks(path: Path = CHUNK_DATA_PATH) -> List[Dict]:
     docs: List[Dict] = []
+    if index_store.is_index_dir(path):
+        docs = [doc for doc in index_store.read_docs(path) if "text" in doc]
+        attach_duplicate_sources(docs, load_duplicates(path))
+        return docs
     if not path.exists():
         raise FileNotFoundError(
             f"{path} not found. Generate chunked data with `uv run python src/scripts/chunk_docs.py`."
@@ -38,6 +38,7 @@ def load_chunks(path: Path = CHUNK_DATA_PATH) -> List[Dict]:
             if "text" not in doc:
                 continue
             docs.append(doc)
+    attach_duplicate_sources(docs, load_duplicates(path))
     return docs
 
 
@@ -48,6 +49,7 @@ class ChunkEmbeddedIndex:
     """
 
     def __init__(self, data_path: Path = CHUNK_DATA_PATH, model_name: str = DEFAULT_MODEL):
+        SentenceTransformer = load_sentence_transformer()
         if SentenceTransformer is None:  # pragma: no cover - guarded by create_index
             raise RuntimeError("sentence-transformers is unavailable; cannot build chunk embeddings.")
         self.data_path = Path(data_path)
@@ -66,27 +68,133 @@ class ChunkEmbeddedIndex:
             normalize_embeddings=True,
         ).astype("float32")
 
+        faiss = load_faiss()
         if faiss is None:  # pragma: no cover - guarded by create_index
             raise RuntimeError("faiss is unavailable; cannot build embedding index.")
 
         self.index = faiss.IndexFlatIP(embeddings.shape[1])
         self.index.add(embeddings)
 
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(
+            texts,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+        ).astype("float32")
+
+    @classmethod
+    def from_stream(
+        cls,
+        chunks: Iterable[Dict],
+        model_name: str = DEFAULT_MODEL,
+        store_dir: Path | None = None,
+        *,
+        batch_size: int = 64,
+        queue_size: int = 8,
+        workers: int = 2,
+        meta: Dict | None = None,
+        dim: int | None = None,
+        reduction: str = "pca",
+        model=None,
+    ) -> "ChunkEmbeddedIndex":
+        """
+        Build the index straight from a chunk iterator (e.g. `build_chunks`) without
+        an intermediate jsonl. With `store_dir`, docs are appended to the on-disk
+        doc store as their vectors land and the FAISS index is saved at the end,
+        with `meta` merged into its meta.json. `dim` reduces the stored vectors
+        with `reduction` ("pca" or "truncate"; see `src.db.reduction`). Pass an
+        already loaded `model` to share one encoder across builds.
+        """
+        if not embeddings_available():  # pragma: no cover - optional deps
+            raise RuntimeError("sentence-transformers and faiss are required for a streaming build.")
+        self = cls.__new__(cls)
+        self.data_path = Path(store_dir) if store_dir else None
+        self.model_name = model_name
+        self.model = model if model is not None else load_sentence_transformer()(model_name)
+
+        writer = index_store.DocStoreWriter(store_dir) if store_dir else None
+        sink = IndexSink(writer=writer, dim=dim, reduction=reduction)
+        self.stream_stats: StreamStats = stream_embed(
+            chunks,
+            self._encode,
+            sink,
+            batch_size=batch_size,
+            queue_size=queue_size,
+            workers=workers,
+        )
+        self.docs = sink.docs
+        self.index = sink.index
+        if writer is not None:
+            if self.index is not None:
+                meta = {"source_dim": self.index.d, "dim": reduced_dim(self.index), **(meta or {})}
+                if meta["dim"] < meta["source_dim"]:
+                    meta["reduction"] = reduction
+            writer.close(self.index, {"model": model_name, **(meta or {})})
+        return self
+
+    @classmethod
+    def load(cls, store_dir: Path, model_name: str | None = None, model=None) -> "ChunkEmbeddedIndex":
+        """
+        Load a store written by `from_stream`; queries use the model it was built
+        with. Pass an already loaded `model` to share one encoder across stores.
+        """
+        if not embeddings_available():  # pragma: no cover - guarded by create_index
+            raise RuntimeError("sentence-transformers and faiss are required to load an embedding index.")
+        index, docs, meta = index_store.load_index(store_dir)
+        attach_duplicate_sources(docs, load_duplicates(store_dir))
+        self = cls.__new__(cls)
+        self.data_path = Path(store_dir)
+        self.model_name = meta.get("model") or model_name or DEFAULT_MODEL
+        self.model = model if model is not None else load_sentence_transformer()(self.model_name)
+        self.docs = docs
+        self.index = index if docs else None
+        return self
+
+    @traced("index.search")
     def search(self, query: str, k: int = 5) -> List[Dict]:
         if not query or not self.docs or self.index is None:
             return []
 
-        query_vec = self.model.encode(
-            [query],
-            convert_to_numpy=True,
-            normalize_embeddings=True,
-        ).astype("float32")
+        with span("encode"):
+            query_vec = self.model.encode(
+                [query],
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+            ).astype("float32")
+
+        return self.search_vectors(query_vec, k)[0]
+
+    @traced("index.search_batch")
+    def search_batch(self, queries: List[str], k: int = 5) -> List[List[Dict]]:
+        """Encode all queries in one pass and search them with a single FAISS call."""
+        results: List[List[Dict]] = [[] for _ in queries]
+        positions = [i for i, query in enumerate(queries) if query]
+        if not positions or not self.docs or self.index is None:
+            return results
+
+        with span("encode", batch=len(positions)):
+            query_vecs = self.model.encode(
+                [queries[i] for i in positions],
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+            ).astype("float32")
+
+        for i, hits in zip(positions, self.search_vectors(query_vecs, k)):
+            results[i] = hits
+        return results
 
+    def search_vectors(self, query_vecs: np.ndarray, k: int = 5) -> List[List[Dict]]:
+        """Top-k docs for already encoded (normalized, float32) query vectors, one list per row."""
+        if not self.docs or self.index is None:
+            return [[] for _ in range(len(query_vecs))]
         k = min(k, len(self.docs))
-        scores, indices = self.index.search(query_vec, k)
+        with span("faiss.search", k=k, batch=len(query_vecs)):
+            scores, indices = self.index.search(query_vecs, k)
+        return [self._hits(indices[row], scores[row]) for row in range(len(query_vecs))]
 
+    def _hits(self, indices, scores) -> List[Dict]:
         results: List[Dict] = []
-        for idx, score in zip(indices[0], scores[0]):
+        for idx, score in zip(indices, scores):
             if idx == -1:
                 continue
             doc = dict(self.docs[idx])
@@ -107,11 +215,14 @@ class ChunkMinsearchIndex:
             self.index = None
             return
 
+        from minsearch import Index  # deferred: pulls in sklearn/scipy
+
         text_fields = ["text"]
         keyword_fields = ["source"]
         self.index = Index(text_fields=text_fields, keyword_fields=keyword_fields)
         self.index.fit(self.docs)
 
+    @traced("index.search")
     def search(self, query: str, k: int = 5) -> List[Dict]:
         if not query or not self.index:
             return []
@@ -122,6 +233,12 @@ def create_index(
     data_path: Path = CHUNK_DATA_PATH,
     model_name: str = DEFAULT_MODEL,
 ) -> ChunkEmbeddedIndex | ChunkMinsearchIndex:
-    if faiss is None or SentenceTransformer is None:
+    """
+    `data_path` may be a chunk jsonl or an index directory written by a streaming
+    build; the latter is loaded without re-encoding the corpus.
+    """
+    if not embeddings_available():
         return ChunkMinsearchIndex(data_path=data_path)
+    if index_store.is_index_dir(data_path):
+        return ChunkEmbeddedIndex.load(data_path, model_name=model_name)
     return ChunkEmbeddedIndex(data_path=data_path, model_name=model_name)
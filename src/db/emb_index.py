@@ -5,17 +5,8 @@ import os
 from pathlib import Path
 from typing import Iterable, List, Dict, TYPE_CHECKING
 
-import numpy as np
-
-try:
-    from sentence_transformers import SentenceTransformer
-except ModuleNotFoundError:  # pragma: no cover - optional dep
-    SentenceTransformer = None  # type: ignore[assignment]
-
-try:  # faiss is optional; fall back to the lightweight index if missing.
-    import faiss  # type: ignore
-except ModuleNotFoundError:  # pragma: no cover - only hit in constrained envs
-    faiss = None  # type: ignore[assignment]
+from src.db.optional_deps import embeddings_available, load_faiss, load_sentence_transformer
+from src.tracing import span, traced
 
 DEFAULT_MODEL = os.getenv("M2_EMB_MODEL", "all-MiniLM-L6-v2")
 DATA_PATH = Path(__file__).resolve().parent.parent.parent / "data" / "m2_docs.jsonl"
@@ -69,6 +60,7 @@ class EmbeddedDocIndex:
     def __init__(self, data_path: Path = DATA_PATH, model_name: str = DEFAULT_MODEL):
         self.data_path = Path(data_path)
         self.model_name = model_name
+        SentenceTransformer = load_sentence_transformer()
         if SentenceTransformer is None:  # pragma: no cover - create_index guards
             raise RuntimeError("sentence-transformers is unavailable; cannot build embeddings.")
 
@@ -86,27 +78,55 @@ class EmbeddedDocIndex:
             normalize_embeddings=True,
         ).astype("float32")
 
+        faiss = load_faiss()
         if faiss is None:  # pragma: no cover - create_index protects against this
             raise RuntimeError("faiss is unavailable; cannot build embedding index.")
 
         self.index = faiss.IndexFlatIP(embeddings.shape[1])
         self.index.add(embeddings)
 
+    @traced("index.search")
     def search(self, query: str, k: int = 5) -> List[Dict]:
         if not query or not self.docs or self.index is None:
             return []
 
-        query_vec = self.model.encode(
-            [query],
-            convert_to_numpy=True,
-            normalize_embeddings=True,
-        ).astype("float32")
+        with span("encode"):
+            query_vec = self.model.encode(
+                [query],
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+            ).astype("float32")
+
+        k = min(k, len(self.docs))
+        with span("faiss.search", k=k):
+            scores, indices = self.index.search(query_vec, k)
+        return self._hits(indices[0], scores[0])
+
+    @traced("index.search_batch")
+    def search_batch(self, queries: List[str], k: int = 5) -> List[List[Dict]]:
+        """Encode all queries in one pass and search them with a single FAISS call."""
+        results: List[List[Dict]] = [[] for _ in queries]
+        positions = [i for i, query in enumerate(queries) if query]
+        if not positions or not self.docs or self.index is None:
+            return results
+
+        with span("encode", batch=len(positions)):
+            query_vecs = self.model.encode(
+                [queries[i] for i in positions],
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+            ).astype("float32")
 
         k = min(k, len(self.docs))
-        scores, indices = self.index.search(query_vec, k)
+        with span("faiss.search", k=k, batch=len(positions)):
+            scores, indices = self.index.search(query_vecs, k)
+        for row, i in enumerate(positions):
+            results[i] = self._hits(indices[row], scores[row])
+        return results
 
+    def _hits(self, indices, scores) -> List[Dict]:
         results: List[Dict] = []
-        for idx, score in zip(indices[0], scores[0]):
+        for idx, score in zip(indices, scores):
             if idx == -1:
                 continue
             doc = dict(self.docs[idx])
@@ -119,7 +139,7 @@ def create_index(
     data_path: Path = DATA_PATH,
     model_name: str = DEFAULT_MODEL,
 ) -> EmbeddedDocIndex | MinsearchDocIndex:
-    if faiss is None or SentenceTransformer is None:
+    if not embeddings_available():
         # Avoid importing unless necessary to keep faiss-only deps optional.
         from src.db.ms_index import create_index as create_ms_index, MinsearchDocIndex
 
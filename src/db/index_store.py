@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from src.db.optional_deps import load_faiss
+
+INDEX_FILE = "index.faiss"
+DOCS_FILE = "docs.jsonl"
+META_FILE = "meta.json"
+
+
+class DocStoreWriter:
+    """
+    Append-only JSONL doc store. Row i of docs.jsonl is vector i of the index,
+    so rows must be written in the same order vectors are added.
+    """
+
+    def __init__(self, store_dir: Path):
+        self.store_dir = Path(store_dir)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        # An index without meta.json is incomplete; remove any stale marker first.
+        (self.store_dir / META_FILE).unlink(missing_ok=True)
+        self._fh = (self.store_dir / DOCS_FILE).open("w", encoding="utf-8")
+        self.count = 0
+
+    def append(self, docs: List[Dict]) -> None:
+        for doc in docs:
+            self._fh.write(json.dumps(doc, ensure_ascii=False) + "\n")
+        self.count += len(docs)
+
+    def close(self, index: Any, meta: Dict[str, Any]) -> None:
+        """Flush docs, write the vector index, then meta.json to mark the store complete."""
+        self._fh.close()
+        if index is not None:
+            faiss = load_faiss()
+            if faiss is None:  # pragma: no cover - guarded by callers
+                raise RuntimeError("faiss is unavailable; cannot write the index.")
+            faiss.write_index(index, str(self.store_dir / INDEX_FILE))
+        meta = {"count": self.count, "created": time.time(), **meta}
+        (self.store_dir / META_FILE).write_text(json.dumps(meta, indent=2), encoding="utf-8")
+
+
+def is_index_dir(path: Path) -> bool:
+    return (Path(path) / META_FILE).exists()
+
+
+def data_version(data_path: Path) -> List[str]:
+    """
+    Path, size and mtime of an index's data file, its meta.json, or each shard's
+    meta.json; changes whenever the index is rebuilt (meta.json is written last).
+    """
+    data_path = Path(data_path)
+    if data_path.is_dir():
+        meta = data_path / META_FILE
+        targets = [meta] if meta.exists() else sorted(data_path.glob(f"*/{META_FILE}"))
+    else:
+        targets = [data_path] if data_path.exists() else []
+    parts = [str(data_path)]
+    for target in targets:
+        stat = target.stat()
+        parts += [target.parent.name, str(stat.st_size), str(stat.st_mtime_ns)]
+    return parts
+
+
+def read_meta(store_dir: Path) -> Dict[str, Any]:
+    return json.loads((Path(store_dir) / META_FILE).read_text(encoding="utf-8"))
+
+
+def read_docs(store_dir: Path) -> List[Dict]:
+    with (Path(store_dir) / DOCS_FILE).open("r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def load_index(store_dir: Path) -> Tuple[Any, List[Dict], Dict[str, Any]]:
+    """Return (faiss index or None, docs, meta) for a store written by DocStoreWriter."""
+    store_dir = Path(store_dir)
+    if not is_index_dir(store_dir):
+        raise FileNotFoundError(f"{store_dir} is not a complete index directory (missing {META_FILE}).")
+    meta = read_meta(store_dir)
+    docs = read_docs(store_dir)
+    index = None
+    index_path = store_dir / INDEX_FILE
+    faiss = load_faiss() if index_path.exists() else None
+    if faiss is not None:
+        index = faiss.read_index(str(index_path))
+    return index, docs, meta
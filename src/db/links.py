@@ -0,0 +1,122 @@
+"""
+SeeAlso link graph over the structured docs.
+
+`run_parser.py` compiles each doc's SeeAlso entries and the symbols named in
+its method keys ("monomialIdeal, Matrix" points at `Matrix`) into doc -> doc
+edges, resolved through the symbol table. Edges are stored as CSR arrays
+(`indptr`, `indices`) with a PageRank prior per doc in data/m2_links.npz.
+`LinkGraph.expand` returns the 1-hop neighbours of a set of hits, best prior
+first, so the search tool can return related pages with the hits themselves.
+"""
+
+from __future__ import annotations
+
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+
+from src.db.symbols import SymbolIndex, docs_fingerprint
+
+ROOT_DIR = Path(__file__).resolve().parent.parent.parent
+LINKS_PATH = ROOT_DIR / "data" / "m2_links.npz"
+
+DAMPING = 0.85
+
+
+def _references(doc: Dict) -> List[str]:
+    """Symbols a doc points at: its SeeAlso entries, then the names inside its method keys."""
+    refs = [symbol for symbol in doc.get("seealso") or [] if isinstance(symbol, str)]
+    keys = doc.get("keys") or []
+    for key in keys if isinstance(keys, list) else [keys]:
+        if "," in key:
+            refs += re.findall(r"[A-Za-z][A-Za-z0-9']*", key)
+    return refs
+
+
+def pagerank(indptr: np.ndarray, indices: np.ndarray, damping: float = DAMPING, iterations: int = 100, tol: float = 1e-10) -> np.ndarray:
+    """Power-iteration PageRank on a CSR graph; dangling docs spread their rank uniformly."""
+    n = len(indptr) - 1
+    if n == 0:
+        return np.zeros(0, dtype="float32")
+    out_degree = np.diff(indptr)
+    sources = np.repeat(np.arange(n), out_degree)
+    rank = np.full(n, 1.0 / n)
+    for _ in range(iterations):
+        share = np.divide(rank, out_degree, out=np.zeros(n), where=out_degree > 0)
+        spread = np.bincount(indices, weights=share[sources], minlength=n)
+        dangling = rank[out_degree == 0].sum()
+        updated = (1 - damping) / n + damping * (spread + dangling / n)
+        converged = np.abs(updated - rank).sum() < tol
+        rank = updated
+        if converged:
+            break
+    return rank.astype("float32")
+
+
+class LinkGraph:
+    """Doc -> doc SeeAlso edges in CSR form plus a PageRank prior per doc."""
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, prior: np.ndarray | None = None, fingerprint: str = ""):
+        self.fingerprint = fingerprint
+        self.indptr = np.asarray(indptr, dtype="int64")
+        self.indices = np.asarray(indices, dtype="int32")
+        self.prior = pagerank(self.indptr, self.indices) if prior is None else np.asarray(prior, dtype="float32")
+
+    @property
+    def count(self) -> int:
+        return len(self.indptr) - 1
+
+    @classmethod
+    def from_symbols(cls, symbols: SymbolIndex) -> "LinkGraph":
+        """Resolve every doc's references to the canonical doc of each symbol; drop self-links and repeats."""
+        rows: List[List[int]] = []
+        for doc_id, doc in enumerate(symbols.docs):
+            targets = (symbols.keys.get(symbol) for symbol in _references(doc))
+            rows.append(list(dict.fromkeys(ids[0] for ids in targets if ids and ids[0] != doc_id)))
+        indptr = np.zeros(len(rows) + 1, dtype="int64")
+        indptr[1:] = np.cumsum([len(row) for row in rows])
+        indices = np.fromiter((target for row in rows for target in row), dtype="int32", count=int(indptr[-1]))
+        return cls(indptr, indices, fingerprint=docs_fingerprint(symbols.docs))
+
+    def save(self, path: Path = LINKS_PATH) -> None:
+        with Path(path).open("wb") as f:
+            np.savez(f, indptr=self.indptr, indices=self.indices, prior=self.prior, fingerprint=np.array(self.fingerprint))
+
+    @classmethod
+    def load(cls, path: Path = LINKS_PATH) -> "LinkGraph":
+        with np.load(Path(path)) as data:
+            return cls(data["indptr"], data["indices"], data["prior"], str(data["fingerprint"]))
+
+    def neighbours(self, doc_id: int) -> np.ndarray:
+        return self.indices[self.indptr[doc_id] : self.indptr[doc_id + 1]]
+
+    def expand(self, doc_ids: Sequence[int], limit: int = 3) -> List[int]:
+        """Up to `limit` 1-hop neighbours of `doc_ids` (excluding them), highest prior first."""
+        seen = set(doc_ids)
+        candidates: Dict[int, int] = {}
+        for position, doc_id in enumerate(doc_ids):
+            for neighbour in self.neighbours(doc_id).tolist():
+                if neighbour not in seen:
+                    candidates.setdefault(neighbour, position)
+        ranked = sorted(candidates, key=lambda doc_id: (-float(self.prior[doc_id]), candidates[doc_id]))
+        return ranked[:limit]
+
+
+def create_graph(symbols: SymbolIndex, path: Path = LINKS_PATH) -> LinkGraph:
+    """The saved graph for `symbols`' docs, or one built from them if it is missing or stale."""
+    path = Path(path)
+    if path.exists():
+        graph = LinkGraph.load(path)
+        if graph.fingerprint == docs_fingerprint(symbols.docs):
+            return graph
+    return LinkGraph.from_symbols(symbols)
+
+
+def neighbour_docs(graph: LinkGraph, docs: List[Dict], doc_ids: Iterable[int], limit: int = 3) -> List[Dict]:
+    """Copies of the expanded neighbours, tagged `match: "seealso"` and the `prior` they were ranked by."""
+    return [
+        {**docs[doc_id], "match": "seealso", "prior": round(float(graph.prior[doc_id]), 6)}
+        for doc_id in graph.expand(list(doc_ids), limit)
+    ]
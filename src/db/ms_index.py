@@ -4,7 +4,7 @@ import json
 from pathlib import Path
 from typing import Dict, List
 
-from minsearch import Index
+from src.tracing import traced
 
 DATA_PATH = Path(__file__).resolve().parent.parent.parent / "data" / "m2_docs.jsonl"
 
@@ -45,12 +45,15 @@ class MinsearchDocIndex:
             self.index = None
             return
 
+        from minsearch import Index  # deferred: pulls in sklearn/scipy
+
         text_fields = ["keys", "usage", "description", "headline", "examples"]
         keyword_fields = ["source"]
 
         self.index = Index(text_fields=text_fields, keyword_fields=keyword_fields)
         self.index.fit(self.docs)
 
+    @traced("index.search")
     def search(self, query: str, k: int = 5) -> List[Dict]:
         if not query or not self.index:
             return []
@@ -0,0 +1,43 @@
+"""
+Deferred imports for the heavy optional backends.
+
+sentence-transformers (and torch) and faiss take seconds to import, so modules
+only resolve them when an embedding index is actually built or loaded. Each
+loader imports once and returns None when the package is missing, mirroring
+the old module-level `try: import ... except ModuleNotFoundError` guards.
+On first import each library gets the thread limits of `src.resources`.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Any, Optional
+
+from src import resources
+
+
+@lru_cache(maxsize=None)
+def load_faiss() -> Optional[Any]:
+    try:
+        import faiss  # type: ignore
+    except ModuleNotFoundError:  # pragma: no cover - only hit in constrained envs
+        return None
+    resources.apply_to_faiss(faiss)
+    return faiss
+
+
+@lru_cache(maxsize=None)
+def load_sentence_transformer() -> Optional[type]:
+    """The `SentenceTransformer` class, or None if sentence-transformers is missing."""
+    try:
+        import torch
+        from sentence_transformers import SentenceTransformer
+    except ModuleNotFoundError:  # pragma: no cover - optional dep
+        return None
+    resources.apply_to_torch(torch)
+    return SentenceTransformer
+
+
+def embeddings_available() -> bool:
+    """True when both the encoder and faiss can be imported (imports them)."""
+    return load_faiss() is not None and load_sentence_transformer() is not None
@@ -0,0 +1,82 @@
+"""
+Dimensionality reduction for embedding indexes.
+
+A reduced index is a FAISS `IndexPreTransform`: the projection to `dim`
+dimensions and an L2 renormalization sit in front of a flat inner-product
+index. The transform is saved inside index.faiss and applied to query vectors
+by FAISS itself, so search code keeps passing full-size encoder output.
+
+- "pca": fit a PCA on (a sample of) the corpus vectors at build time.
+- "truncate": keep the first `dim` components, for Matryoshka-trained encoders
+  whose leading dimensions carry most of the signal. Needs no training.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Optional
+
+import numpy as np
+
+from src.db.optional_deps import load_faiss
+
+REDUCTIONS = ("pca", "truncate")
+# Vectors sampled to fit a PCA during a streaming build.
+PCA_TRAIN_SIZE = 4096
+
+
+def _faiss():
+    faiss = load_faiss()
+    if faiss is None:  # pragma: no cover - guarded by callers
+        raise RuntimeError("faiss is unavailable; cannot build embedding index.")
+    return faiss
+
+
+def make_index(source_dim: int, dim: Optional[int] = None, method: str = "pca") -> Any:
+    """
+    An empty inner-product index over `source_dim`-dimensional vectors, reduced
+    to `dim` dimensions by `method`. Without `dim` (or with `dim >= source_dim`)
+    it is a plain flat index.
+    """
+    faiss = _faiss()
+    if not dim or dim >= source_dim:
+        return faiss.IndexFlatIP(source_dim)
+    if method == "pca":
+        return faiss.index_factory(source_dim, f"PCA{dim},L2norm,Flat", faiss.METRIC_INNER_PRODUCT)
+    if method == "truncate":
+        index = faiss.IndexPreTransform(faiss.IndexFlatIP(dim))
+        index.prepend_transform(faiss.NormalizationTransform(dim, 2.0))
+        index.prepend_transform(faiss.RemapDimensionsTransform(source_dim, dim, False))
+        return index
+    raise ValueError(f"unknown reduction {method!r}; expected one of {', '.join(REDUCTIONS)}")
+
+
+def train(index: Any, vectors: np.ndarray) -> None:
+    """Fit the index's projection on `vectors` (no-op for indexes that need no training)."""
+    if index.is_trained:
+        return
+    dim = reduced_dim(index)
+    if len(vectors) < dim:
+        raise ValueError(f"PCA to {dim} dimensions needs at least {dim} training vectors, got {len(vectors)}")
+    index.train(np.ascontiguousarray(vectors, dtype="float32"))
+
+
+def build_index(vectors: np.ndarray, dim: Optional[int] = None, method: str = "pca") -> Any:
+    """A reduced index fitted on and filled with `vectors` (normalized, float32)."""
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    index = make_index(vectors.shape[1], dim, method)
+    train(index, vectors)
+    index.add(vectors)
+    return index
+
+
+def reduced_dim(index: Any) -> int:
+    """Dimension of the stored vectors (the input dimension for an unreduced index)."""
+    faiss = _faiss()
+    if isinstance(index, faiss.IndexPreTransform):
+        return faiss.downcast_index(index.index).d
+    return index.d
+
+
+def vector_bytes(index: Any) -> int:
+    """Bytes held by the stored float32 vectors."""
+    return index.ntotal * reduced_dim(index) * 4
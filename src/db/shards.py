@@ -0,0 +1,188 @@
+"""
+Per-package sharded chunk index.
+
+Every M2 package is chunked into its own index store under
+`<shards_dir>/<package>/` (see `src/scripts/build_shards.py`), so packages are
+built, rebuilt and loaded independently. `ShardedIndex` loads the shards in
+parallel with one shared encoder, encodes each query once, searches the
+selected shards concurrently and merges their top-k with a heap.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import hashlib
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from src.db import index_store
+from src.db.chunk_index import DEFAULT_MODEL, ChunkEmbeddedIndex, ChunkMinsearchIndex
+from src.db.optional_deps import embeddings_available, load_sentence_transformer
+from src.resources import current_plan, limit_omp_threads
+from src.tracing import span, traced
+
+ROOT_DIR = Path(__file__).resolve().parent.parent.parent
+SHARDS_DIR = ROOT_DIR / "data" / "m2_shards"
+PACKAGES_ROOT = ROOT_DIR / "data" / "packages"
+
+# Suffix of a shard being rebuilt; it replaces the live shard only once complete.
+BUILDING_SUFFIX = ".building"
+# Suffix the replaced shard is moved to during the swap, until it is deleted.
+RETIRED_SUFFIX = ".retired"
+
+
+def shard_path(shards_dir: Path, package: str) -> Path:
+    return Path(shards_dir) / package
+
+
+def list_shards(shards_dir: Path = SHARDS_DIR) -> List[str]:
+    """Packages with a complete shard under `shards_dir`."""
+    shards_dir = Path(shards_dir)
+    if not shards_dir.is_dir():
+        return []
+    return sorted(
+        entry.name
+        for entry in shards_dir.iterdir()
+        if entry.is_dir()
+        and not entry.name.endswith((BUILDING_SUFFIX, RETIRED_SUFFIX))
+        and index_store.is_index_dir(entry)
+    )
+
+
+def list_packages(packages_root: Path = PACKAGES_ROOT) -> List[str]:
+    """Package directories under `packages_root` (one per M2 package)."""
+    packages_root = Path(packages_root)
+    if not packages_root.is_dir():
+        return []
+    return sorted(entry.name for entry in packages_root.iterdir() if entry.is_dir() and not entry.name.startswith("."))
+
+
+def source_fingerprint(package_dir: Path) -> str:
+    """Hash of the package's .m2 file names, sizes and mtimes; changes when any source changes."""
+    package_dir = Path(package_dir)
+    digest = hashlib.sha1()
+    for path in sorted(package_dir.rglob("*.m2")):
+        stat = path.stat()
+        digest.update(f"{path.relative_to(package_dir)}|{stat.st_size}|{stat.st_mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def merge_top_k(result_lists: Sequence[List[Dict]], k: int) -> List[Dict]:
+    """
+    Global top-k across shards. Hits are ranked by `score` when all of them have
+    one (embedding shards share an encoder, so cosine scores are comparable);
+    text-only shards are merged by rank within their shard instead.
+    """
+    scored = all("score" in doc for hits in result_lists for doc in hits)
+    candidates = (
+        ((doc["score"] if scored else -rank), -shard, -rank, doc)
+        for shard, hits in enumerate(result_lists)
+        for rank, doc in enumerate(hits)
+    )
+    return [doc for *_, doc in heapq.nlargest(k, candidates, key=lambda item: item[:3])]
+
+
+class ShardedIndex:
+    """Search a set of per-package shards as one index."""
+
+    # Lets callers (search tool, CLIs) pass `packages=` through to search.
+    supports_packages = True
+
+    def __init__(
+        self,
+        shards_dir: Path = SHARDS_DIR,
+        model_name: str = DEFAULT_MODEL,
+        packages: Optional[Iterable[str]] = None,
+        workers: Optional[int] = None,
+    ):
+        self.data_path = Path(shards_dir)
+        names = list_shards(self.data_path)
+        if packages:
+            wanted = {name.lower() for name in packages}
+            names = [name for name in names if name.lower() in wanted]
+        if not names:
+            raise FileNotFoundError(
+                f"No shards found under {self.data_path}. Build them with `uv run python -m src.scripts.build_shards`."
+            )
+
+        metas = {name: index_store.read_meta(shard_path(self.data_path, name)) for name in names}
+        self.model_name = next((meta["model"] for meta in metas.values() if meta.get("model")), model_name)
+        self.model = load_sentence_transformer()(self.model_name) if embeddings_available() else None
+        plan = current_plan()
+        # Nested under the search pool: each search's fan-out gets that worker's share of the CPU budget.
+        self._pool = ThreadPoolExecutor(
+            max_workers=workers or min(plan.shard_workers, len(names)),
+            thread_name_prefix="m2-shard",
+            initializer=limit_omp_threads,
+            initargs=(plan.shard_omp_threads,),
+        )
+        self.shards: Dict[str, ChunkEmbeddedIndex | ChunkMinsearchIndex] = dict(
+            zip(names, self._pool.map(self._load_shard, names))
+        )
+
+    def _load_shard(self, name: str) -> ChunkEmbeddedIndex | ChunkMinsearchIndex:
+        path = shard_path(self.data_path, name)
+        if self.model is not None and (path / index_store.INDEX_FILE).exists():
+            return ChunkEmbeddedIndex.load(path, model_name=self.model_name, model=self.model)
+        return ChunkMinsearchIndex(data_path=path)
+
+    @property
+    def packages(self) -> List[str]:
+        return list(self.shards)
+
+    @property
+    def docs(self) -> List[Dict]:
+        return [doc for shard in self.shards.values() for doc in shard.docs]
+
+    def select(self, packages: Optional[Iterable[str]] = None) -> List[str]:
+        """Loaded shards matching `packages` (case-insensitive; unknown names are ignored), or all of them."""
+        if not packages:
+            return self.packages
+        wanted = {name.lower() for name in packages}
+        return [name for name in self.shards if name.lower() in wanted]
+
+    @traced("index.search")
+    def search(self, query: str, k: int = 5, packages: Optional[Iterable[str]] = None) -> List[Dict]:
+        return self.search_batch([query], k=k, packages=packages)[0]
+
+    def search_batch(
+        self, queries: List[str], k: int = 5, packages: Optional[Iterable[str]] = None
+    ) -> List[List[Dict]]:
+        results: List[List[Dict]] = [[] for _ in queries]
+        positions = [i for i, query in enumerate(queries) if query]
+        names = self.select(packages)
+        if not positions or not names:
+            return results
+
+        live = [queries[i] for i in positions]
+        query_vecs = None
+        if any(isinstance(self.shards[name], ChunkEmbeddedIndex) for name in names):
+            with span("encode", batch=len(live)):
+                query_vecs = self.model.encode(live, convert_to_numpy=True, normalize_embeddings=True).astype("float32")
+
+        def search_shard(name: str) -> List[List[Dict]]:
+            shard = self.shards[name]
+            if isinstance(shard, ChunkEmbeddedIndex):
+                return shard.search_vectors(query_vecs, k)
+            return [shard.search(query, k=k) for query in live]
+
+        with span("shards.fanout", shards=len(names), batch=len(live)):
+            # One context copy per task: a Context cannot be entered by two threads at once.
+            futures = [self._pool.submit(contextvars.copy_context().run, search_shard, name) for name in names]
+            per_shard = [future.result() for future in futures]
+        for row, i in enumerate(positions):
+            results[i] = merge_top_k([hits[row] for hits in per_shard], k)
+        return results
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False)
+
+
+def create_index(
+    shards_dir: Path = SHARDS_DIR,
+    model_name: str = DEFAULT_MODEL,
+    packages: Optional[Iterable[str]] = None,
+) -> ShardedIndex:
+    return ShardedIndex(shards_dir, model_name=model_name, packages=packages)
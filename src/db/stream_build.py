@@ -0,0 +1,166 @@
+"""
+Streaming chunk -> embed -> index build.
+
+A producer thread batches chunks into a bounded queue while a pool of encoder
+threads drains it, so reading, tokenization and encoding overlap. Text held in
+flight is bounded by `queue_size * batch_size` chunks regardless of corpus size.
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from src.db.index_store import DocStoreWriter
+from src.db.reduction import PCA_TRAIN_SIZE, make_index, train
+
+EncodeFn = Callable[[List[str]], np.ndarray]
+
+_DONE = object()
+
+
+@dataclass
+class StreamStats:
+    chunks: int = 0
+    batches: int = 0
+    max_queue_depth: int = 0
+    encode_seconds: float = 0.0
+
+
+@dataclass
+class IndexSink:
+    """
+    Receives encoded batches; creates the FAISS index lazily once the dimension is known.
+    With `dim`, vectors are reduced by `reduction` (see `src.db.reduction`); a PCA is
+    fitted on the first `train_size` vectors, which are held back until then.
+    """
+
+    writer: Optional[DocStoreWriter] = None
+    index: Any = None
+    docs: List[Dict] = field(default_factory=list)
+    dim: Optional[int] = None
+    reduction: str = "pca"
+    train_size: int = PCA_TRAIN_SIZE
+    _held: List[Tuple[np.ndarray, List[Dict]]] = field(default_factory=list)
+
+    def add(self, vectors: np.ndarray, batch: List[Dict]) -> None:
+        if self.index is None:
+            self.index = make_index(vectors.shape[1], self.dim, self.reduction)
+        if self.index.is_trained:
+            self._append(vectors, batch)
+            return
+        self._held.append((vectors, batch))
+        if sum(len(held) for held, _ in self._held) >= self.train_size:
+            self.finish()
+
+    def finish(self) -> None:
+        """Train on the held-back vectors (when the stream was shorter than `train_size`) and add them."""
+        if not self._held:
+            return
+        held, self._held = self._held, []
+        train(self.index, np.concatenate([vectors for vectors, _ in held]))
+        for vectors, batch in held:
+            self._append(vectors, batch)
+
+    def _append(self, vectors: np.ndarray, batch: List[Dict]) -> None:
+        self.index.add(vectors)
+        self.docs.extend(batch)
+        if self.writer is not None:
+            self.writer.append(batch)
+
+
+def stream_embed(
+    chunks: Iterable[Dict],
+    encode: EncodeFn,
+    sink: IndexSink,
+    *,
+    batch_size: int = 64,
+    queue_size: int = 8,
+    workers: int = 2,
+    text_field: str = "text",
+) -> StreamStats:
+    """
+    Encode `chunks` in batches and append them to `sink` as they complete.
+    Batches may land out of input order, but each batch's vectors and docs are
+    appended together so index row i always matches doc i.
+    """
+    if batch_size <= 0 or queue_size <= 0 or workers <= 0:
+        raise ValueError("batch_size, queue_size and workers must be positive")
+
+    pending: "queue.Queue[object]" = queue.Queue(maxsize=queue_size)
+    sink_lock = threading.Lock()
+    stop = threading.Event()
+    errors: List[BaseException] = []
+    stats = StreamStats()
+
+    def put(item: object) -> bool:
+        while not stop.is_set():
+            try:
+                pending.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            batch: List[Dict] = []
+            for chunk in chunks:
+                if text_field not in chunk:
+                    continue
+                batch.append(chunk)
+                if len(batch) == batch_size:
+                    if not put(batch):
+                        return
+                    stats.max_queue_depth = max(stats.max_queue_depth, pending.qsize())
+                    batch = []
+            if batch:
+                put(batch)
+        except BaseException as exc:  # noqa: BLE001 - re-raised in the caller thread
+            errors.append(exc)
+            stop.set()
+        finally:
+            for _ in range(workers):
+                put(_DONE)
+
+    def consume() -> None:
+        while True:
+            try:
+                item = pending.get(timeout=0.1)
+            except queue.Empty:
+                if stop.is_set():
+                    return
+                continue
+            if item is _DONE:
+                return
+            batch = item  # type: ignore[assignment]
+            try:
+                started = time.perf_counter()
+                vectors = np.asarray(encode([doc[text_field] for doc in batch]), dtype="float32")
+                elapsed = time.perf_counter() - started
+                with sink_lock:
+                    sink.add(vectors, batch)
+                    stats.chunks += len(batch)
+                    stats.batches += 1
+                    stats.encode_seconds += elapsed
+            except BaseException as exc:  # noqa: BLE001 - re-raised in the caller thread
+                errors.append(exc)
+                stop.set()
+                return
+
+    threads = [threading.Thread(target=produce, name="chunk-producer", daemon=True)]
+    threads += [threading.Thread(target=consume, name=f"chunk-encoder-{i}", daemon=True) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+    sink.finish()
+    return stats
@@ -0,0 +1,188 @@
+"""
+Exact and typo-tolerant lookup of M2 symbols.
+
+`run_parser.py` builds a symbol table from every doc's `keys` and `seealso` and
+saves it next to the docs (data/m2_symbols.json). `SymbolIndex.lookup` picks
+identifier-like tokens out of a query and returns their canonical docs: exact
+names through a dict, misspelled ones through a character-trigram index. The
+search tool puts these hits ahead of the vector results, so a question naming
+`monomialIdeal` finds its page without encoding the query.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+from src.tracing import traced
+
+ROOT_DIR = Path(__file__).resolve().parent.parent.parent
+DATA_PATH = ROOT_DIR / "data" / "m2_docs.jsonl"
+SYMBOLS_PATH = ROOT_DIR / "data" / "m2_symbols.json"
+
+# Minimum trigram Dice similarity for a fuzzy match (1.0 = identical).
+FUZZY_THRESHOLD = float(os.getenv("M2_SYMBOL_FUZZY_THRESHOLD", "0.6"))
+# Shorter tokens are only matched exactly; a typo in "dim" is anyone's guess.
+FUZZY_MIN_LENGTH = 5
+
+_TOKEN_RE = re.compile(r"`([^`]+)`|([A-Za-z][A-Za-z0-9']*)")
+# camelCase / PascalCase / digits: "monomialIdeal", "HashTable", "GF2". Plain words
+# ("ideal", "ring") are only looked up when quoted in backticks or asked alone.
+_IDENTIFIER_RE = re.compile(r"[a-z][A-Z]|[A-Za-z][0-9]")
+
+
+def docs_fingerprint(docs: List[Dict]) -> str:
+    """Hash of every doc's keys and SeeAlso; saved tables are only reused for the docs they were built from."""
+    digest = hashlib.sha1()
+    for doc in docs:
+        digest.update(json.dumps([doc.get("keys"), doc.get("seealso")], ensure_ascii=False).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def _head(key: str) -> Optional[str]:
+    """Function name of a method key such as "monomialIdeal, Matrix"."""
+    match = re.match(r"[A-Za-z][A-Za-z0-9']*", key)
+    return match.group(0) if match and match.group(0) != key else None
+
+
+def trigrams(symbol: str) -> Set[str]:
+    padded = f"$${symbol.lower()}$"
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(a: Set[str], b: Set[str]) -> float:
+    """Dice coefficient of two trigram sets."""
+    return 2 * len(a & b) / (len(a) + len(b)) if a and b else 0.0
+
+
+def query_symbols(query: str) -> List[str]:
+    """Tokens of `query` that look like M2 identifiers, in order, without duplicates."""
+    matches = list(_TOKEN_RE.finditer(query))
+    alone = len(matches) == 1
+    symbols: List[str] = []
+    for match in matches:
+        quoted, word = match.groups()
+        token = (quoted or word).strip()
+        if token and token not in symbols and (quoted or alone or _IDENTIFIER_RE.search(token)):
+            symbols.append(token)
+    return symbols
+
+
+class SymbolIndex:
+    """
+    Symbol -> doc lookup over the structured docs.
+
+    `keys` maps each documented symbol to the docs whose Key names it (the doc
+    whose first key it is comes first); a method key "f, Type" also registers
+    "f". `related` maps symbols that only appear under SeeAlso to the docs that
+    reference them.
+    """
+
+    def __init__(
+        self,
+        docs: List[Dict],
+        keys: Optional[Dict[str, List[int]]] = None,
+        related: Optional[Dict[str, List[int]]] = None,
+    ):
+        self.docs = docs
+        if keys is None or related is None:
+            keys, related = self._tables(docs)
+        self.keys = keys
+        self.related = related
+        self._folded: Dict[str, List[str]] = defaultdict(list)
+        self._trigrams: Dict[str, List[str]] = defaultdict(list)
+        self._grams: Dict[str, Set[str]] = {}
+        for symbol in [*keys, *related]:
+            if symbol in self._grams:
+                continue
+            self._folded[symbol.lower()].append(symbol)
+            self._grams[symbol] = grams = trigrams(symbol)
+            for gram in grams:
+                self._trigrams[gram].append(symbol)
+
+    @staticmethod
+    def _tables(docs: List[Dict]) -> tuple[Dict[str, List[int]], Dict[str, List[int]]]:
+        ranked: Dict[str, List[tuple[int, int]]] = defaultdict(list)
+        related: Dict[str, List[int]] = defaultdict(list)
+        for doc_id, doc in enumerate(docs):
+            doc_keys = doc.get("keys") or []
+            for position, key in enumerate(doc_keys if isinstance(doc_keys, list) else [doc_keys]):
+                ranked[key].append((0 if position == 0 else 1, doc_id))
+                head = _head(key)
+                if head:
+                    ranked[head].append((2, doc_id))
+            for symbol in doc.get("seealso") or []:
+                related[symbol].append(doc_id)
+        keys = {symbol: list(dict.fromkeys(doc_id for _, doc_id in sorted(hits))) for symbol, hits in ranked.items()}
+        return keys, {symbol: ids for symbol, ids in related.items() if symbol not in keys}
+
+    @classmethod
+    def from_jsonl(cls, docs_path: Path = DATA_PATH) -> "SymbolIndex":
+        with Path(docs_path).open("r", encoding="utf-8") as f:
+            return cls([json.loads(line) for line in f if line.strip()])
+
+    def save(self, path: Path = SYMBOLS_PATH) -> None:
+        payload = {"fingerprint": docs_fingerprint(self.docs), "keys": self.keys, "related": self.related}
+        Path(path).write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: Path = SYMBOLS_PATH, docs_path: Path = DATA_PATH) -> "SymbolIndex":
+        """Load the saved table for `docs_path`; rebuilt from the docs if it is missing or stale."""
+        index = cls.from_jsonl(docs_path)
+        path = Path(path)
+        if path.exists():
+            payload = json.loads(path.read_text(encoding="utf-8"))
+            if payload.get("fingerprint") == docs_fingerprint(index.docs):
+                return cls(index.docs, payload["keys"], payload["related"])
+        return index
+
+    def resolve(self, token: str) -> tuple[Optional[str], str]:
+        """Best known symbol for `token` and how it matched: "exact", "fuzzy" or "none"."""
+        if token in self._grams:
+            return token, "exact"
+        folded = self._folded.get(token.lower())
+        if folded:
+            return folded[0], "exact"
+        if len(token) < FUZZY_MIN_LENGTH:
+            return None, "none"
+        grams = trigrams(token)
+        candidates = {symbol for gram in grams for symbol in self._trigrams.get(gram, ())}
+        scored = [(similarity(grams, self._grams[symbol]), symbol) for symbol in candidates]
+        best = max(scored, default=(0.0, ""), key=lambda item: (item[0], item[1] in self.keys))
+        return (best[1], "fuzzy") if best[0] >= FUZZY_THRESHOLD else (None, "none")
+
+    @traced("symbols.lookup")
+    def lookup(self, query: str, limit: int = 3) -> List[Dict]:
+        """
+        Canonical docs for the symbols named in `query`, as copies tagged with
+        `match` ("exact", "method", "related" or "fuzzy") and the matched `symbol`.
+        "method" marks a doc found only through a method key such as
+        `(monomialIdeal, Matrix)`, not a doc of the symbol itself.
+        """
+        hits: List[Dict] = []
+        seen: Set[int] = set()
+        for token in query_symbols(query):
+            symbol, how = self.resolve(token)
+            if symbol is None:
+                continue
+            doc_ids: Iterable[int] = self.keys.get(symbol) or self.related.get(symbol, [])
+            match = how if symbol in self.keys else "related"
+            for doc_id in doc_ids:
+                if doc_id in seen:
+                    continue
+                seen.add(doc_id)
+                doc_keys = self.docs[doc_id].get("keys") or []
+                own = symbol in (doc_keys if isinstance(doc_keys, list) else [doc_keys])
+                hits.append({**self.docs[doc_id], "match": "method" if match == "exact" and not own else match, "symbol": symbol})
+        # Exact names first, then their methods, then docs that merely mention the symbol, then guesses.
+        order = {"exact": 0, "method": 1, "related": 2, "fuzzy": 3}
+        return sorted(hits, key=lambda doc: order[doc["match"]])[:limit]
+
+
+def create_index(docs_path: Path = DATA_PATH, symbols_path: Path = SYMBOLS_PATH) -> SymbolIndex:
+    return SymbolIndex.load(symbols_path, docs_path)
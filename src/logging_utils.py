@@ -1,12 +1,195 @@
 from __future__ import annotations
 
+import atexit
 import json
 import os
-from datetime import datetime
+import queue
+import threading
+import time
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from uuid import uuid4
 
+# Events logged once per streamed token; consecutive ones of a run are merged into one record.
+COALESCED_EVENTS = {"part_delta"}
+
+
+class _Flush:
+    """Queue marker: write everything queued before it, then set `done`."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+
+
+_STOP = object()
+
+
+def _dumps(record: Dict[str, Any]) -> str:
+    # Never let an odd value kill the writer thread.
+    return json.dumps(record, ensure_ascii=False, default=str)
+
+
+class EventLogger:
+    """
+    JSONL event logger with a background writer thread.
+
+    `log()` only puts the record on a bounded queue. The writer collects
+    batches of up to `batch_size` records or `flush_interval` seconds,
+    whichever comes first, and appends each batch with one open/write per
+    file. Runs of `part_delta` events from the same run are coalesced into a
+    single record with a `count`. When the queue is full, coalescable events
+    are dropped (and counted) rather than stalling the caller; other events
+    wait for room.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_queue: int = 10_000,
+        batch_size: int = 512,
+        flush_interval: float = 0.25,
+        coalesce: bool = True,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.coalesce = coalesce
+        self.dropped = 0
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._made_dirs: set[Path] = set()
+        # (path, run_id, kind) -> coalesced delta record awaiting its run's next event.
+        self._open_deltas: Dict[Tuple[Path, str, Any], Dict[str, Any]] = {}
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="m2-log-writer", daemon=True)
+                    self._thread.start()
+
+    def log(self, record: Dict[str, Any], path: Path) -> None:
+        self._ensure_thread()
+        if record.get("event") in COALESCED_EVENTS:
+            try:
+                self._queue.put_nowait((path, record))
+            except queue.Full:
+                self.dropped += 1
+            return
+        self._queue.put((path, record))
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """Block until everything logged so far is on disk (or `timeout` passes)."""
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        marker = _Flush()
+        self._queue.put(marker)
+        return marker.done.wait(timeout)
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            # Gather a batch: up to batch_size records or flush_interval seconds, cut short by flush/close.
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and not self._is_marker(batch[-1]):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            lines: Dict[Path, List[str]] = {}
+            markers: List[_Flush] = []
+            stop = False
+            for entry in batch:
+                if entry is _STOP:
+                    stop = True
+                elif isinstance(entry, _Flush):
+                    markers.append(entry)
+                else:
+                    self._add(lines, *entry)
+            if markers or stop:
+                self._close_deltas(lines)
+            self._write(lines)
+            for marker in markers:
+                marker.done.set()
+            if stop:
+                return
+
+    @staticmethod
+    def _is_marker(entry: Any) -> bool:
+        return entry is _STOP or isinstance(entry, _Flush)
+
+    def _add(self, lines: Dict[Path, List[str]], path: Path, record: Dict[str, Any]) -> None:
+        run_id = record.get("run_id")
+        if self.coalesce and record.get("event") in COALESCED_EVENTS:
+            key = (path, run_id, record.get("kind"))
+            pending = self._open_deltas.get(key)
+            if pending is None:
+                self._open_deltas[key] = {**record, "count": 1}
+            else:
+                pending["count"] += 1
+                pending["last_timestamp"] = record["timestamp"]
+            return
+        # Any other event of the run closes its open delta runs, keeping file order.
+        for key in [k for k in self._open_deltas if k[0] == path and k[1] == run_id]:
+            lines.setdefault(path, []).append(_dumps(self._open_deltas.pop(key)))
+        lines.setdefault(path, []).append(_dumps(record))
+
+    def _close_deltas(self, lines: Dict[Path, List[str]]) -> None:
+        for (path, _run_id, _kind), record in self._open_deltas.items():
+            lines.setdefault(path, []).append(_dumps(record))
+        self._open_deltas.clear()
+
+    def _write(self, lines: Dict[Path, List[str]]) -> None:
+        for path, chunk in lines.items():
+            if not chunk:
+                continue
+            try:
+                if path.parent not in self._made_dirs:
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    self._made_dirs.add(path.parent)
+                with path.open("a", encoding="utf-8") as f:
+                    f.write("\n".join(chunk) + "\n")
+            except OSError:
+                self.dropped += len(chunk)
+
+
+_logger: Optional[EventLogger] = None
+_logger_lock = threading.Lock()
+
+
+def get_event_logger() -> EventLogger:
+    global _logger
+    if _logger is None:
+        with _logger_lock:
+            if _logger is None:
+                _logger = EventLogger(
+                    max_queue=int(os.getenv("M2_LOG_QUEUE", "10000")),
+                    flush_interval=float(os.getenv("M2_LOG_FLUSH_INTERVAL", "0.25")),
+                    coalesce=os.getenv("M2_LOG_COALESCE", "1").lower() not in {"0", "false", "no"},
+                )
+                atexit.register(_logger.close)
+    return _logger
+
+
+def flush_events(timeout: Optional[float] = 5.0) -> bool:
+    """Wait until all events logged so far are written."""
+    return get_event_logger().flush(timeout)
+
 
 def log_event(
     event: dict[str, Any],
@@ -14,15 +197,12 @@ def log_event(
     path: str | Path | None = None,
     run_id: Optional[str] = None,
 ) -> None:
-    """Append a structured event to a JSONL log."""
+    """Append a structured event to a JSONL log (written asynchronously; see EventLogger)."""
     log_path = Path(path or os.getenv("LOG_PATH", "logs/runs.jsonl"))
-    log_path.parent.mkdir(parents=True, exist_ok=True)
 
     record = {
-        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "timestamp": datetime.now(timezone.utc).replace(tzinfo=None).isoformat() + "Z",
         "run_id": run_id or str(uuid4()),
         **event,
     }
-    with log_path.open("a", encoding="utf-8") as f:
-        f.write(json.dumps(record, ensure_ascii=False) + "\n")
-
+    get_event_logger().log(record, log_path)
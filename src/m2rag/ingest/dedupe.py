@@ -0,0 +1,157 @@
+"""
+Near-duplicate detection for chunks using MinHash signatures and LSH banding.
+"""
+
+import json
+import re
+import time
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# Smallest prime above 2**32; 32-bit shingle hashes times 32-bit coefficients stay inside uint64.
+_PRIME = np.uint64(4294967311)
+_WORD = re.compile(r"\w+")
+
+
+def chunk_key(chunk: Dict) -> str:
+    return f"{chunk.get('source', '')}#{chunk.get('chunk_id', '')}"
+
+
+def choose_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """Pick (bands, rows) with bands * rows == num_perm whose LSH S-curve midpoint is closest to threshold."""
+    best = (num_perm, 1)
+    best_err = float("inf")
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        err = abs((1.0 / bands) ** (1.0 / rows) - threshold)
+        if err < best_err:
+            best, best_err = (bands, rows), err
+    return best
+
+
+@dataclass
+class DedupeStats:
+    seen: int = 0
+    dropped: int = 0
+    seconds: float = 0.0
+
+    def summary(self) -> str:
+        pct = 100.0 * self.dropped / self.seen if self.seen else 0.0
+        return f"kept {self.seen - self.dropped}/{self.seen} chunks, dropped {self.dropped} near-duplicates ({pct:.1f}% smaller) in {self.seconds:.2f}s"
+
+
+class MinHashDeduper:
+    """
+    Streaming near-duplicate filter. Each text is reduced to a MinHash signature
+    over word shingles; LSH bands propose candidates and the estimated Jaccard
+    similarity must reach `threshold` for the text to count as a duplicate.
+    """
+
+    def __init__(self, threshold: float = 0.85, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError("threshold must be in (0, 1]")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = choose_bands(num_perm, threshold)
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 2**32, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 2**32, size=num_perm, dtype=np.uint64)
+        self._buckets: List[Dict[bytes, List[str]]] = [defaultdict(list) for _ in range(self.bands)]
+        self._signatures: Dict[str, np.ndarray] = {}
+        self.duplicates: Dict[str, str] = {}
+        self.stats = DedupeStats()
+
+    def signature(self, text: str) -> np.ndarray:
+        words = _WORD.findall(text.lower())
+        n = self.shingle_size
+        shingles = {" ".join(words[i : i + n]) for i in range(max(1, len(words) - n + 1))}
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        return ((np.outer(hashes, self._a) + self._b) % _PRIME).min(axis=0)
+
+    def add(self, key: str, text: str) -> Optional[str]:
+        """Register `key`; return its canonical key if it duplicates an earlier text, else None."""
+        started = time.perf_counter()
+        self.stats.seen += 1
+        sig = self.signature(text)
+        bands = [sig[i * self.rows : (i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+        canonical = None
+        checked = set()
+        for bucket, band in zip(self._buckets, bands):
+            for candidate in bucket.get(band, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                if float(np.mean(self._signatures[candidate] == sig)) >= self.threshold:
+                    canonical = candidate
+                    break
+            if canonical:
+                break
+
+        if canonical:
+            self.duplicates[key] = canonical
+            self.stats.dropped += 1
+        else:
+            self._signatures[key] = sig
+            for bucket, band in zip(self._buckets, bands):
+                bucket[band].append(key)
+        self.stats.seconds += time.perf_counter() - started
+        return canonical
+
+    def filter(self, chunks: Iterable[Dict], text_field: str = "text") -> Iterator[Dict]:
+        """Yield only chunks that are not near-duplicates of an earlier chunk."""
+        for chunk in chunks:
+            if self.add(chunk_key(chunk), chunk.get(text_field, "")) is None:
+                yield chunk
+
+
+def dupes_path(data_path: Path) -> Path:
+    """Where the dropped -> canonical map lives for a chunk jsonl or an index directory."""
+    data_path = Path(data_path)
+    if data_path.is_dir():
+        return data_path / "dupes.json"
+    return data_path.with_suffix(".dupes.json")
+
+
+def save_duplicates(data_path: Path, duplicates: Dict[str, str]) -> Path:
+    path = dupes_path(data_path)
+    path.write_text(json.dumps(duplicates, indent=0, ensure_ascii=False), encoding="utf-8")
+    return path
+
+
+def load_duplicates(data_path: Path) -> Dict[str, str]:
+    path = dupes_path(data_path)
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def attach_duplicate_sources(docs: List[Dict], duplicates: Dict[str, str]) -> None:
+    """
+    Record on each canonical chunk which dropped chunks it stands in for:
+    `duplicate_chunks` lists every dropped chunk key (same-source repeats
+    included), and `duplicate_sources` the other files among them, so their
+    citations resolve.
+    """
+    if not duplicates:
+        return
+    aliases: Dict[str, List[str]] = defaultdict(list)
+    for dropped, canonical in duplicates.items():
+        aliases[canonical].append(dropped)
+    for doc in docs:
+        dropped_keys = aliases.get(chunk_key(doc))
+        if not dropped_keys:
+            continue
+        doc["duplicate_chunks"] = sorted(dropped_keys)
+        other_sources = {key.rsplit("#", 1)[0] for key in dropped_keys} - {doc.get("source")}
+        if other_sources:
+            doc["duplicate_sources"] = sorted(other_sources)
@@ -21,7 +21,7 @@ def extract_document_blocks(text: str) -> List[str]:
 
 
 def _split_value_list(val: str) -> List[str]:
-    return [clean_symbol(v) for v in re.split(r"[,\\n]+", val) if v.strip()]
+    return [clean_symbol(v) for v in re.split(r"\n|,(?![^(]*\))", val) if v.strip()]
 
 
 def parse_document_block(block: str) -> Dict[str, str | List[str]]:
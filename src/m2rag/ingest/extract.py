@@ -19,7 +19,8 @@ def _normalize_entry(raw: Dict, source: str, syntax: str) -> Dict:
             raw[k] = [strip_markup(item) if isinstance(item, str) else item for item in v]
 
     def _split_lines(val: str):
-        return [clean_symbol(k) for k in re.split(r"[\\n,]+", val) if k.strip()]
+        # One symbol per line or comma; commas inside "(f, Type)" method keys don't split.
+        return [clean_symbol(k) for k in re.split(r"\n|,(?![^(]*\))", val) if k.strip()]
 
     keys_val = raw.get("Key", "")
     keys = keys_val if isinstance(keys_val, list) else _split_lines(keys_val)
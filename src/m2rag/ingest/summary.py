@@ -0,0 +1,81 @@
+"""
+Extractive summaries computed at build time and stored on each doc/chunk, so
+summarize_docs only has to format precomputed fields.
+"""
+
+import re
+from collections import Counter
+from typing import Dict, List
+
+from src.m2rag.ingest.constants import SECTION_NAMES
+
+_SENTENCE = re.compile(r"(?<=[.!?])\s+(?=[A-Z(])")
+_WORD = re.compile(r"[A-Za-z][A-Za-z0-9]+")
+_STOPWORDS = {
+    "the", "and", "for", "that", "this", "with", "are", "from", "can", "into", "its", "has", "have",
+    "not", "but", "all", "any", "each", "which", "when", "then", "than", "also", "may", "such", "see",
+    "use", "used", "using", "one", "two", "is", "of", "to", "in", "a", "an", "be", "by", "or", "on", "as", "it",
+}
+# In whitespace-joined chunk text, a section runs until the next section name or block end.
+_SECTION_TAIL = rf"(.+?)(?=\s(?:{'|'.join(SECTION_NAMES)}|Inputs|Outputs|Consequences)\s|\s///|$)"
+# Matches both `Usage ...` (doc ///) and `Usage => "..."` (document {}) forms.
+_CHUNK_USAGE = re.compile(rf"\bUsage\s+(?:=>\s*)?{_SECTION_TAIL}")
+_CHUNK_EXAMPLE = re.compile(rf"\bExamples?\s+(?:=>\s*)?{_SECTION_TAIL}")
+
+MAX_SENTENCE_CHARS = 240
+MAX_FIELD_CHARS = 160
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[: limit - 3].rstrip() + "..."
+
+
+def key_sentences(text: str, n: int = 2) -> List[str]:
+    """
+    Pick the `n` sentences whose words are most frequent across the text
+    (a small TextRank stand-in), returned in their original order.
+    """
+    sentences = [s.strip() for s in _SENTENCE.split(" ".join(text.split())) if len(s.strip()) > 20]
+    if len(sentences) <= n:
+        return [_clip(s, MAX_SENTENCE_CHARS) for s in sentences]
+
+    def words(sentence: str) -> List[str]:
+        return [w.lower() for w in _WORD.findall(sentence) if w.lower() not in _STOPWORDS]
+
+    freq = Counter(w for s in sentences for w in words(s))
+    scores = []
+    for i, sentence in enumerate(sentences):
+        terms = words(sentence)
+        score = sum(freq[w] for w in terms) / (len(terms) + 1) if terms else 0.0
+        scores.append((score - 0.01 * i, i))  # prefer earlier sentences on ties
+    chosen = sorted(i for _, i in sorted(scores, reverse=True)[:n])
+    return [_clip(sentences[i], MAX_SENTENCE_CHARS) for i in chosen]
+
+
+def _first_line(text: str) -> str:
+    for line in (text or "").splitlines():
+        if line.strip():
+            return _clip(line, MAX_FIELD_CHARS)
+    return ""
+
+
+def summarize_entry(doc: Dict) -> Dict:
+    """Summary for a structured doc entry: key description sentences, usage line and first example."""
+    description = doc.get("description") or ""
+    return {
+        "key_sentences": key_sentences(description) if isinstance(description, str) else [],
+        "usage": _first_line(doc.get("usage") or ""),
+        "example": _first_line(doc.get("examples") or ""),
+    }
+
+
+def summarize_chunk(text: str) -> Dict:
+    """Summary for a raw text chunk, recovering usage/example from the section markers it contains."""
+    usage = _CHUNK_USAGE.search(text)
+    example = _CHUNK_EXAMPLE.search(text)
+    return {
+        "key_sentences": key_sentences(text),
+        "usage": _clip(usage.group(1).strip(' ",{}'), MAX_FIELD_CHARS) if usage else "",
+        "example": _clip(example.group(1).strip(' ",{}'), MAX_FIELD_CHARS) if example else "",
+    }
@@ -4,14 +4,17 @@ import argparse
 import asyncio
 import os
 import sys
+import time
 import uuid
-from typing import List, Optional
+from typing import Callable, List, Optional
 
 from jaxn import JSONParserHandler, StreamingJSONParser
-from pydantic_ai import messages as ai_messages, usage as ai_usage
-from pydantic_ai.run import AgentRunResultEvent
 
+from src.async_utils import LoopLagMonitor
 from src.logging_utils import log_event
+from src.resources import configure_threads, thread_plan_event
+from src.tools.state import tool_state
+from src.tracing import ModelRequestTracker, trace_run
 
 
 def print_tool_calls(result) -> None:
@@ -54,39 +57,101 @@ def print_tool_calls(result) -> None:
         print("(none)")
 
 
-def stream_answer(rag_agent, query: str, request_limit: Optional[int]):
-    """Stream the agent's structured response for the provided query."""
-    streamed_chunks: List[str] = []
-    final_result = None
-    run_id = str(uuid.uuid4())
+def answer_chunk_handler(emit: Callable[[str], None]) -> Callable[[Optional[str]], None]:
+    """
+    Return a callback that takes raw streamed model output (text, or the JSON
+    args of the output tool call) and passes the `answer` field to `emit` as it
+    arrives. Output that is not JSON (e.g. plain text) is emitted as-is.
+    """
 
     class AnswerHandler(JSONParserHandler):
         """Stream the `answer` field out of the JSON tool call as it arrives."""
 
         def on_value_chunk(self, path, field_name, chunk):
             if path == "" and field_name == "answer":
-                print(chunk, end="", flush=True)
-                streamed_chunks.append(chunk)
+                emit(chunk)
 
     parser = StreamingJSONParser(AnswerHandler())
 
-    def handle_chunk(chunk: str):
+    def handle_chunk(chunk: Optional[str]):
         if chunk is None or chunk == "":
             return
         try:
             parser.parse_incremental(chunk)
         except Exception:
-            # If parsing fails (e.g., provider returned plain text), fallback to direct print
-            print(chunk, end="", flush=True)
-            streamed_chunks.append(chunk)
+            # If parsing fails (e.g., provider returned plain text), fallback to direct emit
+            emit(chunk)
+
+    return handle_chunk
+
+
+def stream_answer(
+    rag_agent, query: str, request_limit: Optional[int], retrieval_first: bool = False, prefetch: bool = True
+):
+    """
+    Stream the agent's structured response for the provided query. With
+    `retrieval_first`, search_docs runs before the first model request and its
+    results are handed to the model as a completed tool exchange. Otherwise, with
+    `prefetch`, the raw query is searched speculatively while the model plans its
+    first search_docs call, which reuses the results when its query matches.
+    """
+    streamed_chunks: List[str] = []
+    final_result = None
+    run_id = str(uuid.uuid4())
+
+    def print_chunk(chunk: str):
+        print(chunk, end="", flush=True)
+        streamed_chunks.append(chunk)
+
+    handle_chunk = answer_chunk_handler(print_chunk)
 
     async def run_and_stream():
+        started = time.perf_counter()
+        with tool_state() as state, trace_run(run_id):
+            async with LoopLagMonitor() as lag:
+                history = None
+                if prefetch and not retrieval_first:
+                    from src.tools.search import start_prefetch
+
+                    start_prefetch(query)
+                if retrieval_first:
+                    from src.agents.rag_agent import retrieval_first_history_async
+
+                    history = await retrieval_first_history_async(query)
+                    log_event(
+                        {"event": "retrieval_first", "query": query, "search_ms": round(1000 * (time.perf_counter() - started), 1)},
+                        run_id=run_id,
+                    )
+                await consume_events(history)
+        log_event({"event": "loop_lag", "query": query, **lag.summary()}, run_id=run_id)
+        if prefetch and not retrieval_first:
+            log_event({"event": "search_prefetch", "query": query, **state.prefetch_stats}, run_id=run_id)
+        log_event({"event": "validator_outcomes", "query": query, **state.validator_stats}, run_id=run_id)
+        log_event(
+            {
+                "event": "run_latency",
+                "query": query,
+                "mode": "retrieval_first" if retrieval_first else "tool_first",
+                "elapsed_ms": round(1000 * (time.perf_counter() - started), 1),
+                "requests": final_result.usage().requests if final_result is not None else None,
+            },
+            run_id=run_id,
+        )
+
+    async def consume_events(history=None):
+        # pydantic_ai is imported here, not at module level, to keep `--help` and imports cheap.
+        from pydantic_ai import messages as ai_messages, usage as ai_usage
+        from pydantic_ai.run import AgentRunResultEvent
+
         nonlocal final_result
+        requests = ModelRequestTracker()
         async for event in rag_agent.run_stream_events(
-            query,
+            None if history else query,
+            message_history=history,
             usage_limits=ai_usage.UsageLimits(request_limit=request_limit),
             usage=ai_usage.RunUsage(),
         ):
+            requests.on_event(event)
             if isinstance(event, ai_messages.PartStartEvent):
                 part = getattr(event, "part", None)
                 kind = getattr(part, "part_kind", None)
@@ -157,6 +222,17 @@ def stream_answer(rag_agent, query: str, request_limit: Optional[int]):
     return final_result
 
 
+def print_cached_answer(cached: dict) -> None:
+    """Print an answer served from the answer cache."""
+    note = "exact match" if cached["match"] == "exact" else f"similar question, cosine={cached['similarity']:.3f}"
+    print(f"\nAssistant (cached, {note}):\n")
+    print(cached["answer"])
+    if cached["references"]:
+        print("\n\nReferences:")
+        for ref in cached["references"]:
+            print(f"- {ref}")
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="Stream responses from the Macaulay2 RAG agent.")
     parser.add_argument(
@@ -173,21 +249,56 @@ def main() -> None:
     )
     parser.add_argument(
         "--index-mode",
-        choices=["docs", "chunks"],
+        choices=["docs", "chunks", "shards"],
         help="Index mode to use (overrides M2_INDEX_MODE).",
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Bypass the answer cache and always run the agent.",
+    )
+    parser.add_argument(
+        "--retrieval-first",
+        action="store_true",
+        help="Search the query before the first model request instead of waiting for the model to call search_docs.",
+    )
+    parser.add_argument(
+        "--no-prefetch",
+        action="store_true",
+        help="Do not search the raw query speculatively while the model plans its first search_docs call.",
+    )
+    parser.add_argument(
+        "--cpu-profile",
+        choices=["latency", "throughput"],
+        help="Thread budget profile for the encoder, FAISS and worker pools (default: M2_CPU_PROFILE or latency).",
+    )
     args = parser.parse_args()
 
     if args.index_mode:
         os.environ["M2_INDEX_MODE"] = args.index_mode
     else:
         os.environ.setdefault("M2_INDEX_MODE", "chunks")
+    configure_threads(args.cpu_profile, default="latency")
+    log_event(thread_plan_event(entry="main"))
     from src.agents.rag_agent import rag_agent
+    from src.answer_cache import answer_cache_for
 
     print(f"Query: {args.query}")
+    cache = None if args.no_cache else answer_cache_for(rag_agent)
+    cached = cache.get(args.query) if cache else None
+    if cached:
+        log_event({"event": "answer_cache_hit", "query": args.query, "match": cached["match"], "similarity": cached["similarity"]})
+        print_cached_answer(cached)
+        cache.flush()  # persist the hit's recency
+        return
+
     request_limit = None if args.request_limit and args.request_limit <= 0 else args.request_limit
-    stream_result = stream_answer(rag_agent, args.query, request_limit)
+    stream_result = stream_answer(
+        rag_agent, args.query, request_limit, retrieval_first=args.retrieval_first, prefetch=not args.no_prefetch
+    )
     print_tool_calls(stream_result)
+    if cache:
+        cache.put(args.query, stream_result.output.answer, stream_result.output.references)
 
     # Print usage to help diagnose request-limit issues.
     usage_obj = getattr(stream_result, "_state", None)
@@ -0,0 +1,180 @@
+"""
+One CPU thread budget for the encoder, FAISS and our worker pools.
+
+torch intra-op threads, FAISS/BLAS OpenMP threads and the search and shard
+pools each default to "every core", so concurrent runs oversubscribe
+the machine. `configure_threads` splits one budget (M2_CPU_BUDGET, default:
+the CPUs this process may run on) across the nested pools. Each search
+worker gets budget // search_workers cores. A plain index uses them as
+OpenMP threads per FAISS call; a sharded index splits them into shard
+workers x OpenMP threads per shard search:
+
+- "latency": a couple of requests at a time, each using many cores
+  (search pool of 2, budget // 2 threads or shard workers per request).
+- "throughput": many requests at once, each single-threaded
+  (search pool of `budget` workers, 1 thread per task).
+
+The profile comes from the caller, M2_CPU_PROFILE, or the entry point's
+default. OpenMP/BLAS limits are exported as environment variables before the
+heavy libraries load, which sets the default for every thread. torch and
+faiss are configured when `src.db.optional_deps` imports them (or
+immediately, if already imported). `omp_set_num_threads` only affects the
+calling thread, so the search and shard pools apply their limit in each
+worker (`limit_omp_threads`). Explicit settings (OMP_NUM_THREADS,
+M2_SEARCH_WORKERS, M2_SHARD_WORKERS, CLI flags) still win. Entry points log
+the plan as a `thread_plan` event.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional
+
+PROFILES = ("latency", "throughput")
+# Environment variables read by OpenMP (FAISS), MKL/OpenBLAS and numexpr when they initialize.
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+
+@dataclass(frozen=True)
+class ThreadPlan:
+    profile: str
+    cpus: int
+    # Threads per encode (torch) and per FAISS/BLAS call (OpenMP) from a search worker.
+    torch_threads: int
+    omp_threads: int
+    # Workers in the search pool and, per search, in the shard fan-out pool.
+    search_workers: int
+    shard_workers: int
+    # OpenMP threads per FAISS call inside a shard worker.
+    shard_omp_threads: int
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+_plan: Optional[ThreadPlan] = None
+_lock = threading.Lock()
+# Values configure_threads exported; an environment value equal to these is ours, not an override.
+_exported: Dict[str, str] = {}
+
+
+def cpu_budget() -> int:
+    """M2_CPU_BUDGET, else the CPUs in this process's affinity mask (cgroup/taskset aware), else os.cpu_count()."""
+    env = os.getenv("M2_CPU_BUDGET")
+    if env:
+        return max(1, int(env))
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except AttributeError:  # pragma: no cover - not on Linux
+        return max(1, os.cpu_count() or 1)
+
+
+def _env_int(name: str) -> Optional[int]:
+    """A thread count the user set in the environment (not one configure_threads exported)."""
+    value = os.getenv(name)
+    if not value or value == _exported.get(name):
+        return None
+    return max(1, int(value))
+
+
+def plan_threads(
+    profile: Optional[str] = None, cpus: Optional[int] = None, search_workers: Optional[int] = None
+) -> ThreadPlan:
+    """
+    The thread plan for `profile` over `cpus` cores, keeping search workers x
+    shard workers x OpenMP threads within the budget. `search_workers` and
+    explicit environment settings override their parts.
+    """
+    profile = (profile or os.getenv("M2_CPU_PROFILE") or "latency").lower()
+    if profile not in PROFILES:
+        raise ValueError(f"unknown CPU profile {profile!r}; expected one of {', '.join(PROFILES)}")
+    cpus = cpus or cpu_budget()
+    workers = search_workers or _env_int("M2_SEARCH_WORKERS") or (min(2, cpus) if profile == "latency" else cpus)
+    per_worker = max(1, cpus // workers)
+    shard_workers = _env_int("M2_SHARD_WORKERS") or per_worker
+    omp = _env_int("OMP_NUM_THREADS")
+    return ThreadPlan(
+        profile=profile,
+        cpus=cpus,
+        torch_threads=per_worker,
+        omp_threads=omp or per_worker,
+        search_workers=workers,
+        shard_workers=shard_workers,
+        shard_omp_threads=omp or max(1, per_worker // shard_workers),
+    )
+
+
+def configure_threads(
+    profile: Optional[str] = None,
+    default: str = "latency",
+    cpus: Optional[int] = None,
+    search_workers: Optional[int] = None,
+) -> ThreadPlan:
+    """
+    Make the plan for `profile` (else M2_CPU_PROFILE, else `default`) the
+    process-wide one: export the OpenMP/BLAS limits and apply them to torch and
+    faiss if they are already imported. Call once at startup, before searching.
+    """
+    global _plan
+    plan = plan_threads(profile or os.getenv("M2_CPU_PROFILE") or default, cpus, search_workers)
+    with _lock:
+        _plan = plan
+        for name in THREAD_ENV_VARS:
+            # Leave values the user set; replace ones a previous plan exported.
+            current = os.environ.get(name)
+            if current is None or current == _exported.get(name):
+                os.environ[name] = _exported[name] = str(plan.omp_threads)
+        os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    if "faiss" in sys.modules:
+        apply_to_faiss(sys.modules["faiss"])
+    if "torch" in sys.modules:
+        apply_to_torch(sys.modules["torch"])
+    return plan
+
+
+def current_plan() -> ThreadPlan:
+    """The configured plan, or the default one for this environment if none was configured."""
+    return _plan or plan_threads()
+
+
+def apply_to_faiss(faiss: Any) -> None:
+    """Limit OpenMP threads for FAISS calls made from the calling thread."""
+    if _plan is not None and hasattr(faiss, "omp_set_num_threads"):
+        faiss.omp_set_num_threads(_plan.omp_threads)
+
+
+def limit_omp_threads(threads: int) -> None:
+    """Pool initializer: cap OpenMP threads in this worker thread (omp_set_num_threads is per thread)."""
+    faiss = sys.modules.get("faiss")
+    if faiss is not None and hasattr(faiss, "omp_set_num_threads"):
+        faiss.omp_set_num_threads(threads)
+
+
+def apply_to_torch(torch: Any) -> None:
+    if _plan is None:
+        return
+    torch.set_num_threads(_plan.torch_threads)
+    try:
+        torch.set_num_interop_threads(1 if _plan.profile == "throughput" else min(2, _plan.cpus))
+    except RuntimeError:  # only settable before torch starts parallel work
+        pass
+
+
+def effective_threads() -> Dict[str, Any]:
+    """Thread settings as the libraries report them now (libraries not yet imported are omitted)."""
+    effective: Dict[str, Any] = {name: os.environ.get(name) for name in THREAD_ENV_VARS}
+    if "torch" in sys.modules:
+        torch = sys.modules["torch"]
+        effective["torch_threads"] = torch.get_num_threads()
+        effective["torch_interop_threads"] = torch.get_num_interop_threads()
+    if "faiss" in sys.modules and hasattr(sys.modules["faiss"], "omp_get_max_threads"):
+        effective["faiss_omp_threads"] = sys.modules["faiss"].omp_get_max_threads()
+    return effective
+
+
+def thread_plan_event(**extra: Any) -> Dict[str, Any]:
+    """A `thread_plan` run-log record: the plan plus the effective library settings."""
+    return {"event": "thread_plan", **current_plan().as_dict(), "effective": effective_threads(), **extra}
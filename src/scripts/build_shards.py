@@ -0,0 +1,165 @@
+"""
+Build per-package index shards for every package under a packages root.
+
+Example:
+    uv run python src/scripts/get_data.py --all-packages
+    uv run python -m src.scripts.build_shards
+    uv run python -m src.scripts.build_shards --package Macaulay2Doc --force
+
+Each package directory is chunked (as in `chunk_docs.py`) into its own index
+store under `--output/<package>/`. meta.json records a fingerprint of the
+package's sources, so unchanged packages are skipped. A rebuilt shard is written
+next to the live one and swapped in when complete; other shards are untouched.
+The encoder is loaded once and shared by every package build.
+"""
+
+from __future__ import annotations
+
+import argparse
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from src.db import index_store
+from src.db.chunk_index import DEFAULT_MODEL, ChunkEmbeddedIndex
+from src.db.optional_deps import embeddings_available, load_sentence_transformer
+from src.db.shards import BUILDING_SUFFIX, PACKAGES_ROOT, RETIRED_SUFFIX, SHARDS_DIR, list_packages, shard_path, source_fingerprint
+from src.scripts.chunk_docs import build_chunks
+
+
+def package_chunks(package_dir: Path, max_tokens: int, overlap: int) -> Iterable[Dict]:
+    """Chunks of one package, tagged with `package` and a package-qualified `source`."""
+    package = package_dir.name
+    for chunk in build_chunks(package_dir, max_tokens, overlap):
+        chunk["package"] = package
+        chunk["source"] = f"{package}/{chunk['source']}"
+        yield chunk
+
+
+def build_shard(
+    package_dir: Path,
+    shards_dir: Path = SHARDS_DIR,
+    *,
+    max_tokens: int = 200,
+    overlap: int = 40,
+    model_name: str = DEFAULT_MODEL,
+    force: bool = False,
+    batch_size: int = 64,
+    workers: int = 2,
+    model=None,
+) -> Optional[Dict]:
+    """
+    Chunk and index one package into its shard. Returns the shard's meta, or None
+    if it was up to date. Pass a loaded `model` to reuse one encoder across packages.
+    """
+    package_dir = Path(package_dir)
+    target = shard_path(shards_dir, package_dir.name)
+    fingerprint = source_fingerprint(package_dir)
+    if not force and index_store.is_index_dir(target) and index_store.read_meta(target).get("fingerprint") == fingerprint:
+        return None
+
+    building = target.with_name(target.name + BUILDING_SUFFIX)
+    shutil.rmtree(building, ignore_errors=True)
+    meta = {"package": package_dir.name, "fingerprint": fingerprint, "max_tokens": max_tokens, "overlap": overlap}
+    chunks = package_chunks(package_dir, max_tokens, overlap)
+    if embeddings_available():
+        ChunkEmbeddedIndex.from_stream(
+            chunks,
+            model_name=model_name,
+            store_dir=building,
+            batch_size=batch_size,
+            workers=workers,
+            meta=meta,
+            model=model,
+        )
+    else:
+        # Text-only shard (docs + meta); it is searched with minsearch when loaded.
+        writer = index_store.DocStoreWriter(building)
+        writer.append(list(chunks))
+        writer.close(None, meta)
+
+    # Move the live shard aside instead of deleting it first, so the package is
+    # only missing between the two renames.
+    retired = target.with_name(target.name + RETIRED_SUFFIX)
+    shutil.rmtree(retired, ignore_errors=True)
+    if target.exists():
+        target.rename(retired)
+    building.rename(target)
+    shutil.rmtree(retired, ignore_errors=True)
+    return index_store.read_meta(target)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build per-package index shards.")
+    parser.add_argument("--root", type=Path, default=PACKAGES_ROOT, help=f"Packages root, one directory per package (default: {PACKAGES_ROOT}).")
+    parser.add_argument("--output", type=Path, default=SHARDS_DIR, help=f"Shards directory (default: {SHARDS_DIR}).")
+    parser.add_argument("--package", action="append", help="Only (re)build this package (repeatable; default: all).")
+    parser.add_argument("--force", action="store_true", help="Rebuild shards even if their sources are unchanged.")
+    parser.add_argument("--max-tokens", type=int, default=200, help="Max words per chunk (default: 200).")
+    parser.add_argument("--overlap", type=int, default=40, help="Word overlap between chunks (default: 40).")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help=f"SentenceTransformer model (default: {DEFAULT_MODEL}).")
+    parser.add_argument("--batch-size", type=int, default=64, help="Chunks per encode batch (default: 64).")
+    parser.add_argument("--workers", type=int, default=2, help="Encoder worker threads per shard (default: 2).")
+    parser.add_argument(
+        "--parallel",
+        type=int,
+        default=1,
+        help="Packages built concurrently (default: 1; text-only builds gain the most).",
+    )
+    parser.add_argument("--prune", action="store_true", help="Delete shards whose package no longer exists under --root.")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    available = list_packages(args.root)
+    if not available:
+        raise SystemExit(f"No package directories under {args.root}. Download them with `src/scripts/get_data.py --all-packages`.")
+    selected = available
+    if args.package:
+        unknown = sorted(set(args.package) - set(available))
+        if unknown:
+            raise SystemExit(f"Unknown package(s) under {args.root}: {', '.join(unknown)}")
+        selected = [name for name in available if name in set(args.package)]
+
+    args.output.mkdir(parents=True, exist_ok=True)
+    # One encoder for every package (and every --parallel build) instead of one per shard.
+    model = load_sentence_transformer()(args.model) if embeddings_available() else None
+
+    def build(package: str):
+        started = time.perf_counter()
+        meta = build_shard(
+            args.root / package,
+            args.output,
+            max_tokens=args.max_tokens,
+            overlap=args.overlap,
+            model_name=args.model,
+            force=args.force,
+            batch_size=args.batch_size,
+            workers=args.workers,
+            model=model,
+        )
+        return package, meta, time.perf_counter() - started
+
+    built = skipped = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.parallel)) as pool:
+        for package, meta, seconds in pool.map(build, selected):
+            if meta is None:
+                skipped += 1
+                print(f"{package}: up to date")
+            else:
+                built += 1
+                print(f"{package}: {meta['count']} chunks in {seconds:.1f}s")
+
+    if args.prune:
+        for stale in sorted(set(p.name for p in args.output.iterdir() if p.is_dir()) - set(available)):
+            shutil.rmtree(args.output / stale)
+            print(f"{stale}: removed (package no longer present)")
+    kind = "embedded" if embeddings_available() else "text-only"
+    print(f"Built {built} {kind} shard(s), {skipped} up to date, in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,16 +3,70 @@ Create simple text chunks from raw Macaulay2 docs for embedding-based search.
 
 Example:
     uv run python src/scripts/chunk_docs.py --root data/macaulay2docs --output data/m2_chunks.jsonl
+
+Use `--mode tokens` to size chunks with the encoder's own tokenizer instead of
+whitespace words; windows are then packed up to the model's `max_seq_length`
+and aligned to `doc///` block and section edges.
+
+Use `--index-dir` to skip the jsonl entirely and stream chunks straight into
+the encoder and a FAISS index saved under that directory:
+    uv run python src/scripts/chunk_docs.py --index-dir data/m2_chunk_index
+
+`--dedupe-threshold 0.85` drops near-duplicate chunks (MinHash + LSH) and
+writes a dropped -> canonical map next to the output so citations resolve.
 """
 
 from __future__ import annotations
 
 import argparse
 import json
+import re
+import time
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable, List, Tuple
+from typing import Callable, Dict, Iterable, List, Optional, Protocol, Tuple
 
+from src.m2rag.ingest.constants import SECTION_NAMES
+from src.m2rag.ingest.dedupe import MinHashDeduper, save_duplicates
 from src.m2rag.ingest.reader import read_m2_files
+from src.m2rag.ingest.summary import summarize_chunk
+
+# A segment starts at a doc/// or document{ opener or at a section header line,
+# and ends after a closing `///`.
+_SEGMENT_START = re.compile(rf"^\s*(?:doc\s*///|document\s*\{{|(?:{'|'.join(SECTION_NAMES)})\s*$)")
+_SEGMENT_END = re.compile(r"^\s*///\s*$")
+
+
+class SupportsTokenize(Protocol):
+    def tokenize(self, text: str) -> List[str]:
+        ...
+
+
+@dataclass
+class ChunkStats:
+    """Token accounting for a chunk build, measured with the encoder tokenizer."""
+
+    limit: int
+    chunks: int = 0
+    tokens: int = 0
+    max_chunk_tokens: int = 0
+    truncated_chunks: int = 0
+    truncated_tokens: int = 0
+
+    def add(self, n_tokens: int) -> None:
+        self.chunks += 1
+        self.tokens += n_tokens
+        self.max_chunk_tokens = max(self.max_chunk_tokens, n_tokens)
+        if n_tokens > self.limit:
+            self.truncated_chunks += 1
+            self.truncated_tokens += n_tokens - self.limit
+
+    def summary(self) -> str:
+        pct = 100.0 * self.truncated_tokens / self.tokens if self.tokens else 0.0
+        return (
+            f"{self.chunks} chunks, {self.tokens} tokens (limit {self.limit}/chunk, max seen {self.max_chunk_tokens}); "
+            f"{self.truncated_chunks} chunks truncated, {self.truncated_tokens} tokens never embedded ({pct:.1f}%)"
+        )
 
 
 def chunk_tokens(tokens: List[str], max_tokens: int, overlap: int) -> Iterable[Tuple[str, int, int]]:
@@ -33,42 +87,273 @@ def chunk_tokens(tokens: List[str], max_tokens: int, overlap: int) -> Iterable[T
         start = end - overlap
 
 
-def build_chunks(root: Path, max_tokens: int, overlap: int) -> Iterable[dict]:
+def split_segments(content: str) -> List[List[str]]:
+    """
+    Split raw .m2 text into word lists at doc/// block and section edges.
+    """
+    segments: List[List[str]] = []
+    current: List[str] = []
+    for line in content.splitlines():
+        if _SEGMENT_START.match(line) and current:
+            segments.append(current)
+            current = []
+        current.extend(line.split())
+        if _SEGMENT_END.match(line) and current:
+            segments.append(current)
+            current = []
+    if current:
+        segments.append(current)
+    return segments
+
+
+def token_counter(tokenizer: SupportsTokenize) -> Callable[[str], int]:
+    """
+    Count word-pieces per whitespace word. BERT-style tokenizers pre-split on
+    whitespace, so per-word counts sum to the count for the joined text.
+    """
+    cache: Dict[str, int] = {}
+
+    def count(word: str) -> int:
+        n = cache.get(word)
+        if n is None:
+            n = cache[word] = len(tokenizer.tokenize(word))
+        return n
+
+    return count
+
+
+def chunk_segments(
+    segments: List[List[str]],
+    count: Callable[[str], int],
+    max_tokens: int,
+    overlap: int,
+) -> Iterable[Tuple[str, int, int, int]]:
+    """
+    Yield (chunk_text, start_idx, end_idx, n_tokens) windows of at most
+    max_tokens tokenizer tokens. Windows end on a segment edge when that keeps
+    them at least half full; otherwise they are cut on a word boundary and
+    carry `overlap` tokens into the next window.
+    """
+    if overlap >= max_tokens:
+        raise ValueError("overlap must be smaller than max_tokens")
+
+    words = [word for segment in segments for word in segment]
+    costs = [count(word) for word in words]
+    edges = set()
+    offset = 0
+    for segment in segments:
+        offset += len(segment)
+        edges.add(offset)
+
+    start = 0
+    while start < len(words):
+        end, used = start, 0
+        while end < len(words) and (end == start or used + costs[end] <= max_tokens):
+            used += costs[end]
+            end += 1
+
+        at_edge = end == len(words) or end in edges
+        if not at_edge:
+            # Back off to the last edge, unless that would leave the window mostly empty.
+            last_edge = max((e for e in edges if start < e < end), default=None)
+            if last_edge is not None:
+                trimmed = sum(costs[last_edge:end])
+                if used - trimmed >= max_tokens // 2:
+                    used -= trimmed
+                    end, at_edge = last_edge, True
+
+        yield " ".join(words[start:end]), start, end, used
+        if end == len(words):
+            break
+        if at_edge:
+            start = end
+            continue
+
+        # Carry up to `overlap` tokens of context, but always make progress.
+        next_start, carried = end, 0
+        while next_start - 1 > start and carried + costs[next_start - 1] <= overlap:
+            next_start -= 1
+            carried += costs[next_start]
+        start = next_start
+
+
+def load_tokenizer(model_name: str) -> Tuple[SupportsTokenize, int]:
+    """
+    Return the encoder's tokenizer and its per-chunk token budget
+    (max_seq_length minus the special tokens added at encode time).
+    """
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name)
+    tokenizer = model.tokenizer
+    special = tokenizer.num_special_tokens_to_add() if hasattr(tokenizer, "num_special_tokens_to_add") else 2
+    return tokenizer, model.max_seq_length - special
+
+
+def build_chunks(
+    root: Path,
+    max_tokens: int,
+    overlap: int,
+    tokenizer: Optional[SupportsTokenize] = None,
+    stats: Optional[ChunkStats] = None,
+) -> Iterable[dict]:
     """
     Read .m2 files and produce chunk dicts with text and metadata.
+
+    Without a tokenizer, chunks are fixed windows of whitespace words. With one,
+    windows are packed by real tokenizer counts along block/section edges and
+    each chunk records its `n_tokens`, accumulated into `stats` if given.
     """
+    count = token_counter(tokenizer) if tokenizer is not None else None
     for m2file in read_m2_files(str(root)):
-        tokens = m2file.content.split()
-        for idx, (chunk, start, end) in enumerate(chunk_tokens(tokens, max_tokens, overlap)):
-            yield {
+        if count is not None:
+            windows = chunk_segments(split_segments(m2file.content), count, max_tokens, overlap)
+        else:
+            tokens = m2file.content.split()
+            windows = ((chunk, start, end, None) for chunk, start, end in chunk_tokens(tokens, max_tokens, overlap))
+
+        for idx, (chunk, start, end, n_tokens) in enumerate(windows):
+            record = {
                 "text": chunk,
                 "source": m2file.path,
                 "chunk_id": idx,
                 "token_start": start,
                 "token_end": end,
+                "summary": summarize_chunk(chunk),
             }
+            if n_tokens is not None:
+                record["n_tokens"] = n_tokens
+                if stats is not None:
+                    stats.add(n_tokens)
+            yield record
 
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Chunk raw .m2 docs for embedding search.")
     parser.add_argument("--root", type=Path, default=Path("data") / "macaulay2docs", help="Path to raw .m2 docs root.")
     parser.add_argument("--output", type=Path, default=Path("data") / "m2_chunks.jsonl", help="Output jsonl path.")
-    parser.add_argument("--max-tokens", type=int, default=200, help="Max tokens per chunk (default: 200).")
+    parser.add_argument(
+        "--mode",
+        choices=["words", "tokens"],
+        default="words",
+        help="Count chunk size in whitespace words or encoder tokenizer tokens (default: words).",
+    )
+    parser.add_argument(
+        "--max-tokens",
+        type=int,
+        help="Max tokens per chunk (default: 200 words, or the model's max_seq_length in tokens mode).",
+    )
     parser.add_argument("--overlap", type=int, default=40, help="Token overlap between chunks (default: 40).")
+    parser.add_argument("--model", default=None, help="SentenceTransformer whose tokenizer sizes chunks in tokens mode.")
+    parser.add_argument(
+        "--index-dir",
+        type=Path,
+        help="Stream chunks into an embedded index saved in this directory instead of writing --output.",
+    )
+    parser.add_argument("--batch-size", type=int, default=64, help="Chunks per encode batch when streaming (default: 64).")
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=8,
+        help="Max batches buffered between chunking and encoding when streaming (default: 8).",
+    )
+    parser.add_argument("--workers", type=int, default=2, help="Encoder worker threads when streaming (default: 2).")
+    parser.add_argument(
+        "--dim",
+        type=int,
+        help="Reduce stored vectors to this many dimensions when streaming (default: keep the encoder's).",
+    )
+    parser.add_argument(
+        "--reduction",
+        choices=["pca", "truncate"],
+        default="pca",
+        help="How --dim reduces vectors: fit a PCA, or keep the leading dims of a Matryoshka model (default: pca).",
+    )
+    parser.add_argument(
+        "--dedupe-threshold",
+        type=float,
+        help="Drop chunks whose estimated Jaccard similarity to an earlier chunk is at least this (e.g. 0.85).",
+    )
+    parser.add_argument("--dedupe-perm", type=int, default=128, help="MinHash permutations for dedupe (default: 128).")
+    parser.add_argument(
+        "--report-truncation",
+        action="store_true",
+        help="Load the encoder tokenizer and report tokens that would be truncated at encode time.",
+    )
     return parser.parse_args()
 
 
 def main() -> None:
     args = parse_args()
-    args.output.parent.mkdir(parents=True, exist_ok=True)
+    started = time.perf_counter()
+    if not args.index_dir:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+
+    tokenizer = None
+    stats = None
+    max_tokens = args.max_tokens or 200
+    if args.mode == "tokens" or args.report_truncation:
+        from src.db.chunk_index import DEFAULT_MODEL
+
+        tokenizer, limit = load_tokenizer(args.model or DEFAULT_MODEL)
+        stats = ChunkStats(limit=limit)
+        if args.mode == "tokens":
+            max_tokens = min(args.max_tokens or limit, limit)
+
+    chunk_tokenizer = tokenizer if args.mode == "tokens" else None
+    # In words mode the tokenizer is only used to measure what gets truncated.
+    measure = token_counter(tokenizer) if tokenizer is not None and chunk_tokenizer is None else None
+
+    deduper = MinHashDeduper(args.dedupe_threshold, num_perm=args.dedupe_perm) if args.dedupe_threshold else None
+
+    def measured_chunks() -> Iterable[dict]:
+        chunks = build_chunks(args.root, max_tokens, args.overlap, tokenizer=chunk_tokenizer, stats=stats)
+        if deduper is not None:
+            chunks = deduper.filter(chunks)
+        for chunk in chunks:
+            if measure is not None:
+                stats.add(sum(measure(word) for word in chunk["text"].split()))
+            yield chunk
+
+    if args.index_dir:
+        from src.db.chunk_index import ChunkEmbeddedIndex, DEFAULT_MODEL
+        from src.db.reduction import reduced_dim, vector_bytes
 
-    with args.output.open("w", encoding="utf-8") as f:
-        count = 0
-        for chunk in build_chunks(args.root, args.max_tokens, args.overlap):
-            f.write(json.dumps(chunk, ensure_ascii=False) + "\n")
-            count += 1
+        index = ChunkEmbeddedIndex.from_stream(
+            measured_chunks(),
+            model_name=args.model or DEFAULT_MODEL,
+            store_dir=args.index_dir,
+            batch_size=args.batch_size,
+            queue_size=args.queue_size,
+            workers=args.workers,
+            dim=args.dim,
+            reduction=args.reduction,
+        )
+        run = index.stream_stats
+        print(
+            f"Indexed {run.chunks} chunks in {run.batches} batches to {args.index_dir} "
+            f"({time.perf_counter() - started:.1f}s total, {run.encode_seconds:.1f}s encoding, "
+            f"max queue depth {run.max_queue_depth}/{args.queue_size})"
+        )
+        if index.index is not None and args.dim:
+            print(f"Vectors reduced to {reduced_dim(index.index)} dims ({args.reduction}): {vector_bytes(index.index) / 1e6:.2f} MB")
+        if deduper is not None and index.index is not None:
+            saved_mb = deduper.stats.dropped * reduced_dim(index.index) * 4 / 1e6
+            print(f"Dedupe saved {saved_mb:.2f} MB of vectors")
+    else:
+        with args.output.open("w", encoding="utf-8") as f:
+            count = 0
+            for chunk in measured_chunks():
+                f.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+                count += 1
+        print(f"Wrote {count} chunks to {args.output} ({time.perf_counter() - started:.1f}s total)")
 
-    print(f"Wrote {count} chunks to {args.output}")
+    if deduper is not None:
+        mapping_path = save_duplicates(args.index_dir or args.output, deduper.duplicates)
+        build_seconds = time.perf_counter() - started
+        print(f"Dedupe: {deduper.stats.summary()} of a {build_seconds:.1f}s build; duplicate map saved to {mapping_path}")
+    if stats is not None:
+        print(f"Token stats: {stats.summary()}")
 
 
 if __name__ == "__main__":
@@ -1,28 +1,96 @@
+"""
+Download Macaulay2 documentation sources from the M2 GitHub repository.
+
+    uv run python src/scripts/get_data.py                      # Macaulay2Doc -> data/macaulay2docs
+    uv run python src/scripts/get_data.py --all-packages       # every package -> data/packages/<Package>/
+    uv run python src/scripts/get_data.py --package Schubert2  # selected packages
+
+A package is its top-level `<Package>.m2` file plus its `<Package>/` directory;
+both are saved under `data/packages/<Package>/` for `build_shards.py`. Set
+GITHUB_TOKEN to raise the GitHub API rate limit for full downloads.
+"""
+
+import argparse
 import os
+
 import requests
 
+CONTENTS_URL = "https://api.github.com/repos/Macaulay2/M2/contents/M2/Macaulay2/packages"
+REF = "stable"
+
 # GitHub API endpoint for directory contents
-API_URL = "https://api.github.com/repos/Macaulay2/M2/contents/M2/Macaulay2/packages/Macaulay2Doc?ref=stable"
+API_URL = f"{CONTENTS_URL}/Macaulay2Doc?ref={REF}"
 
 # Local save directory
 SAVE_DIR = os.path.join('data', 'macaulay2docs')
-os.makedirs(SAVE_DIR, exist_ok=True)
+PACKAGES_DIR = os.path.join('data', 'packages')
+
+
+def _headers():
+    token = os.getenv("GITHUB_TOKEN")
+    return {"Authorization": f"Bearer {token}"} if token else {}
+
+
+def _download_file(f, save_dir):
+    print(f"Downloading {f['path']}...")
+    data = requests.get(f["download_url"], headers=_headers()).text
+    with open(os.path.join(save_dir, f["name"]), "w", encoding="utf-8") as fp:
+        fp.write(data)
 
-# Fetch directory listing
-response = requests.get(API_URL)
-files = response.json()
 
 def download_dir(api_url, save_dir):
     os.makedirs(save_dir, exist_ok=True)
-    response = requests.get(api_url)
+    response = requests.get(api_url, headers=_headers())
     response.raise_for_status()
     for f in response.json():
         if f["type"] == "dir":
             download_dir(f["url"], os.path.join(save_dir, f["name"]))
         elif f["type"] == "file" and f["name"].endswith(".m2"):
-            print(f"Downloading {f['path']}...")
-            data = requests.get(f["download_url"]).text
-            with open(os.path.join(save_dir, f["name"]), "w", encoding="utf-8") as fp:
-                fp.write(data)
+            _download_file(f, save_dir)
+
+
+def list_packages():
+    """Map package name -> {"file": entry or None, "dir": entry or None} from the packages directory."""
+    response = requests.get(f"{CONTENTS_URL}?ref={REF}", headers=_headers())
+    response.raise_for_status()
+    packages = {}
+    for f in response.json():
+        if f["type"] == "file" and f["name"].endswith(".m2"):
+            packages.setdefault(f["name"][: -len(".m2")], {})["file"] = f
+        elif f["type"] == "dir":
+            packages.setdefault(f["name"], {})["dir"] = f
+    # Directories without a matching .m2 file are shared resources, not packages (Macaulay2Doc excepted).
+    return {name: entry for name, entry in packages.items() if "file" in entry or name == "Macaulay2Doc"}
+
+
+def download_package(name, entry, packages_dir=PACKAGES_DIR):
+    save_dir = os.path.join(packages_dir, name)
+    os.makedirs(save_dir, exist_ok=True)
+    if entry.get("file"):
+        _download_file(entry["file"], save_dir)
+    if entry.get("dir"):
+        download_dir(entry["dir"]["url"], save_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download Macaulay2 documentation sources.")
+    parser.add_argument("--all-packages", action="store_true", help=f"Download every package into {PACKAGES_DIR}/<Package>/.")
+    parser.add_argument("--package", action="append", help=f"Download this package into {PACKAGES_DIR}/<Package>/ (repeatable).")
+    args = parser.parse_args()
+
+    if not (args.all_packages or args.package):
+        download_dir(API_URL, SAVE_DIR)
+        return
+
+    packages = list_packages()
+    names = sorted(packages) if args.all_packages else args.package
+    missing = [name for name in names if name not in packages]
+    if missing:
+        raise SystemExit(f"Unknown package(s): {', '.join(missing)}")
+    for name in names:
+        download_package(name, packages[name])
+    print(f"Downloaded {len(names)} package(s) to {PACKAGES_DIR}")
+
 
-download_dir(API_URL, SAVE_DIR)
+if __name__ == "__main__":
+    main()
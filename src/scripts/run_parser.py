@@ -1,6 +1,9 @@
 import json
 
+from src.db.links import LinkGraph
+from src.db.symbols import SymbolIndex
 from src.m2rag.ingest.extract import parse_all_docs
+from src.m2rag.ingest.summary import summarize_entry
 
 
 def main():
@@ -8,8 +11,15 @@ def main():
     print(f"Parsed {len(docs)} documentation entries.")
     with open("data/m2_docs.jsonl", "w", encoding="utf-8") as f:
         for d in docs:
+            d["summary"] = summarize_entry(d)
             f.write(json.dumps(d, ensure_ascii=False) + "\n")
     print("Saved to m2_docs.jsonl")
+    symbols = SymbolIndex(docs)
+    symbols.save("data/m2_symbols.json")
+    print(f"Saved {len(symbols.keys)} symbols to m2_symbols.json")
+    links = LinkGraph.from_symbols(symbols)
+    links.save("data/m2_links.npz")
+    print(f"Saved {len(links.indices)} SeeAlso links to m2_links.npz")
     if warn_count:
         print(f"[WARN] {warn_count} entries missing headline/description")
     else:
@@ -0,0 +1,450 @@
+"""
+Long-lived HTTP server that keeps the index and agent warm between queries.
+
+    python -m src.server --port 8000 --search-workers 4
+
+Endpoints (JSON unless noted):
+    GET  /healthz                 process is up
+    GET  /readyz                  200 once the index and agent are loaded, 503 before
+    GET  /search?q=...&k=5        search results (POST {"query", "k"} also works);
+                                  &expand=1 adds SeeAlso-linked pages
+    POST /ask {"query", ...}      NDJSON stream: {"type": "answer", "text": ...} chunks of the
+                                  `answer` field as the model writes it, then one
+                                  {"type": "final", "answer", "references"} (or {"type": "error"})
+
+Built on asyncio streams so it needs no web framework. Every request runs in
+its own task with its own tool_state(), and CPU search runs on the bounded
+search pool (--search-workers / M2_SEARCH_WORKERS).
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from src.logging_utils import log_event
+from src.resources import configure_threads, thread_plan_event
+from src.tools.state import tool_state
+from src.tracing import ModelRequestTracker, trace_run
+
+MAX_BODY_BYTES = 1 << 20
+# pydantic-ai's name for the structured-output tool; only its args carry the answer.
+OUTPUT_TOOL_PREFIX = "final_result"
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    query: Dict[str, str]
+    headers: Dict[str, str]
+    body: bytes = b""
+    _json: Optional[Dict[str, Any]] = field(default=None, repr=False)
+
+    def json(self) -> Dict[str, Any]:
+        if self._json is None:
+            try:
+                payload = json.loads(self.body or b"{}")
+            except json.JSONDecodeError as exc:
+                raise HTTPError(400, f"invalid JSON body: {exc}") from exc
+            if not isinstance(payload, dict):
+                raise HTTPError(400, "JSON body must be an object")
+            self._json = payload
+        return self._json
+
+    def param(self, name: str, default: Any = None) -> Any:
+        if name in self.query:
+            return self.query[name]
+        return self.json().get(name, default) if self.method == "POST" else default
+
+
+def _flag(value: Any) -> bool:
+    """A boolean request parameter: true for JSON true and "1"/"true"/"yes"/"on" (query strings are text)."""
+    return value is not None and str(value).lower() in {"1", "true", "yes", "on"}
+
+
+def _dumps(payload: Any) -> bytes:
+    # Scores from FAISS come back as numpy scalars.
+    return json.dumps(payload, ensure_ascii=False, default=lambda o: o.item() if hasattr(o, "item") else str(o)).encode(
+        "utf-8"
+    )
+
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[Request]:
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+    try:
+        method, target, _version = request_line.decode("latin-1").split(" ", 2)
+    except ValueError as exc:
+        raise HTTPError(400, "malformed request line") from exc
+
+    headers: Dict[str, str] = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    raw_length = headers.get("content-length") or "0"
+    if not (raw_length.isascii() and raw_length.isdigit()):
+        raise HTTPError(400, "invalid Content-Length")
+    length = int(raw_length)
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, f"body larger than {MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length else b""
+    url = urlsplit(target)
+    query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+    return Request(method=method.upper(), path=url.path, query=query, headers=headers, body=body)
+
+
+async def send_json(writer: asyncio.StreamWriter, status: int, payload: Any) -> None:
+    body = _dumps(payload)
+    head = (
+        f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n"
+    )
+    writer.write(head.encode("latin-1") + body)
+    await writer.drain()
+
+
+class ChunkedResponse:
+    """HTTP/1.1 chunked response, used to stream NDJSON events."""
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+
+    async def start(self, content_type: str = "application/x-ndjson") -> None:
+        self.writer.write(
+            (
+                "HTTP/1.1 200 OK\r\n"
+                f"Content-Type: {content_type}\r\n"
+                "Transfer-Encoding: chunked\r\n"
+                "Cache-Control: no-cache\r\n"
+                "Connection: close\r\n\r\n"
+            ).encode("latin-1")
+        )
+        await self.writer.drain()
+
+    async def send(self, payload: Dict[str, Any]) -> None:
+        data = _dumps(payload) + b"\n"
+        self.writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+        await self.writer.drain()
+
+    async def end(self) -> None:
+        self.writer.write(b"0\r\n\r\n")
+        await self.writer.drain()
+
+
+class RagServer:
+    def __init__(
+        self,
+        *,
+        search_workers: Optional[int] = None,
+        max_concurrent_asks: int = 32,
+        request_limit: Optional[int] = 50,
+        rag_agent=None,
+    ):
+        self.search_workers = search_workers
+        self.request_limit = request_limit
+        self.rag_agent = rag_agent
+        self.ready = False
+        self.load_error: Optional[str] = None
+        self.started = time.time()
+        self._ask_slots = asyncio.Semaphore(max_concurrent_asks)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._load_task: Optional[asyncio.Task] = None
+
+    def _load(self) -> None:
+        from src.tools import search
+
+        search.get_index()  # build the index and load the encoder once, before /readyz
+        if self.search_workers:
+            search.configure_search_executor(self.search_workers)
+        else:
+            search.get_search_executor()
+        if self.rag_agent is None:
+            from src.agents.rag_agent import rag_agent
+
+            self.rag_agent = rag_agent
+
+    async def warm_up(self) -> None:
+        try:
+            await asyncio.to_thread(self._load)
+        except Exception as exc:  # noqa: BLE001
+            self.load_error = f"{type(exc).__name__}: {exc}"
+            log_event({"event": "server_load_failed", "error": self.load_error})
+            return
+        self.ready = True
+        log_event({"event": "server_ready", "seconds": round(time.time() - self.started, 2)})
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8000) -> asyncio.AbstractServer:
+        """Start listening immediately; the index loads in the background (see /readyz)."""
+        self._server = await asyncio.start_server(self._handle, host, port)
+        self._load_task = asyncio.create_task(self.warm_up())
+        return self._server
+
+    @property
+    def port(self) -> int:
+        assert self._server is not None, "server not started"
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._load_task is not None:
+            await self._load_task
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            try:
+                request = await read_request(reader)
+                if request is None:
+                    return
+                await self._route(request, writer)
+            except HTTPError as exc:
+                await send_json(writer, exc.status, {"error": exc.message})
+            except (asyncio.IncompleteReadError, ConnectionError):
+                return
+            except Exception as exc:  # noqa: BLE001
+                log_event({"event": "server_error", "error": f"{type(exc).__name__}: {exc}"})
+                await send_json(writer, 500, {"error": "internal error"})
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _route(self, request: Request, writer: asyncio.StreamWriter) -> None:
+        routes = {
+            "/healthz": (("GET",), self._healthz),
+            "/readyz": (("GET",), self._readyz),
+            "/search": (("GET", "POST"), self._search),
+            "/ask": (("POST",), self._ask),
+        }
+        if request.path not in routes:
+            raise HTTPError(404, f"no route for {request.path}")
+        methods, handler = routes[request.path]
+        if request.method not in methods:
+            raise HTTPError(405, f"{request.path} accepts {', '.join(methods)}")
+        if request.path in {"/search", "/ask"} and not self.ready:
+            raise HTTPError(503, self.load_error or "index is still loading")
+        await handler(request, writer)
+
+    async def _healthz(self, request: Request, writer: asyncio.StreamWriter) -> None:
+        await send_json(writer, 200, {"status": "ok", "uptime_s": round(time.time() - self.started, 1)})
+
+    async def _readyz(self, request: Request, writer: asyncio.StreamWriter) -> None:
+        if not self.ready:
+            await send_json(writer, 503, {"ready": False, "error": self.load_error})
+            return
+        from src.tools.search import index_snapshot_version
+
+        await send_json(writer, 200, {"ready": True, "index": index_snapshot_version()})
+
+    async def _search(self, request: Request, writer: asyncio.StreamWriter) -> None:
+        from src.tools.search import SearchDocsArgs, search_docs_async
+
+        query = request.param("q") or request.param("query")
+        if not query:
+            raise HTTPError(400, "missing query (q)")
+        try:
+            k = int(request.param("k", 5))
+        except (TypeError, ValueError) as exc:
+            raise HTTPError(400, "k must be an integer") from exc
+        expand = _flag(request.param("expand"))
+        started = time.perf_counter()
+        with tool_state(), trace_run():
+            results = await search_docs_async(SearchDocsArgs(query=str(query), k=max(1, min(k, 50)), expand=expand))
+        await send_json(
+            writer, 200, {"query": query, "results": results, "elapsed_ms": round(1000 * (time.perf_counter() - started), 1)}
+        )
+
+    async def _ask(self, request: Request, writer: asyncio.StreamWriter) -> None:
+        query = request.param("query")
+        if not query:
+            raise HTTPError(400, "missing query")
+        retrieval_first = _flag(request.param("retrieval_first"))
+        run_id = str(uuid.uuid4())
+        response = ChunkedResponse(writer)
+        await response.start()
+        # The 200 status line is already sent: from here on, errors are reported in the stream.
+        try:
+            await self._stream_ask(response, query, retrieval_first, run_id)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            raise
+        except Exception as exc:  # noqa: BLE001
+            log_event({"event": "server_ask_error", "query": query, "error": str(exc)}, run_id=run_id)
+            await response.send({"type": "error", "error": f"{type(exc).__name__}: {exc}"})
+            await response.end()
+
+    async def _stream_ask(self, response: ChunkedResponse, query: str, retrieval_first: bool, run_id: str) -> None:
+        from pydantic_ai import messages as ai_messages, usage as ai_usage
+        from pydantic_ai.run import AgentRunResultEvent
+
+        from src.main import answer_chunk_handler
+
+        pending: list[str] = []
+        handle_chunk = answer_chunk_handler(pending.append)
+        streaming = False  # whether the current part carries the answer (text or the output tool's args)
+        started = time.perf_counter()
+        final_result = None
+        async with self._ask_slots:
+            with tool_state() as state, trace_run(run_id):
+                requests = ModelRequestTracker()
+                history = None
+                if retrieval_first:
+                    from src.agents.rag_agent import retrieval_first_history_async
+
+                    history = await retrieval_first_history_async(query)
+                else:
+                    from src.tools.search import start_prefetch
+
+                    start_prefetch(query)
+                async for event in self.rag_agent.run_stream_events(
+                    None if history else query,
+                    message_history=history,
+                    usage_limits=ai_usage.UsageLimits(request_limit=self.request_limit),
+                ):
+                    requests.on_event(event)
+                    if isinstance(event, ai_messages.PartStartEvent):
+                        part = event.part
+                        streaming = isinstance(part, ai_messages.TextPart) or (
+                            isinstance(part, ai_messages.ToolCallPart) and part.tool_name.startswith(OUTPUT_TOOL_PREFIX)
+                        )
+                        if streaming:
+                            # A fresh parser per attempt; a retried answer restarts the stream.
+                            handle_chunk = answer_chunk_handler(pending.append)
+                            content = part.content if isinstance(part, ai_messages.TextPart) else part.args
+                            handle_chunk(content if isinstance(content, str) else json.dumps(content))
+                    elif isinstance(event, ai_messages.PartDeltaEvent) and streaming:
+                        delta = event.delta
+                        if isinstance(delta, ai_messages.TextPartDelta):
+                            handle_chunk(delta.content_delta)
+                        elif isinstance(delta, ai_messages.ToolCallPartDelta) and isinstance(delta.args_delta, str):
+                            handle_chunk(delta.args_delta)
+                    elif isinstance(event, AgentRunResultEvent):
+                        final_result = event.result
+                    if pending:
+                        await response.send({"type": "answer", "text": "".join(pending)})
+                        pending.clear()
+
+        if final_result is None:
+            raise RuntimeError("stream ended without a final result")
+        output = final_result.output
+        await response.send({"type": "final", "answer": output.answer, "references": output.references})
+        await response.end()
+        log_event(
+            {
+                "event": "server_ask",
+                "query": query,
+                "mode": "retrieval_first" if retrieval_first else "tool_first",
+                "elapsed_ms": round(1000 * (time.perf_counter() - started), 1),
+                "requests": final_result.usage().requests,
+                "prefetch": state.prefetch_stats,
+                "validator": state.validator_stats,
+            },
+            run_id=run_id,
+        )
+
+
+async def serve(host: str, port: int, **kwargs: Any) -> None:
+    server = RagServer(**kwargs)
+    listener = await server.start(host, port)
+    print(f"Serving on http://{host}:{server.port} (loading index...)", flush=True)
+    async with listener:
+        await listener.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve /search and /ask over HTTP with a warm index.")
+    parser.add_argument("--host", default=os.getenv("M2_SERVER_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("M2_SERVER_PORT", "8000")))
+    parser.add_argument(
+        "--index-mode",
+        choices=["docs", "chunks", "shards"],
+        help="Index mode to use (overrides M2_INDEX_MODE).",
+    )
+    parser.add_argument(
+        "--search-workers",
+        type=int,
+        help="Threads for CPU search work (default: M2_SEARCH_WORKERS, else the CPU thread plan).",
+    )
+    parser.add_argument(
+        "--max-concurrent-asks",
+        type=int,
+        default=32,
+        help="Max /ask runs in flight; further requests wait (default: 32).",
+    )
+    parser.add_argument(
+        "--request-limit",
+        type=int,
+        default=50,
+        help="Max model requests per /ask run (set to 0 or negative to disable).",
+    )
+    parser.add_argument(
+        "--cpu-profile",
+        choices=["latency", "throughput"],
+        help="Thread budget profile for the encoder, FAISS and worker pools (default: M2_CPU_PROFILE or latency).",
+    )
+    args = parser.parse_args()
+
+    try:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+    except Exception:
+        pass
+    # --search-workers also sizes the shard fan-out and OpenMP threads nested under each worker.
+    configure_threads(args.cpu_profile, default="latency", search_workers=args.search_workers)
+    log_event(thread_plan_event(entry="server"))
+    if args.index_mode:
+        os.environ["M2_INDEX_MODE"] = args.index_mode
+    else:
+        os.environ.setdefault("M2_INDEX_MODE", "chunks")
+
+    request_limit = None if args.request_limit and args.request_limit <= 0 else args.request_limit
+    try:
+        asyncio.run(
+            serve(
+                args.host,
+                args.port,
+                search_workers=args.search_workers,
+                max_concurrent_asks=args.max_concurrent_asks,
+                request_limit=request_limit,
+            )
+        )
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
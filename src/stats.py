@@ -0,0 +1,14 @@
+"""Small statistics helpers shared by the trace summary, the loop-lag monitor and the benchmarks."""
+
+from __future__ import annotations
+
+import math
+from typing import List
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list: the ceil(q/100 * n)-th value."""
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(q * len(ordered) / 100))
+    return ordered[min(rank, len(ordered)) - 1]
@@ -1,50 +1,384 @@
 from __future__ import annotations
 
+import asyncio
+import contextvars
+import hashlib
 import os
-from typing import List, Dict
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Dict, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
-from src.db.chunk_index import ChunkEmbeddedIndex, ChunkMinsearchIndex, create_index as create_chunk_index
-from src.db.emb_index import EmbeddedDocIndex, create_index as create_doc_index
-from src.db.ms_index import MinsearchDocIndex
+from src.db.index_store import data_version
+from src.resources import current_plan, limit_omp_threads
+from src.tools.state import Prefetch, get_tool_state
+from src.tracing import span, traced
 
-SearchIndex = EmbeddedDocIndex | MinsearchDocIndex | ChunkEmbeddedIndex | ChunkMinsearchIndex
+if TYPE_CHECKING:  # the index modules are imported when the index is first built
+    from src.db.chunk_index import ChunkEmbeddedIndex, ChunkMinsearchIndex
+    from src.db.emb_index import EmbeddedDocIndex
+    from src.db.links import LinkGraph
+    from src.db.ms_index import MinsearchDocIndex
+    from src.db.shards import ShardedIndex
+    from src.db.symbols import SymbolIndex
+
+    SearchIndex = EmbeddedDocIndex | MinsearchDocIndex | ChunkEmbeddedIndex | ChunkMinsearchIndex | ShardedIndex
 
 
 def _build_index() -> SearchIndex:
     """
     Choose which index to load based on M2_INDEX_MODE.
-    - "chunks": use chunked raw doc index (data/m2_chunks.jsonl).
+    - "chunks": use chunked raw doc index (data/m2_chunks.jsonl, or the jsonl/index
+      directory named by M2_CHUNK_PATH).
+    - "shards": per-package shards (data/m2_shards, or M2_SHARDS_DIR), optionally
+      limited to the comma-separated packages in M2_SHARD_PACKAGES.
     - default: structured doc index (data/m2_docs.jsonl).
     """
     mode = os.getenv("M2_INDEX_MODE", "docs").lower()
+    if mode in {"shard", "shards"}:
+        from src.db.shards import SHARDS_DIR, create_index as create_sharded_index
+
+        packages = [name.strip() for name in os.getenv("M2_SHARD_PACKAGES", "").split(",") if name.strip()]
+        return create_sharded_index(Path(os.getenv("M2_SHARDS_DIR") or SHARDS_DIR), packages=packages or None)
     if mode in {"chunk", "chunks"}:
-        return create_chunk_index()
+        from src.db.chunk_index import create_index as create_chunk_index
+
+        chunk_path = os.getenv("M2_CHUNK_PATH")
+        return create_chunk_index(Path(chunk_path)) if chunk_path else create_chunk_index()
+    from src.db.emb_index import create_index as create_doc_index
+
     return create_doc_index()
 
 
-index: SearchIndex = _build_index()
-_last_search_results: List[Dict] = []
+# Built on first use by get_index() so importing this module stays cheap; tests may assign it directly.
+index: Optional[SearchIndex] = None
+_index_lock = threading.Lock()
+# Symbol table and SeeAlso link graph over the structured docs (src/db/symbols.py,
+# src/db/links.py); also built on first use.
+symbol_index: Optional[SymbolIndex] = None
+link_graph: Optional[LinkGraph] = None
+_link_ids: Dict[tuple, int] = {}
+_symbol_lock = threading.Lock()
+_executor: ThreadPoolExecutor | None = None
+
+# Prefetch a few more hits than the default k so a model asking for more still reuses it.
+PREFETCH_K = int(os.getenv("M2_PREFETCH_K", "10"))
+# Minimum word-set Jaccard similarity for a tool query to reuse the prefetched results.
+PREFETCH_SIMILARITY = float(os.getenv("M2_PREFETCH_SIMILARITY", "0.8"))
+# Linked pages added to the hits of a search with expand=True.
+EXPAND_LIMIT = int(os.getenv("M2_SEARCH_EXPAND_LIMIT", "3"))
+
+
+def get_index() -> SearchIndex:
+    """The process-wide search index, built (and its encoder loaded) on the first call."""
+    global index
+    if index is None:
+        with _index_lock:
+            if index is None:
+                index = _build_index()
+    return index
+
+
+def get_symbol_index() -> SymbolIndex:
+    """
+    The symbol lookup index, loaded on the first call from data/m2_symbols.json
+    (M2_SYMBOLS_PATH) and data/m2_docs.jsonl; empty when there are no structured docs.
+    """
+    global symbol_index
+    if symbol_index is None:
+        with _symbol_lock:
+            if symbol_index is None:
+                from src.db.symbols import DATA_PATH, SYMBOLS_PATH, SymbolIndex, create_index as create_symbol_index
+
+                symbols_path = Path(os.getenv("M2_SYMBOLS_PATH") or SYMBOLS_PATH)
+                symbol_index = create_symbol_index(DATA_PATH, symbols_path) if DATA_PATH.exists() else SymbolIndex([])
+    return symbol_index
+
+
+def get_link_graph() -> LinkGraph:
+    """The SeeAlso link graph over the symbol index's docs, from data/m2_links.npz (M2_LINKS_PATH) or built."""
+    global link_graph, _link_ids
+    symbols = get_symbol_index()
+    if link_graph is None:
+        with _symbol_lock:
+            if link_graph is None:
+                from src.db.links import LINKS_PATH, create_graph
+
+                _link_ids = {_doc_identity(doc): doc_id for doc_id, doc in enumerate(symbols.docs)}
+                link_graph = create_graph(symbols, Path(os.getenv("M2_LINKS_PATH") or LINKS_PATH))
+    return link_graph
+
+
+def _doc_identity(doc: Dict) -> tuple:
+    """Identify a doc across indexes, which store keys and casing differently."""
+    headline, usage = str(doc.get("headline") or "").lower(), str(doc.get("usage") or "").lower()
+    if not (headline or usage):
+        return ("text", doc.get("source"), doc.get("text"))
+    return ("doc", doc.get("source"), headline, usage)
+
+
+def _search(query: str, k: int, packages: Optional[List[str]] = None) -> List[Dict]:
+    # Symbols come from the structured docs, which have no package; skip them for package-scoped searches.
+    fast_path = not packages and os.getenv("M2_SYMBOL_LOOKUP", "1") != "0"
+    hits = get_symbol_index().lookup(query, limit=k) if fast_path else []
+    if sum(doc["match"] == "exact" for doc in hits) >= k:
+        return hits  # every slot answered by an exact name; no encode needed
+    search_index = get_index()
+    # Ask for extra results to make up for the ones that duplicate symbol hits.
+    if packages and getattr(search_index, "supports_packages", False):
+        results = search_index.search(query, k=k + len(hits), packages=packages)
+    else:
+        results = search_index.search(query, k=k + len(hits))
+    return _merge_hits(hits, results, k)
+
+
+def _as_chunk(doc: Dict) -> Dict:
+    """
+    A symbol hit in the chunk schema, so chunk-mode results share one shape.
+    headline and usage stay so the hit still resolves to its doc for expand_results.
+    """
+    keys = doc.get("keys") or []
+    parts = [", ".join(keys) if isinstance(keys, list) else keys]
+    parts += [doc.get(field) for field in ("headline", "usage", "description", "examples")]
+    chunk = {"text": " ".join(str(part) for part in parts if part), "source": doc.get("source")}
+    for field in ("headline", "usage", "summary", "match", "symbol"):
+        if doc.get(field):
+            chunk[field] = doc[field]
+    return chunk
+
+
+def _merge_hits(hits: List[Dict], results: List[Dict], k: int) -> List[Dict]:
+    """
+    Exact symbol hits first, then the vector results, with the weaker symbol
+    hits (methods, related pages, typo guesses) given at most half of the
+    remaining slots. Chunk results carry no headline, so in chunk mode symbol
+    hits take the chunk schema and chunks of a page already hit are dropped.
+    """
+    if not hits:
+        return results[:k]
+    if any(_doc_identity(doc)[0] == "text" for doc in results):
+        hits = [_as_chunk(doc) for doc in hits]
+        covered = {doc.get("source") for doc in hits}
+        results = [doc for doc in results if doc.get("source") not in covered]
+    else:
+        seen = {_doc_identity(doc) for doc in hits}
+        results = [doc for doc in results if _doc_identity(doc) not in seen]
+    exact = [doc for doc in hits if doc["match"] == "exact"]
+    guesses = [doc for doc in hits if doc["match"] != "exact"]
+    share = (k - len(exact)) // 2
+    return (exact + guesses[:share] + results + guesses[share:])[:k]
+
+
+def _search_and_expand(args: SearchDocsArgs) -> List[Dict]:
+    results = _search(args.query, args.k, args.packages)
+    return expand_results(results) if args.expand else results
+
+
+def expand_results(results: List[Dict], limit: int = EXPAND_LIMIT) -> List[Dict]:
+    """
+    Append up to `limit` SeeAlso neighbours of the hits that are structured docs,
+    best PageRank prior first. Chunk hits have no doc id and are not expanded.
+    """
+    from src.db.links import neighbour_docs
+
+    graph = get_link_graph()
+    doc_ids = [_link_ids[key] for key in map(_doc_identity, results) if key in _link_ids]
+    if not doc_ids or limit <= 0:
+        return results
+    with span("links.expand", hits=len(doc_ids)):
+        return results + neighbour_docs(graph, get_symbol_index().docs, doc_ids, limit)
+
+
+def index_snapshot_version(search_index: SearchIndex | None = None) -> str:
+    """
+    Short fingerprint of the loaded index: backend, encoder and the size/mtime of
+    its data file (or meta.json for a saved index directory). Changes whenever
+    the index is rebuilt.
+    """
+    search_index = search_index or get_index()
+    parts = [type(search_index).__name__, str(getattr(search_index, "model_name", ""))]
+    data_path = getattr(search_index, "data_path", None)
+    if data_path:
+        parts += data_version(data_path)
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:12]
+
+
+def configured_index_path() -> Path:
+    """The data file or directory `get_index()` would load for M2_INDEX_MODE, without loading it."""
+    mode = os.getenv("M2_INDEX_MODE", "docs").lower()
+    if mode in {"shard", "shards"}:
+        from src.db.shards import SHARDS_DIR
+
+        return Path(os.getenv("M2_SHARDS_DIR") or SHARDS_DIR)
+    if mode in {"chunk", "chunks"}:
+        from src.db.chunk_index import CHUNK_DATA_PATH
+
+        return Path(os.getenv("M2_CHUNK_PATH") or CHUNK_DATA_PATH)
+    from src.db.emb_index import DATA_PATH
+
+    return DATA_PATH
+
+
+def configured_snapshot_version() -> str:
+    """
+    Like `index_snapshot_version`, but for the index M2_INDEX_MODE would load,
+    from file stats alone: no index build and no encoder load. Changes whenever
+    that index is rebuilt or the mode, shard selection or encoder changes.
+    """
+    from src.db.chunk_index import DEFAULT_MODEL
+
+    parts = [os.getenv("M2_INDEX_MODE", "docs").lower(), os.getenv("M2_SHARD_PACKAGES", ""), DEFAULT_MODEL]
+    parts += data_version(configured_index_path())
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:12]
 
 
 class SearchDocsArgs(BaseModel):
     query: str
     k: int = 5
+    # Only honoured by the sharded index; other indexes search everything.
+    packages: Optional[List[str]] = Field(default=None, description="Restrict the search to these M2 packages.")
+    expand: bool = Field(default=False, description="Also return pages linked from the hits via SeeAlso.")
+
+
+def _query_terms(query: str) -> set[str]:
+    return set(re.findall(r"[\w^*+-]+", query.lower()))
+
+
+def queries_match(a: str, b: str, threshold: float = PREFETCH_SIMILARITY) -> bool:
+    """True when two queries are the same up to case, punctuation and a few words."""
+    terms_a, terms_b = _query_terms(a), _query_terms(b)
+    if not terms_a or not terms_b:
+        return False
+    return len(terms_a & terms_b) / len(terms_a | terms_b) >= threshold
+
+
+def start_prefetch(query: str, k: int = PREFETCH_K) -> Prefetch:
+    """
+    Start searching the raw prompt on the search pool while the model plans its
+    first tool call. The next search_docs call in this run reuses the results if
+    its query matches (see `queries_match`); either way the prefetch is consumed.
+    Hits, misses and time saved accumulate in the run's `prefetch_stats`; a
+    prefetch still unclaimed when the run's `tool_state()` scope ends is a miss.
+    """
+
+    def run() -> tuple[List[Dict], float]:
+        results = _search(query, k)
+        return results, time.perf_counter()
+
+    get_tool_state().drop_prefetch()  # a newer prefetch supersedes an unclaimed one
+    context = contextvars.copy_context()  # keep the caller's trace span as the parent
+    prefetch = Prefetch(query=query, k=k, future=get_search_executor().submit(context.run, run), started=time.perf_counter())
+    get_tool_state().prefetch = prefetch
+    return prefetch
+
+
+def _claim_prefetch(args: SearchDocsArgs) -> Optional[Prefetch]:
+    """Take this run's pending prefetch; return it only if it can answer `args`."""
+    state = get_tool_state()
+    prefetch = state.prefetch
+    if prefetch is None:
+        return None
+    if not args.packages and args.k <= prefetch.k and queries_match(args.query, prefetch.query):
+        state.prefetch = None
+        state.prefetch_stats["hits"] += 1
+        return prefetch
+    state.drop_prefetch()
+    return None
 
 
+def _use_prefetch(
+    prefetch: Prefetch, outcome: tuple[List[Dict], float], args: SearchDocsArgs, requested_at: float
+) -> List[Dict]:
+    results, finished = outcome
+    # Only the search time that overlapped the model's planning (before the call arrived) is saved.
+    saved = max(0.0, min(finished, requested_at) - prefetch.started)
+    get_tool_state().prefetch_stats["saved_ms"] += round(1000 * saved, 3)
+    return results[: args.k]
+
+
+def _tool_output(results: List[Dict]) -> List[Dict]:
+    """
+    Results as returned to the model: without the precomputed `summary`, which
+    only summarize_docs reads (from the cached results), so it costs no tokens here.
+    """
+    return [{key: value for key, value in doc.items() if key != "summary"} for doc in results]
+
+
+@traced("search_docs")
 def search_docs(args: SearchDocsArgs) -> List[Dict]:
     """
     Execute a semantic search and cache the most recent results.
     The cache lets downstream tools (like summarize_docs) reuse the latest docs.
     """
-    global _last_search_results
-    results = index.search(args.query, k=args.k)
+    requested_at = time.perf_counter()
+    prefetch = _claim_prefetch(args)
+    if prefetch is not None:
+        results = _use_prefetch(prefetch, prefetch.future.result(), args, requested_at)
+    else:
+        results = _search(args.query, args.k, args.packages)
+    if args.expand:
+        results = expand_results(results)
     # store a shallow copy so callers cannot mutate our cache in place
-    _last_search_results = list(results)
-    return results
+    get_tool_state().search_results = list(results)
+    return _tool_output(results)
 
 
 def get_last_search_results() -> List[Dict]:
-    """Return the cached results from the most recent search, if any."""
-    return list(_last_search_results)
+    """Return the cached results from the current run's most recent search, if any."""
+    return list(get_tool_state().search_results)
+
+
+def get_search_executor() -> ThreadPoolExecutor:
+    """
+    Bounded pool for CPU-heavy search work (query encoding + FAISS). Size comes
+    from M2_SEARCH_WORKERS, else the thread plan (see src/resources.py), unless
+    configured explicitly.
+    """
+    global _executor
+    if _executor is None:
+        _executor = _search_pool(current_plan().search_workers)
+    return _executor
+
+
+def _search_pool(workers: int) -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(
+        max_workers=max(1, workers),
+        thread_name_prefix="m2-search",
+        initializer=limit_omp_threads,
+        initargs=(current_plan().omp_threads,),
+    )
+
+
+def configure_search_executor(workers: int) -> ThreadPoolExecutor:
+    """Replace the search pool with one of `workers` threads."""
+    global _executor
+    previous, _executor = _executor, _search_pool(workers)
+    if previous is not None:
+        previous.shutdown(wait=False)
+    return _executor
+
+
+@traced("search_docs")
+async def search_docs_async(args: SearchDocsArgs) -> List[Dict]:
+    """
+    Execute a semantic search and cache the most recent results.
+    The cache lets downstream tools (like summarize_docs) reuse the latest docs.
+    """
+    requested_at = time.perf_counter()
+    prefetch = _claim_prefetch(args)
+    # Encoding, FAISS and link expansion (whose first call loads the link graph)
+    # run on the bounded search pool so the event loop stays free.
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    if prefetch is not None:
+        results = _use_prefetch(prefetch, await asyncio.wrap_future(prefetch.future), args, requested_at)
+        if args.expand:
+            results = await loop.run_in_executor(get_search_executor(), context.run, expand_results, results)
+    else:
+        results = await loop.run_in_executor(get_search_executor(), context.run, _search_and_expand, args)
+    get_tool_state().search_results = list(results)
+    return _tool_output(results)
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+from concurrent.futures import Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional
+
+
+@dataclass
+class Prefetch:
+    """
+    A speculative search started on the raw prompt before the model asks for one.
+    `future` resolves to (results, perf_counter() at completion).
+    """
+
+    query: str
+    k: int
+    future: Future
+    started: float
+
+
+@dataclass
+class ToolState:
+    """Scratch space shared by the tools and output validators of one agent run."""
+
+    search_results: List[Dict] = field(default_factory=list)
+    wiki_results: List[Dict] = field(default_factory=list)
+    prefetch: Optional[Prefetch] = None
+    prefetch_stats: Dict[str, float] = field(default_factory=lambda: {"hits": 0, "misses": 0, "saved_ms": 0.0})
+    # Output-validator outcomes: fixed in place vs. sent back to the model with ModelRetry.
+    validator_stats: Dict[str, int] = field(default_factory=lambda: {"repairs": 0, "retries": 0})
+
+    def drop_prefetch(self) -> None:
+        """Count a pending prefetch as a miss and cancel it (its search stops only if not yet running)."""
+        if self.prefetch is not None:
+            self.prefetch_stats["misses"] += 1
+            self.prefetch.future.cancel()
+            self.prefetch = None
+
+
+_current_state: ContextVar[Optional[ToolState]] = ContextVar("m2rag_tool_state", default=None)
+# Used when no run scope is active (one-off scripts, direct tool calls).
+_default_state = ToolState()
+
+
+def get_tool_state() -> ToolState:
+    """Return the state of the active run scope, or the process-wide fallback."""
+    return _current_state.get() or _default_state
+
+
+@contextmanager
+def tool_state(state: ToolState | None = None) -> Iterator[ToolState]:
+    """
+    Scope tool state to one agent run. Wrap each run (sync or inside its own
+    asyncio task) so concurrent runs never see each other's results:
+
+        with tool_state():
+            result = rag_agent.run_sync(query)
+
+    pydantic-ai copies the context into the threads that run sync tools, so the
+    tools mutate this same ToolState object rather than rebinding the variable.
+    A prefetch the run never claimed counts as a miss and is cancelled on exit.
+    """
+    state = state or ToolState()
+    token = _current_state.set(state)
+    try:
+        yield state
+    finally:
+        state.drop_prefetch()
+        _current_state.reset(token)
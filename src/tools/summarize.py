@@ -4,14 +4,37 @@ from typing import Dict, List, Optional
 
 from pydantic import BaseModel, Field
 
+from src.m2rag.ingest.summary import summarize_chunk, summarize_entry
 from src.tools.search import get_last_search_results
+from src.tracing import traced
 
 
 class SummarizeDocsArgs(BaseModel):
     # Default to None to avoid accidental mutation across requests.
     docs: Optional[List[Dict]] = Field(default=None)
+    max_words: int = Field(200, ge=20, le=1000, description="Approximate word budget for the digest.")
 
 
+def _doc_summary(doc: Dict) -> Dict:
+    """Precomputed summary, or one built on the fly for data indexed before summaries existed."""
+    summary = doc.get("summary")
+    if isinstance(summary, dict):
+        return summary
+    if "text" in doc and not doc.get("description"):
+        return summarize_chunk(doc["text"])
+    return summarize_entry(doc)
+
+
+def _title(doc: Dict, summary: Dict) -> str:
+    title = (doc.get("headline") or "").strip()
+    if not title:
+        title = (doc.get("usage") or summary.get("usage") or "").strip()
+    if not title and doc.get("source"):
+        title = f"{doc['source']}#{doc.get('chunk_id', 0)}"
+    return title or "Untitled"
+
+
+@traced("summarize_docs")
 def summarize_docs(args: SummarizeDocsArgs) -> str:
     docs = args.docs or get_last_search_results()
 
@@ -19,12 +42,24 @@ def summarize_docs(args: SummarizeDocsArgs) -> str:
         return "No relevant documentation found."
 
     summary_blocks: List[str] = []
+    budget = args.max_words
     for doc in docs[:5]:
-        headline = (doc.get("headline") or doc.get("usage") or "Untitled").strip()
-        description = (doc.get("description") or "").strip()
-        bullet = f"- **{headline}**"
-        if description:
-            bullet += f" {description}"
+        summary = _doc_summary(doc)
+        bullet = f"- **{_title(doc, summary)}**"
+        sentences = " ".join(summary.get("key_sentences") or [])
+        if sentences:
+            bullet += f" {sentences}"
+        if summary.get("usage") and summary["usage"] not in bullet:
+            bullet += f"\n  Usage: `{summary['usage']}`"
+        if summary.get("example"):
+            bullet += f"\n  Example: `{summary['example']}`"
+
+        words = bullet.split()
+        if len(words) > budget:
+            if summary_blocks:
+                break
+            bullet = " ".join(words[:budget]) + " ..."
+        budget -= len(words)
         summary_blocks.append(bullet)
 
     return "Here are the most relevant documentation details:\n" + "\n".join(summary_blocks)
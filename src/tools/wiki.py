@@ -1,7 +1,31 @@
 from __future__ import annotations
 
+import asyncio
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
 import requests
 from pydantic import BaseModel, Field
+from requests.adapters import HTTPAdapter
+
+from src.tools.state import get_tool_state
+from src.tracing import span, traced
+
+WIKI_ENDPOINT = os.getenv("M2_WIKI_ENDPOINT", "https://en.wikipedia.org/w/api.php")
+WIKI_CACHE_PATH = Path(
+    os.getenv("M2_WIKI_CACHE", Path(__file__).resolve().parent.parent.parent / "data" / "wiki_cache.json")
+)
+WIKI_CACHE_TTL = float(os.getenv("M2_WIKI_CACHE_TTL", 7 * 24 * 3600))
+# (connect, read) timeouts in seconds.
+WIKI_TIMEOUT = (3.05, 5.0)
+HEADERS = {
+    # Wikipedia requires an identifying User-Agent per https://meta.wikimedia.org/wiki/User-Agent_policy
+    "User-Agent": "m2-rag/0.1 (contact: jportin13@gmail.com)",
+}
 
 
 class SearchWikipediaArgs(BaseModel):
@@ -9,47 +33,167 @@ class SearchWikipediaArgs(BaseModel):
     limit: int = Field(3, ge=1, le=10, description="Maximum number of results to return.")
 
 
+class CircuitBreaker:
+    """
+    Fail fast while the endpoint is down: after `failure_threshold` consecutive
+    failures, calls are refused for `reset_after` seconds, then one trial call
+    is let through (half-open) to decide whether to close again.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_after: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None and time.monotonic() - self.opened_at < self.reset_after
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_after:
+                self.opened_at = time.monotonic()  # half-open: one trial, others keep failing fast
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+def _error_result(title: str, message: str) -> List[Dict]:
+    return [{"title": title, "snippet": message, "url": "", "source": "Wikipedia"}]
+
+
+class WikiClient:
+    """Pooled HTTP session + on-disk TTL cache + circuit breaker around the MediaWiki search API."""
+
+    def __init__(
+        self,
+        endpoint: str = WIKI_ENDPOINT,
+        cache_path: Path | None = WIKI_CACHE_PATH,
+        ttl: float = WIKI_CACHE_TTL,
+        timeout: tuple[float, float] = WIKI_TIMEOUT,
+        breaker: CircuitBreaker | None = None,
+    ):
+        self.endpoint = endpoint
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.ttl = ttl
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=8)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._cache: Optional[Dict[str, Dict]] = None
+        self._lock = threading.Lock()
+
+    def _load_cache(self) -> Dict[str, Dict]:
+        if self._cache is None:
+            self._cache = {}
+            if self.cache_path and self.cache_path.exists():
+                try:
+                    self._cache = json.loads(self.cache_path.read_text(encoding="utf-8"))
+                except (OSError, json.JSONDecodeError):
+                    self._cache = {}
+        return self._cache
+
+    def _save_cache(self) -> None:
+        if not self.cache_path:
+            return
+        cutoff = time.time() - self.ttl
+        live = {k: v for k, v in self._load_cache().items() if v["fetched"] >= cutoff}
+        self._cache = live
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_name(self.cache_path.name + ".tmp")
+        tmp_path.write_text(json.dumps(live, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, self.cache_path)
+
+    def search(self, query: str, limit: int = 3) -> List[Dict]:
+        key = f"{limit}:{' '.join(query.lower().split())}"
+        with self._lock:
+            entry = self._load_cache().get(key)
+            if entry and time.time() - entry["fetched"] < self.ttl:
+                return list(entry["results"])
+
+        if not self.breaker.allow():
+            return _error_result("Wikipedia search unavailable", "Wikipedia is not responding; skipped the request.")
+
+        params = {
+            "action": "query",
+            "list": "search",
+            "format": "json",
+            "srlimit": limit,
+            "srsearch": query,
+            "origin": "*",  # CORS-friendly and required by some gateways
+        }
+        try:
+            with span("wiki.http"):
+                resp = self.session.get(self.endpoint, params=params, timeout=self.timeout)
+                resp.raise_for_status()
+                data = resp.json()
+        except (requests.RequestException, ValueError) as exc:
+            self.breaker.record_failure()
+            return _error_result("Wikipedia search failed", f"{type(exc).__name__}: {exc}")
+        self.breaker.record_success()
+
+        cleaned = []
+        for item in data.get("query", {}).get("search", []) or []:
+            title = item.get("title", "").strip()
+            snippet = item.get("snippet", "").replace("<span class=\"searchmatch\">", "").replace("</span>", "")
+            cleaned.append(
+                {
+                    "title": title,
+                    "snippet": snippet,
+                    "url": f"https://en.wikipedia.org/wiki/{title.replace(' ', '_')}",
+                    "source": f"Wikipedia: {title}",
+                }
+            )
+
+        with self._lock:
+            self._load_cache()[key] = {"fetched": time.time(), "results": cleaned}
+            self._save_cache()
+        return cleaned
+
+
+_client: WikiClient | None = None
+
+
+def get_wiki_client() -> WikiClient:
+    global _client
+    if _client is None:
+        _client = WikiClient()
+    return _client
+
+
+@traced("search_wikipedia")
 def search_wikipedia(args: SearchWikipediaArgs) -> list[dict]:
     """
     Search Wikipedia and return basic snippets for the top results.
     """
-    params = {
-        "action": "query",
-        "list": "search",
-        "format": "json",
-        "srlimit": args.limit,
-        "srsearch": args.query,
-        "origin": "*",  # CORS-friendly and required by some gateways
-    }
-    headers = {
-        # Wikipedia requires an identifying User-Agent per https://meta.wikimedia.org/wiki/User-Agent_policy
-        "User-Agent": "m2-rag/0.1 (contact: jportin13@gmail.com)",
-    }
-    try:
-        resp = requests.get("https://en.wikipedia.org/w/api.php", params=params, headers=headers, timeout=10)
-        resp.raise_for_status()
-    except requests.HTTPError as exc:
-        return [
-            {
-                "title": "Wikipedia search failed",
-                "snippet": f"HTTP error: {exc}",
-                "url": "",
-                "source": "Wikipedia",
-            }
-        ]
-    data = resp.json()
-    results = data.get("query", {}).get("search", []) or []
-
-    cleaned = []
-    for item in results:
-        title = item.get("title", "").strip()
-        snippet = item.get("snippet", "").replace("<span class=\"searchmatch\">", "").replace("</span>", "")
-        cleaned.append(
-            {
-                "title": title,
-                "snippet": snippet,
-                "url": f"https://en.wikipedia.org/wiki/{title.replace(' ', '_')}",
-                "source": f"Wikipedia: {title}",
-            }
-        )
-    return cleaned
+    results = get_wiki_client().search(args.query, args.limit)
+    get_tool_state().wiki_results = list(results)
+    return results
+
+
+@traced("search_wikipedia")
+async def search_wikipedia_async(args: SearchWikipediaArgs) -> list[dict]:
+    """
+    Search Wikipedia and return basic snippets for the top results.
+    """
+    # The blocking HTTP call runs in a worker thread; the pooled session is thread-safe for GETs.
+    results = await asyncio.to_thread(get_wiki_client().search, args.query, args.limit)
+    get_tool_state().wiki_results = list(results)
+    return results
@@ -0,0 +1,170 @@
+"""
+Lightweight span tracing into the run log.
+
+Spans are only recorded inside a `trace_run()` scope, which binds the run id
+they are logged under. Nesting follows contextvars, so spans opened in tools,
+index searches and validators point at their parent (including across
+pydantic-ai's worker threads and `asyncio.to_thread`, which copy the context).
+
+    with trace_run(run_id):
+        with span("search_docs", k=5):
+            ...
+
+Each span is one `{"event": "span", "name", "span_id", "parent_id",
+"duration_ms", "status", ...attrs}` record; `python -m src.cli.trace_summary`
+aggregates them per stage.
+"""
+
+from __future__ import annotations
+
+import functools
+import inspect
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional, TypeVar
+
+from src.logging_utils import log_event
+
+TRACING_ENABLED = os.getenv("M2_TRACE", "1").lower() not in {"0", "false", "no"}
+
+_run_id: ContextVar[Optional[str]] = ContextVar("m2rag_trace_run_id", default=None)
+_span_id: ContextVar[Optional[str]] = ContextVar("m2rag_trace_span_id", default=None)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+def current_run_id() -> Optional[str]:
+    return _run_id.get()
+
+
+@contextmanager
+def trace_run(run_id: Optional[str] = None) -> Iterator[str]:
+    """Record spans opened in this scope under `run_id` (a new id if omitted)."""
+    run_id = run_id or str(uuid.uuid4())
+    run_token = _run_id.set(run_id)
+    span_token = _span_id.set(None)
+    try:
+        yield run_id
+    finally:
+        _span_id.reset(span_token)
+        _run_id.reset(run_token)
+
+
+def emit_span(
+    name: str,
+    duration: float,
+    *,
+    parent_id: Optional[str] = None,
+    span_id: Optional[str] = None,
+    status: str = "ok",
+    **attrs: Any,
+) -> None:
+    """Log an already-measured span (for stages that are not a single block of code)."""
+    run_id = _run_id.get()
+    if run_id is None or not TRACING_ENABLED:
+        return
+    log_event(
+        {
+            "event": "span",
+            "name": name,
+            "span_id": span_id or uuid.uuid4().hex[:16],
+            "parent_id": parent_id if parent_id is not None else _span_id.get(),
+            "duration_ms": round(1000 * duration, 3),
+            "status": status,
+            **attrs,
+        },
+        run_id=run_id,
+    )
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Time the enclosed block as a child of the current span. Yields the attrs
+    dict so the block can add fields (e.g. result counts) before it is logged.
+    """
+    if _run_id.get() is None or not TRACING_ENABLED:
+        yield attrs
+        return
+    span_id = uuid.uuid4().hex[:16]
+    parent_id = _span_id.get()
+    token = _span_id.set(span_id)
+    started = time.perf_counter()
+    status = "ok"
+    try:
+        yield attrs
+    except BaseException as exc:
+        status = type(exc).__name__
+        raise
+    finally:
+        _span_id.reset(token)
+        emit_span(name, time.perf_counter() - started, parent_id=parent_id, span_id=span_id, status=status, **attrs)
+
+
+def traced(name: str) -> Callable[[F], F]:
+    """Decorator form of `span` for sync and async functions."""
+
+    def decorate(fn: F) -> F:
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with span(name):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper  # type: ignore[return-value]
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
+
+
+class ModelRequestTracker:
+    """
+    Derive `model.request` spans from a pydantic-ai event stream: a request
+    starts when the run starts or the last tool result comes back, its
+    time-to-first-token ends at the first response part, and it ends when the
+    response's tool calls start running (or the run finishes).
+    """
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.first_part: Optional[float] = None
+        self.open = True
+        self.count = 0
+
+    def on_event(self, event: Any) -> None:
+        from pydantic_ai import messages as ai_messages
+        from pydantic_ai.run import AgentRunResultEvent
+
+        now = time.perf_counter()
+        if isinstance(event, ai_messages.PartStartEvent):
+            if self.open and self.first_part is None:
+                self.first_part = now
+        elif isinstance(event, ai_messages.FunctionToolCallEvent):
+            self._close(now)
+        elif isinstance(event, ai_messages.FunctionToolResultEvent):
+            self.started, self.first_part, self.open = now, None, True
+        elif isinstance(event, AgentRunResultEvent):
+            self._close(now)
+
+    def _close(self, now: float) -> None:
+        if not self.open:
+            return
+        self.open = False
+        self.count += 1
+        ttft = (self.first_part - self.started) if self.first_part is not None else None
+        emit_span(
+            "model.request",
+            now - self.started,
+            request=self.count,
+            ttft_ms=round(1000 * ttft, 3) if ttft is not None else None,
+        )
@@ -10,6 +10,28 @@ from src.agents.judge_agent import judge_agent
 from src.agents.rag_agent import rag_agent
 from src.db.emb_index import create_index as create_emb_index, EmbeddedDocIndex
 from src.db.ms_index import create_index as create_ms_index, MinsearchDocIndex
+from src.db.symbols import SymbolIndex
+from src.tools import search as search_tool
+from src.tools import wiki as wiki_tool
+
+
+@pytest.fixture(autouse=True)
+def run_log_in_tmp(monkeypatch, tmp_path):
+    """Send run-log events to tmp_path instead of appending to logs/runs.jsonl."""
+    monkeypatch.setenv("LOG_PATH", str(tmp_path / "runs.jsonl"))
+
+
+@pytest.fixture(autouse=True)
+def wiki_cache_in_tmp(monkeypatch, tmp_path):
+    """Keep search_wikipedia's on-disk cache in tmp_path instead of data/wiki_cache.json."""
+    monkeypatch.setattr(wiki_tool, "_client", wiki_tool.WikiClient(cache_path=tmp_path / "wiki_cache.json"))
+
+
+@pytest.fixture(autouse=True)
+def no_symbol_fast_path(monkeypatch):
+    """Keep the local data/m2_docs.jsonl out of tests that swap in a fake search index."""
+    monkeypatch.setattr(search_tool, "symbol_index", SymbolIndex([]))
+    monkeypatch.setattr(search_tool, "link_graph", None)
 
 
 @pytest.fixture(scope="session")
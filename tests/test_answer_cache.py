@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import json
+
+import numpy as np
+
+from src.answer_cache import AnswerCache
+
+VOCAB = ["define", "monomial", "ideal", "hilbert", "polynomial", "how", "do", "i", "a", "make"]
+
+
+def bag_of_words(query: str) -> np.ndarray:
+    words = query.lower().replace("?", "").split()
+    return np.array([words.count(term) for term in VOCAB], dtype="float32")
+
+
+def test_exact_hit_ignores_case_and_punctuation(tmp_path):
+    cache = AnswerCache("idx:model", tmp_path / "cache.json")
+    cache.put("How do I define a monomial ideal?", "Use monomialIdeal.", ["[a.m2] monomialIdeal"])
+
+    hit = AnswerCache("idx:model", tmp_path / "cache.json").get("how do i define a   MONOMIAL ideal")
+    assert hit["match"] == "exact"
+    assert hit["references"] == ["[a.m2] monomialIdeal"]
+    assert AnswerCache("other-index:model", tmp_path / "cache.json").get("how do i define a monomial ideal") is None
+
+
+def test_near_hit_uses_embeddings(tmp_path):
+    cache = AnswerCache("idx:model", tmp_path / "cache.json", encode=bag_of_words, threshold=0.8)
+    cache.put("how do i define a monomial ideal", "Use monomialIdeal.", [])
+
+    assert cache.get("how do i make a monomial ideal")["match"] == "near"
+    assert cache.get("hilbert polynomial") is None
+
+
+def test_ttl_and_lru_eviction(tmp_path):
+    cache = AnswerCache("idx:model", tmp_path / "cache.json", max_entries=2)
+    cache.put("first", "1", [])
+    cache.put("second", "2", [])
+    cache.get("first")  # refresh, so "second" is least recently used
+    cache.put("third", "3", [])
+    assert cache.get("second") is None
+    assert cache.get("first") is not None
+
+    expired = AnswerCache("idx:model", tmp_path / "cache.json", ttl=0)
+    assert expired.get("first") is None
+
+
+def test_lru_order_survives_reload(tmp_path):
+    path = tmp_path / "cache.json"
+    cache = AnswerCache("idx:model", path, max_entries=2)
+    cache.put("first", "1", [])
+    cache.put("second", "2", [])
+    cache.flush()
+
+    other = AnswerCache("idx:model", path)
+    other.get("first")  # another process refreshes "first"
+    other.flush()
+    AnswerCache("idx:model", path, max_entries=2).put("third", "3", [])
+    reloaded = AnswerCache("idx:model", path)
+    assert reloaded.get("second") is None
+    assert reloaded.get("first") is not None
+
+
+def test_hits_stay_in_memory_and_puts_are_debounced(tmp_path):
+    path = tmp_path / "cache.json"
+    cache = AnswerCache("idx:model", path, save_interval=60)
+    cache.put("first", "1", [])  # the first put writes straight away
+    saved = path.read_text(encoding="utf-8")
+
+    cache.put("second", "2", [])
+    assert cache.get("first")["answer"] == "1"
+    assert path.read_text(encoding="utf-8") == saved
+
+    cache.flush()
+    assert [row["query"] for row in json.loads(path.read_text(encoding="utf-8"))] == ["second", "first"]
+
+
+def test_exact_hit_does_not_load_the_index(tmp_path, monkeypatch):
+    from src.answer_cache import answer_cache_for
+    from src.tools import search as search_tool
+
+    chunks = tmp_path / "chunks.jsonl"
+    chunks.write_text('{"text": "monomialIdeal"}\n', encoding="utf-8")
+    monkeypatch.setenv("M2_INDEX_MODE", "chunks")
+    monkeypatch.setenv("M2_CHUNK_PATH", str(chunks))
+    monkeypatch.setenv("M2_ANSWER_CACHE", str(tmp_path / "cache.json"))
+    monkeypatch.setattr(search_tool, "get_index", lambda: (_ for _ in ()).throw(AssertionError("index loaded")))
+
+    namespace = f"{search_tool.configured_snapshot_version()}:model"
+    AnswerCache(namespace).put("define a monomial ideal", "Use monomialIdeal.", [])
+    assert answer_cache_for(None, model_name="model").get("Define a monomial ideal?")["match"] == "exact"
+
+    chunks.write_text('{"text": "monomialIdeal"}\n{"text": "ideal"}\n', encoding="utf-8")  # rebuilt index
+    assert answer_cache_for(None, model_name="model").get("define a monomial ideal") is None
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+from src.cli.search_common import SearchBackend
+
+SCRIPT = Path(__file__).resolve().parent.parent / "scripts" / "benchmark_retrieval.py"
+
+
+def _load_script():
+    spec = importlib.util.spec_from_file_location("benchmark_retrieval", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+bench = _load_script()
+
+DOCS = [
+    {"keys": ["hilbertPolynomial"], "usage": "hilbertPolynomial M", "source": "hilbert.m2"},
+    {"keys": ["mo", "omialIdeal"], "usage": "monomialIdeal f", "source": "monomial.m2"},
+    {"keys": ["dim"], "usage": "dim R", "source": "dim.m2"},
+]
+
+
+def test_labels_resolve_through_keys_then_usage():
+    assert bench.label_sources("hilbertPolynomial", DOCS) == {"hilbert.m2"}
+    assert bench.label_sources("monomialIdeal", DOCS) == {"monomial.m2"}  # mangled keys, usage still matches
+    assert bench.label_sources("veronese", DOCS) == set()
+
+
+def test_metrics():
+    ranked = ["a.m2", "b.m2", "c.m2"]
+    assert bench.recall_at_k(ranked, {"b.m2", "z.m2"}, k=2) == 0.5
+    assert bench.reciprocal_rank(ranked, {"c.m2"}) == pytest.approx(1 / 3)
+    assert bench.ndcg_at_k(ranked, {"a.m2"}, k=3) == 1.0
+    assert bench.ndcg_at_k(["x.m2", "a.m2"], {"a.m2"}, k=2) == pytest.approx(0.6309, abs=1e-4)
+    # Several chunks of one file count once, at the rank of its first chunk.
+    assert bench.ranked_sources([{"source": "a.m2"}, {"source": "a.m2"}, {"source": "b.m2"}]) == ["a.m2", "b.m2"]
+
+
+def test_benchmark_backend_reports_quality_and_latency(tmp_path):
+    class KeywordIndex:
+        def search(self, query, k=5):
+            hits = [doc for doc in DOCS if doc["usage"].split()[0].lower() in query.lower()]
+            return hits[:k]
+
+    backend = SearchBackend(
+        description="fake",
+        default_data_path=tmp_path,
+        default_model=None,
+        create_index=lambda _path, _model: KeywordIndex(),
+        print_results=lambda *_: None,
+        name="fake",
+    )
+    queries = bench.resolve_labels(
+        [
+            {"query": "hilbertPolynomial of a module", "relevant": ["hilbertPolynomial"]},
+            {"query": "size of a ring", "relevant": ["dim"]},
+            {"query": "unlabeled", "relevant": ["veronese"]},
+        ],
+        DOCS,
+    )
+    row = bench.benchmark_backend(backend, queries, k=3, repeats=2)
+
+    assert row["backend"] == "fake"
+    assert row["queries_scored"] == 2
+    assert row["recall@3"] == 0.5 and row["mrr"] == 0.5
+    assert row["latency_ms"]["samples"] == 4
+
+
+def test_ranked_sources_drops_shard_package_prefix():
+    results = [
+        {"source": "Macaulay2Doc/functions/ideal-doc.m2", "package": "Macaulay2Doc"},
+        {"source": "functions/ideal-doc.m2"},
+        {"source": "hilbert.m2"},
+    ]
+    assert bench.ranked_sources(results) == ["functions/ideal-doc.m2", "hilbert.m2"]
+
+
+def test_benchmark_dimensions_reindexes_the_same_vectors(tmp_path):
+    faiss = pytest.importorskip("faiss")
+    import numpy as np
+
+    vectors = np.random.default_rng(0).standard_normal((len(DOCS), 16)).astype("float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    class VectorIndex:
+        """Query i of the benchmark is encoded as doc i's vector."""
+
+        def __init__(self):
+            self.docs = DOCS
+            self.index = faiss.IndexFlatIP(16)
+            self.index.add(vectors)
+
+        def search(self, query, k=5):
+            row = next(i for i, doc in enumerate(DOCS) if doc["usage"].split()[0] in query)
+            _, ids = self.index.search(vectors[row : row + 1], k)
+            return [DOCS[i] for i in ids[0] if i != -1]
+
+    builds = []
+    backend = SearchBackend(
+        description="fake",
+        default_data_path=tmp_path,
+        default_model=None,
+        create_index=lambda _path, _model: builds.append(1) or VectorIndex(),
+        print_results=lambda *_: None,
+        name="vectors",
+    )
+    queries = bench.resolve_labels(
+        [{"query": "hilbertPolynomial M", "relevant": ["hilbertPolynomial"]}, {"query": "dim R", "relevant": ["dim"]}],
+        DOCS,
+    )
+    rows = bench.benchmark_dimensions(backend, queries, [8, 2], method="truncate", k=1, repeats=1)
+
+    assert len(builds) == 1
+    assert [row["backend"] for row in rows] == ["vectors", "vectors/truncate8", "vectors/truncate2"]
+    assert [row["dim"] for row in rows] == [16, 8, 2]
+    assert [row["index_bytes"] for row in rows] == [3 * 16 * 4, 3 * 8 * 4, 3 * 2 * 4]
+    assert rows[0]["recall@1"] == rows[1]["recall@1"] == 1.0
@@ -0,0 +1,45 @@
+import importlib.util
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+SCRIPT = ROOT / "scripts" / "check_import_time.py"
+
+
+def load_script():
+    spec = importlib.util.spec_from_file_location("check_import_time", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+SAMPLE = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |     faiss._swigfaiss
+import time:      3000 |       3120 |   faiss.loader
+import time:       200 |       3320 | src.db.emb_index
+import time:        50 |       3370 | src.cli.query_index
+"""
+
+
+def test_parse_importtime_and_forbidden():
+    check = load_script()
+    modules = check.parse_importtime(SAMPLE)
+    assert modules["src.cli.query_index"] == (50, 3370)
+    assert modules["faiss._swigfaiss"] == (120, 120)
+    assert check.forbidden_imports(modules, check.HEAVY_MODULES) == ["faiss"]
+    assert check.slowest(modules, n=1) == [("faiss.loader", 3.0)]
+
+
+def test_text_search_cli_does_not_import_heavy_backends():
+    check = load_script()
+    modules = check.measure("src.cli.query_ms_index")
+    assert "src.cli.query_ms_index" in modules
+    assert check.forbidden_imports(modules, check.HEAVY_MODULES) == []
+
+
+def test_importing_search_tool_does_not_build_index():
+    check = load_script()
+    modules = check.measure("src.tools.search")
+    assert not {"minsearch", "faiss", "sentence_transformers"} & {name.split(".")[0] for name in modules}
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from src.scripts.chunk_docs import ChunkStats, chunk_segments, split_segments, token_counter
+
+
+class PieceTokenizer:
+    """Deterministic stand-in for a word-piece tokenizer: 4 characters per piece."""
+
+    def tokenize(self, text: str) -> list[str]:
+        return [text[i : i + 4] for i in range(0, len(text), 4)]
+
+
+CONTENT = """doc ///
+Key
+  monomialIdeal
+Headline
+  make a monomial ideal
+Description
+  Text
+    This function creates a monomial ideal from a matrix or a list of monomials in a polynomial ring.
+  Example
+    R = QQ[x,y,z]
+    I = monomialIdeal(x^2, y^3, x*y*z)
+///
+"""
+
+
+def test_split_segments_follows_sections():
+    segments = split_segments(CONTENT)
+    heads = [segment[0] for segment in segments]
+    assert heads[:4] == ["doc", "Key", "Headline", "Description"]
+    assert segments[-1][-1] == "///"
+
+
+def test_chunk_segments_respects_token_budget():
+    count = token_counter(PieceTokenizer())
+    segments = split_segments(CONTENT)
+    windows = list(chunk_segments(segments, count, max_tokens=16, overlap=4))
+
+    assert len(windows) > 1
+    for text, start, end, n_tokens in windows:
+        assert n_tokens <= 16
+        assert n_tokens == sum(count(word) for word in text.split())
+        assert end > start
+    assert windows[-1][2] == sum(len(segment) for segment in segments)
+
+
+def test_chunk_stats_reports_truncation():
+    stats = ChunkStats(limit=10)
+    for n_tokens in (4, 10, 15):
+        stats.add(n_tokens)
+
+    assert stats.truncated_chunks == 1
+    assert stats.truncated_tokens == 5
+    assert stats.max_chunk_tokens == 15
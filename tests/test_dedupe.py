@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+from src.m2rag.ingest.dedupe import MinHashDeduper, attach_duplicate_sources, choose_bands
+
+BASE = (
+    "A hash table consists of keys and values and provides fast lookup of values by key "
+    "for any key in the table, see also MutableHashTable for mutable variants"
+)
+
+
+def test_choose_bands_matches_threshold():
+    bands, rows = choose_bands(128, 0.8)
+    assert bands * rows == 128
+    assert abs((1 / bands) ** (1 / rows) - 0.8) < 0.1
+
+
+def test_near_duplicates_are_dropped_and_mapped():
+    chunks = [
+        {"text": BASE, "source": "a.m2", "chunk_id": 0},
+        {"text": BASE + " here", "source": "b.m2", "chunk_id": 3},
+        {"text": "The Krull dimension of a ring is the supremum of lengths of chains of primes", "source": "c.m2", "chunk_id": 0},
+    ]
+    deduper = MinHashDeduper(threshold=0.8)
+    kept = list(deduper.filter(chunks))
+
+    assert [c["source"] for c in kept] == ["a.m2", "c.m2"]
+    assert deduper.duplicates == {"b.m2#3": "a.m2#0"}
+    assert deduper.stats.dropped == 1
+
+    attach_duplicate_sources(kept, deduper.duplicates)
+    assert kept[0]["duplicate_sources"] == ["b.m2"]
+    assert kept[0]["duplicate_chunks"] == ["b.m2#3"]
+
+
+def test_same_source_duplicates_are_recorded():
+    kept = [{"text": BASE, "source": "a.m2", "chunk_id": 0}]
+    attach_duplicate_sources(kept, {"a.m2#4": "a.m2#0", "b.m2#1": "a.m2#0"})
+    assert kept[0]["duplicate_chunks"] == ["a.m2#4", "b.m2#1"]
+    assert kept[0]["duplicate_sources"] == ["b.m2"]  # its own file is not a second citation
+
+    only_own = [{"text": BASE, "source": "a.m2", "chunk_id": 0}]
+    attach_duplicate_sources(only_own, {"a.m2#4": "a.m2#0"})
+    assert only_own[0]["duplicate_chunks"] == ["a.m2#4"] and "duplicate_sources" not in only_own[0]
+
+
+def test_chunk_docs_reports_build_time_with_dedupe(tmp_path, monkeypatch, capsys):
+    from src.scripts import chunk_docs
+
+    root = tmp_path / "docs"
+    root.mkdir()
+    (root / "a.m2").write_text(BASE, encoding="utf-8")
+    (root / "b.m2").write_text(BASE, encoding="utf-8")
+    output = tmp_path / "chunks.jsonl"
+    monkeypatch.setattr("sys.argv", ["chunk_docs", "--root", str(root), "--output", str(output), "--dedupe-threshold", "0.85"])
+    chunk_docs.main()
+
+    printed = capsys.readouterr().out
+    assert f"Wrote 1 chunks to {output} (" in printed and "s total)" in printed
+    assert "dropped 1 near-duplicates" in printed and "s build; duplicate map saved" in printed
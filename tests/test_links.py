@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+
+import numpy as np
+
+from src.db.links import LinkGraph, create_graph, pagerank
+from src.db.symbols import SymbolIndex
+from src.tools import search as search_tool
+from src.tools.search import SearchDocsArgs, search_docs
+
+DOCS = [
+    {"keys": ["monomialIdeal", "monomialIdeal, Matrix"], "headline": "make a monomial ideal", "source": "a.m2", "seealso": ["ideal"]},
+    {"keys": ["ideal"], "headline": "make an ideal", "source": "a.m2", "seealso": ["dim", "hilbertPolynomial", "undocumented"]},
+    {"keys": ["dim"], "headline": "compute the Krull dimension", "source": "b.m2", "seealso": ["ideal"]},
+    {"keys": ["hilbertPolynomial"], "headline": "compute the Hilbert polynomial", "source": "b.m2", "seealso": ["ideal", "dim"]},
+    {"keys": ["Matrix"], "headline": "the class of all matrices", "source": "c.m2", "seealso": []},
+]
+
+
+def test_graph_is_csr_of_resolved_references():
+    graph = LinkGraph.from_symbols(SymbolIndex(DOCS))
+    assert graph.indptr.tolist() == [0, 2, 4, 5, 7, 7]
+    # SeeAlso first, then the type named in the method key; unknown symbols are dropped.
+    assert graph.neighbours(0).tolist() == [1, 4]
+    assert graph.neighbours(1).tolist() == [2, 3]
+    assert graph.neighbours(4).tolist() == []
+
+
+def test_pagerank_prior_favours_well_linked_docs():
+    graph = LinkGraph.from_symbols(SymbolIndex(DOCS))
+    assert abs(float(graph.prior.sum()) - 1.0) < 1e-5
+    assert int(np.argmax(graph.prior)) == 1  # "ideal" is linked from three docs
+    assert pagerank(np.zeros(1, dtype="int64"), np.zeros(0, dtype="int32")).size == 0
+
+
+def test_expand_ranks_neighbours_by_prior_and_skips_hits():
+    graph = LinkGraph.from_symbols(SymbolIndex(DOCS))
+    assert graph.expand([0], limit=5) == [1, 4]
+    assert graph.expand([1, 3], limit=5) == [2]
+    assert graph.expand([0], limit=1) == [1]
+
+
+def test_saved_graph_round_trips_and_rebuilds_when_stale(tmp_path):
+    symbols = SymbolIndex(DOCS)
+    path = tmp_path / "links.npz"
+    LinkGraph.from_symbols(symbols).save(path)
+    loaded = create_graph(symbols, path)
+    assert loaded.indices.tolist() == LinkGraph.from_symbols(symbols).indices.tolist()
+
+    LinkGraph.from_symbols(SymbolIndex(DOCS[::-1])).save(path)  # same size, different docs
+    assert create_graph(symbols, path).neighbours(0).tolist() == [1, 4]
+
+
+def test_search_docs_expand_appends_linked_pages(monkeypatch):
+    class VectorIndex:
+        def search(self, query, k=5):
+            # Vector hits are normalized copies (joined, lower-cased keys) of the structured docs.
+            return [{"keys": "ideal", "headline": "make an ideal", "source": "a.m2", "score": 0.9}]
+
+    monkeypatch.setattr(search_tool, "index", VectorIndex())
+    monkeypatch.setattr(search_tool, "symbol_index", SymbolIndex(DOCS))
+
+    plain = search_docs(SearchDocsArgs(query="how do I make an ideal", k=1))
+    assert [doc["headline"] for doc in plain] == ["make an ideal"]
+
+    expanded = search_docs(SearchDocsArgs(query="how do I make an ideal", k=1, expand=True))
+    assert [doc["headline"] for doc in expanded][0] == "make an ideal"
+    assert {doc["headline"] for doc in expanded[1:]} == {"compute the Krull dimension", "compute the Hilbert polynomial"}
+    assert all(doc["match"] == "seealso" and "prior" in doc for doc in expanded[1:])
+
+
+def test_search_docs_async_expands_on_the_search_pool(monkeypatch):
+    class VectorIndex:
+        def search(self, query, k=5):
+            return [{"keys": "ideal", "headline": "make an ideal", "source": "a.m2", "score": 0.9}]
+
+    monkeypatch.setattr(search_tool, "index", VectorIndex())
+    monkeypatch.setattr(search_tool, "symbol_index", SymbolIndex(DOCS))
+    expand_threads = []
+    expand = search_tool.expand_results
+    monkeypatch.setattr(search_tool, "expand_results", lambda results: expand_threads.append(threading.get_ident()) or expand(results))
+
+    async def run() -> tuple[list, int]:
+        results = await search_tool.search_docs_async(SearchDocsArgs(query="how do I make an ideal", k=1, expand=True))
+        return results, threading.get_ident()
+
+    results, loop_thread = asyncio.run(run())
+    assert len(results) == 3 and expand_threads and loop_thread not in expand_threads
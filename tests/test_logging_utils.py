@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import json
+import threading
+
+from src.logging_utils import EventLogger
+
+
+def _records(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_deltas_are_coalesced_and_flushed_in_order(tmp_path):
+    path = tmp_path / "logs" / "runs.jsonl"
+    logger = EventLogger(flush_interval=0.05)
+
+    logger.log({"timestamp": "t0", "run_id": "r1", "event": "part_start", "kind": "text"}, path)
+    for i in range(500):
+        logger.log({"timestamp": f"d{i}", "run_id": "r1", "event": "part_delta", "kind": "text"}, path)
+    logger.log({"timestamp": "t1", "run_id": "r1", "event": "part_end", "kind": "text"}, path)
+    assert logger.flush()
+
+    records = _records(path)
+    assert [r["event"] for r in records] == ["part_start", "part_delta", "part_end"]
+    assert records[1]["count"] == 500
+    assert records[1]["timestamp"] == "d0" and records[1]["last_timestamp"] == "d499"
+    logger.close()
+
+
+def test_concurrent_writers_lose_nothing_and_close_flushes(tmp_path):
+    path = tmp_path / "runs.jsonl"
+    logger = EventLogger(max_queue=64, batch_size=16, flush_interval=0.01)
+
+    def write(worker: int) -> None:
+        for i in range(200):
+            logger.log({"timestamp": "t", "run_id": f"w{worker}", "event": "tick", "i": i}, path)
+
+    threads = [threading.Thread(target=write, args=(w,)) for w in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    logger.close()
+
+    records = _records(path)
+    assert len(records) == 800
+    for worker in range(4):
+        assert [r["i"] for r in records if r["run_id"] == f"w{worker}"] == list(range(200))
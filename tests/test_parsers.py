@@ -40,3 +40,20 @@ document {
     assert document_entry["headline"] == "a hash table overview"
     assert document_entry["keys"] == ["hash tables"]
     assert document_entry["syntax"] == "document"
+
+
+def test_multiline_keys_and_method_keys_are_split_on_lines_only():
+    content = """doc///
+Key
+  monomialIdeal
+  (monomialIdeal, Matrix)
+Headline
+  make a monomial ideal
+SeeAlso
+  ideal
+  hilbertPolynomial
+///
+"""
+    doc_entry = parse_m2_file(M2File(path="test.m2", content=content))[0]
+    assert doc_entry["keys"] == ["monomialIdeal", "monomialIdeal, Matrix"]
+    assert doc_entry["seealso"] == ["ideal", "hilbertPolynomial"]
@@ -0,0 +1,196 @@
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from src.cli import query_daemon
+from src.cli.search_common import SearchBackend, run_search_cli
+
+
+class CountingIndex:
+    def __init__(self, data_path):
+        self.data_path = data_path
+
+    def search(self, query, k=5):
+        return [{"source": f"{self.data_path.name}:{query}", "score": 1.0}][:k]
+
+
+def make_backend(builds, printed):
+    def create_index(data_path, model):
+        builds.append((Path(data_path), model))
+        return CountingIndex(Path(data_path))
+
+    return SearchBackend(
+        description="fake",
+        default_data_path=Path("docs.jsonl"),
+        default_model=None,
+        create_index=create_index,
+        print_results=lambda results, show_scores: printed.append(results),
+        name="fake",
+    )
+
+
+@pytest.fixture
+def running_daemon(tmp_path):
+    builds, printed = [], []
+    backend = make_backend(builds, printed)
+    daemon = query_daemon.QueryDaemon(tmp_path / "q.sock", idle_timeout=0, backends={"fake": backend})
+    daemon.bind()
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    yield daemon, backend, builds, printed
+    daemon.stop()
+    thread.join(timeout=5)
+
+
+def test_daemon_keeps_index_resident(running_daemon, tmp_path):
+    daemon, backend, builds, _ = running_daemon
+    for query in ("ideal", "ring"):
+        results = query_daemon.search_via_daemon(backend, tmp_path / "docs.jsonl", None, query, 3, daemon.socket_path)
+        assert results == [{"source": f"docs.jsonl:{query}", "score": 1.0}]
+    assert len(builds) == 1
+    status = query_daemon.request({"op": "status"}, daemon.socket_path)
+    assert status["requests"] == 3
+    assert status["indexes"][0]["backend"] == "fake"
+
+
+def test_cli_uses_daemon_and_falls_back(running_daemon, tmp_path, monkeypatch):
+    daemon, backend, builds, printed = running_daemon
+    monkeypatch.setenv("M2_QUERY_SOCKET", str(daemon.socket_path))
+    run_search_cli(backend, ["ideal", "--data-path", str(tmp_path / "docs.jsonl")])
+    run_search_cli(backend, ["ideal", "--data-path", str(tmp_path / "docs.jsonl")])
+    assert len(builds) == 1 and len(printed) == 2
+
+    run_search_cli(backend, ["ideal", "--data-path", str(tmp_path / "docs.jsonl"), "--no-daemon"])
+    assert len(builds) == 2
+
+    monkeypatch.setenv("M2_QUERY_SOCKET", str(tmp_path / "missing.sock"))
+    run_search_cli(backend, ["ideal", "--data-path", str(tmp_path / "docs.jsonl")])
+    assert len(builds) == 3 and printed[-1][0]["source"] == "docs.jsonl:ideal"
+
+
+def test_daemon_errors_are_reported(running_daemon, tmp_path):
+    daemon, backend, _, _ = running_daemon
+    reply = query_daemon.request({"op": "search", "backend": "nope", "data_path": "x", "query": "q"}, daemon.socket_path)
+    assert "unknown backend" in reply["error"]
+
+
+def test_idle_timeout_stops_daemon(tmp_path):
+    daemon = query_daemon.QueryDaemon(tmp_path / "idle.sock", idle_timeout=0.2, backends={})
+    daemon.bind()
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    assert query_daemon.ping(daemon.socket_path)
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert not daemon.socket_path.exists()
+    assert query_daemon.request({"op": "status"}, daemon.socket_path) is None
+
+
+def test_long_build_is_not_idle_and_requests_are_counted(tmp_path):
+    builds, printed = [], []
+    backend = make_backend(builds, printed)
+    create_index = backend.create_index
+    backend.create_index = lambda data_path, model: time.sleep(0.8) or create_index(data_path, model)
+    daemon = query_daemon.QueryDaemon(tmp_path / "slow.sock", idle_timeout=0.2, backends={"fake": backend})
+    daemon.bind()
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+
+    payload = {"op": "search", "backend": "fake", "data_path": str(tmp_path / "docs.jsonl"), "query": "q"}
+    replies = []
+    clients = [threading.Thread(target=lambda: replies.append(query_daemon.request(payload, daemon.socket_path))) for _ in range(8)]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join(timeout=5)
+    assert len(replies) == 8 and all(reply and reply["results"] for reply in replies)  # served past the idle timeout
+    assert daemon.requests == 8 and daemon.in_flight == 0 and len(builds) == 1
+    assert thread.is_alive() and query_daemon.ping(daemon.socket_path)
+    thread.join(timeout=5)
+    assert not thread.is_alive()  # idles out once the requests are done
+
+
+def test_stale_socket_is_replaced(tmp_path):
+    stale = tmp_path / "stale.sock"
+    stale.write_text("")
+    daemon = query_daemon.QueryDaemon(stale, idle_timeout=0, backends={})
+    daemon.bind()
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    try:
+        assert query_daemon.ping(stale)
+        with pytest.raises(RuntimeError, match="already listening"):
+            query_daemon.QueryDaemon(stale, backends={}).bind()
+    finally:
+        daemon.stop()
+        thread.join(timeout=5)
+
+
+def test_daemon_batch_search(running_daemon, tmp_path):
+    daemon, backend, builds, _ = running_daemon
+    results = query_daemon.search_batch_via_daemon(
+        backend, tmp_path / "docs.jsonl", None, ["ideal", "ring"], 2, daemon.socket_path
+    )
+    assert [r[0]["source"] for r in results] == ["docs.jsonl:ideal", "docs.jsonl:ring"]
+    assert len(builds) == 1
+
+
+def test_resident_index_is_rebuilt_when_data_changes(running_daemon, tmp_path):
+    daemon, backend, builds, _ = running_daemon
+    data = tmp_path / "docs.jsonl"
+    data.write_text('{"text": "ideal"}\n')
+    query_daemon.search_via_daemon(backend, data, None, "ideal", 1, daemon.socket_path)
+    query_daemon.search_via_daemon(backend, data, None, "ideal", 1, daemon.socket_path)
+    assert len(builds) == 1
+
+    data.write_text('{"text": "ideal"}\n{"text": "ring"}\n')  # rebuilt by chunk_docs
+    query_daemon.search_via_daemon(backend, data, None, "ideal", 1, daemon.socket_path)
+    assert len(builds) == 2
+    assert len(query_daemon.request({"op": "status"}, daemon.socket_path)["indexes"]) == 1
+
+
+def test_hung_or_foreign_daemon_is_skipped(running_daemon, tmp_path, monkeypatch):
+    import os
+    import socket
+    import time
+
+    hung_path = tmp_path / "hung.sock"
+    hung = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    hung.bind(str(hung_path))
+    hung.listen(1)  # accepts connections but never replies
+    try:
+        started = time.monotonic()
+        assert query_daemon.request({"op": "status"}, hung_path, timeout=0.2) is None
+        assert time.monotonic() - started < 2
+    finally:
+        hung.close()
+
+    daemon = running_daemon[0]
+    uid = os.getuid()
+    monkeypatch.setattr(query_daemon.os, "getuid", lambda: uid + 1)
+    assert query_daemon.request({"op": "status"}, daemon.socket_path) is None
+
+
+def test_default_socket_is_private(tmp_path, monkeypatch):
+    import os
+    import tempfile
+
+    monkeypatch.delenv("M2_QUERY_SOCKET", raising=False)
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path / "run"))
+    assert query_daemon.default_socket_path() == tmp_path / "run" / "m2rag-query.sock"
+
+    monkeypatch.delenv("XDG_RUNTIME_DIR")
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    daemon = query_daemon.QueryDaemon(idle_timeout=0, backends={})
+    daemon.bind()
+    try:
+        assert daemon.socket_path == tmp_path / f"m2rag-{os.getuid()}" / "query.sock"
+        assert daemon.socket_path.parent.stat().st_mode & 0o777 == 0o700
+    finally:
+        daemon._server.server_close()
+
+    daemon.socket_path.parent.chmod(0o777)
+    with pytest.raises(RuntimeError, match="not a private directory"):
+        query_daemon.QueryDaemon(idle_timeout=0, backends={}).bind()
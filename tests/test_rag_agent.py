@@ -31,3 +31,70 @@ def test_agent_invokes_tools(test_rag_agent):
 
     assert result.output.answer == "(test complete)"
     assert result.output.references
+
+
+def test_retrieval_first_answers_in_one_model_request(monkeypatch):
+    from pydantic_ai.messages import ModelResponse
+    from pydantic_ai.models.function import FunctionModel
+
+    import src.tools.search as search_tool
+    from src.agents.rag_agent import rag_agent, retrieval_first_history
+    from src.tools.state import tool_state
+
+    class EchoIndex:
+        def search(self, query, k=5):
+            return [{"source": f"{query}.m2", "headline": query, "description": ""}]
+
+    def search_then_answer(messages, info):
+        returns = [p for m in messages for p in m.parts if isinstance(p, ToolReturnPart)]
+        if not returns:
+            return ModelResponse(parts=[ToolCallPart("search_docs", {"query": "ideal", "k": 1})])
+        sources = [doc["source"] for doc in returns[-1].content]
+        return ModelResponse(parts=[ToolCallPart(info.output_tools[0].name, {"answer": "a", "references": sources})])
+
+    monkeypatch.setattr(search_tool, "index", EchoIndex())
+    model = FunctionModel(search_then_answer)
+
+    with rag_agent.override(model=model), tool_state():
+        baseline = rag_agent.run_sync("ideal")
+    with rag_agent.override(model=model), tool_state() as state:
+        fast = rag_agent.run_sync(None, message_history=retrieval_first_history("ideal"))
+
+    assert baseline.usage().requests == 2
+    assert fast.usage().requests == 1  # ensure_search_called accepts the synthetic call
+    assert fast.output.references == ["ideal.m2"]
+    assert [doc["source"] for doc in state.search_results] == ["ideal.m2"]
+
+
+def test_validators_repair_references_and_wikipedia_urls():
+    from src.agents.rag_agent import RagAgentResponse, ensure_references_present, ensure_wikipedia_urls
+    from src.tools.state import tool_state
+
+    with tool_state() as state:
+        state.search_results = [{"source": "functions/ideal-doc.m2", "headline": "make an ideal"}]
+        state.wiki_results = [{"title": "Monomial ideal", "url": "https://en.wikipedia.org/wiki/Monomial_ideal"}]
+
+        fixed = ensure_references_present(None, RagAgentResponse(answer="a", references=[]))
+        assert fixed.references == ["[functions/ideal-doc.m2] make an ideal"]
+
+        fixed = ensure_wikipedia_urls(None, RagAgentResponse(answer="a", references=["Wikipedia: Monomial ideal"]))
+        assert fixed.references == ["Wikipedia: Monomial ideal (https://en.wikipedia.org/wiki/Monomial_ideal)"]
+
+        assert state.validator_stats == {"repairs": 2, "retries": 0}
+
+
+def test_validators_retry_when_repair_is_impossible():
+    import pytest
+    from pydantic_ai.exceptions import ModelRetry
+
+    from src.agents.rag_agent import RagAgentResponse, ensure_wikipedia_urls
+    from src.tools.state import tool_state
+
+    with tool_state() as state:
+        with pytest.raises(ModelRetry):
+            ensure_wikipedia_urls(None, RagAgentResponse(answer="a", references=["Wikipedia: Ring"]))
+        # A lone result with another title is not the page the reference means.
+        state.wiki_results = [{"title": "Monomial ideal", "url": "https://en.wikipedia.org/wiki/Monomial_ideal"}]
+        with pytest.raises(ModelRetry):
+            ensure_wikipedia_urls(None, RagAgentResponse(answer="a", references=["Wikipedia: Ring"]))
+    assert state.validator_stats == {"repairs": 0, "retries": 2}
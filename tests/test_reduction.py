@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from src.db import index_store
+from src.db.stream_build import IndexSink, stream_embed
+
+faiss = pytest.importorskip("faiss")
+
+from src.db.reduction import build_index, make_index, reduced_dim, vector_bytes  # noqa: E402
+
+
+def _unit_vectors(n: int, d: int = 32, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).standard_normal((n, d)).astype("float32")
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.mark.parametrize("method", ["pca", "truncate"])
+def test_reduced_index_searches_full_size_queries(tmp_path, method):
+    vectors = _unit_vectors(200)
+    index = build_index(vectors, dim=8, method=method)
+    assert reduced_dim(index) == 8 and index.d == 32
+    assert vector_bytes(index) == 200 * 8 * 4
+
+    scores, ids = index.search(vectors[:5], 1)  # queries stay 32-dim; FAISS applies the projection
+    assert ids[:, 0].tolist() == [0, 1, 2, 3, 4]
+    assert np.allclose(scores[:, 0], 1.0, atol=1e-4)  # renormalized after the projection
+
+    faiss.write_index(index, str(tmp_path / "index.faiss"))
+    loaded = faiss.read_index(str(tmp_path / "index.faiss"))
+    assert reduced_dim(loaded) == 8
+    assert loaded.search(vectors[:5], 1)[1].tolist() == ids.tolist()
+
+
+def test_truncate_keeps_leading_dimensions():
+    vectors = _unit_vectors(10)
+    index = build_index(vectors, dim=4, method="truncate")
+    query = vectors[:1].copy()
+    query[0, 4:] = 0  # only the leading dimensions matter
+    assert index.search(query, 1)[1][0, 0] == 0
+
+
+def test_unreduced_and_invalid_options():
+    assert reduced_dim(make_index(32)) == 32
+    assert reduced_dim(make_index(32, dim=64)) == 32
+    with pytest.raises(ValueError, match="unknown reduction"):
+        make_index(32, dim=8, method="svd")
+    with pytest.raises(ValueError, match="at least 8 training vectors"):
+        build_index(_unit_vectors(5), dim=8, method="pca")
+
+
+def _encode(texts: list[str]) -> np.ndarray:
+    return _unit_vectors(1000)[[int(text.split("-")[1]) for text in texts]]
+
+
+@pytest.mark.parametrize("count", [60, 20])  # PCA trained mid-stream, or at the end of a short stream
+def test_streaming_pca_holds_rows_until_trained(tmp_path, count):
+    writer = index_store.DocStoreWriter(tmp_path)
+    sink = IndexSink(writer=writer, dim=8, train_size=32)
+    chunks = ({"text": f"chunk-{i}"} for i in range(count))
+    stream_embed(chunks, _encode, sink, batch_size=4, queue_size=2, workers=3)
+    writer.close(sink.index, {"model": "test"})
+
+    index, docs, _ = index_store.load_index(tmp_path)
+    assert index.ntotal == len(docs) == count and reduced_dim(index) == 8
+    queries = _encode([doc["text"] for doc in docs])
+    assert index.search(queries, 1)[1][:, 0].tolist() == list(range(count))  # row i is still doc i
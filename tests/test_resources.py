@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import pytest
+
+from src import resources
+from src.resources import THREAD_ENV_VARS, configure_threads, plan_threads, thread_plan_event
+
+
+@pytest.fixture()
+def clean_env(monkeypatch):
+    """No explicit thread settings; anything configure_threads exports is undone after the test."""
+    for name in (*THREAD_ENV_VARS, "M2_CPU_PROFILE", "M2_CPU_BUDGET", "M2_SEARCH_WORKERS", "M2_SHARD_WORKERS"):
+        monkeypatch.setenv(name, "1")
+        monkeypatch.delenv(name)
+    monkeypatch.setattr(resources, "_plan", None)
+    monkeypatch.setattr(resources, "_exported", {})
+    return monkeypatch
+
+
+def test_profiles_split_one_budget(clean_env):
+    latency = plan_threads("latency", cpus=8)
+    assert (latency.search_workers, latency.torch_threads, latency.omp_threads) == (2, 4, 4)
+    assert (latency.shard_workers, latency.shard_omp_threads) == (4, 1)  # each search fans out over its 4 cores
+    throughput = plan_threads("throughput", cpus=8)
+    assert (throughput.search_workers, throughput.shard_workers, throughput.torch_threads) == (8, 1, 1)
+    single = plan_threads("latency", cpus=1)
+    assert (single.search_workers, single.torch_threads) == (1, 1)
+    assert plan_threads("latency", cpus=8, search_workers=4).shard_workers == 2
+    with pytest.raises(ValueError, match="unknown CPU profile"):
+        plan_threads("fast", cpus=8)
+
+
+@pytest.mark.parametrize("profile", ["latency", "throughput"])
+def test_nested_pools_stay_within_budget(clean_env, profile):
+    for cpus in range(1, 17):
+        plan = plan_threads(profile, cpus=cpus)
+        assert plan.search_workers * plan.omp_threads <= cpus
+        assert plan.search_workers * plan.shard_workers * plan.shard_omp_threads <= cpus
+
+
+def test_explicit_settings_win(clean_env):
+    clean_env.setenv("M2_CPU_BUDGET", "6")
+    clean_env.setenv("M2_CPU_PROFILE", "throughput")
+    clean_env.setenv("M2_SEARCH_WORKERS", "3")
+    clean_env.setenv("OMP_NUM_THREADS", "2")
+    plan = plan_threads()
+    assert (plan.profile, plan.cpus, plan.search_workers, plan.shard_workers, plan.omp_threads) == ("throughput", 6, 3, 2, 2)
+    assert configure_threads(default="latency").profile == "throughput"  # env beats the entry point default
+    assert configure_threads("latency").omp_threads == 2 and resources.os.environ["OMP_NUM_THREADS"] == "2"
+
+
+def test_reconfiguring_replaces_exported_limits(clean_env):
+    assert configure_threads("throughput", cpus=8).omp_threads == 1
+    assert resources.os.environ["OMP_NUM_THREADS"] == "1"
+    # The first plan's export is not mistaken for a user override.
+    assert configure_threads("latency", cpus=8).omp_threads == 4
+    assert resources.os.environ["OMP_NUM_THREADS"] == "4"
+
+
+def test_configure_exports_limits_and_applies_to_faiss(clean_env):
+    faiss = pytest.importorskip("faiss")
+    from src.tools import search as search_tool
+
+    before = faiss.omp_get_max_threads()
+    try:
+        plan = configure_threads("throughput", cpus=4)
+        assert all(resources.os.environ[name] == "1" for name in THREAD_ENV_VARS)
+        assert faiss.omp_get_max_threads() == 1
+
+        event = thread_plan_event(entry="test")
+        assert event["event"] == "thread_plan" and event["profile"] == "throughput" and event["entry"] == "test"
+        assert event["effective"]["faiss_omp_threads"] == 1
+
+        clean_env.setattr(search_tool, "_executor", None)
+        assert search_tool.get_search_executor()._max_workers == plan.search_workers == 4
+
+        # omp_set_num_threads is per thread, so pool workers apply the plan themselves.
+        plan = configure_threads("latency", cpus=8)
+        search_tool.configure_search_executor(1)
+        assert search_tool.get_search_executor().submit(faiss.omp_get_max_threads).result() == plan.omp_threads == 4
+        search_tool.get_search_executor().shutdown()
+    finally:
+        faiss.omp_set_num_threads(before)
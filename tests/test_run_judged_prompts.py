@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+from src.async_utils import TokenBucket
+
+SCRIPT = Path(__file__).resolve().parent.parent / "scripts" / "run_judged_prompts.py"
+
+
+def _load_script():
+    spec = importlib.util.spec_from_file_location("run_judged_prompts", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_concurrent_offline_run_writes_in_prompt_order(tmp_path, monkeypatch):
+    monkeypatch.setenv("JUDGE_LOG_PATH", str(tmp_path / "judge.jsonl"))
+    runner = _load_script()
+    prompts = [f"prompt {i}" for i in range(8)]
+    output = tmp_path / "out.jsonl"
+
+    argv = ["--offline", "--concurrency", "3", "--output", str(output)]
+    for prompt in prompts:
+        argv += ["--prompt", prompt]
+    runner.main(argv)
+
+    rows = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    assert [row["query"] for row in rows] == prompts
+    assert all(row["judge"]["decision"] == "pass" for row in rows)
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=50, capacity=1)
+
+    async def take(n: int) -> float:
+        started = time.perf_counter()
+        for _ in range(n):
+            await bucket.acquire()
+        return time.perf_counter() - started
+
+    # First token is free (burst of 1); the remaining 5 need ~0.1s at 50/s.
+    assert asyncio.run(take(6)) >= 0.08
+
+
+def test_resume_skips_completed_and_retries_errors(tmp_path, monkeypatch):
+    monkeypatch.setenv("JUDGE_LOG_PATH", str(tmp_path / "judge.jsonl"))
+    runner = _load_script()
+    output = tmp_path / "out.jsonl"
+    argv = ["--offline", "--output", str(output), "--prompt", "first", "--prompt", "second"]
+    runner.main(argv)
+
+    rows = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    rows[0] = {"query": "first", "error": "rag_agent error: boom", "config_hash": rows[0]["config_hash"]}
+    torn = json.dumps(rows[1])[:20]  # a crash mid-write
+    output.write_text("\n".join(json.dumps(row) for row in rows) + "\n" + torn, encoding="utf-8")
+
+    ran = []
+    original = runner.run_prompt
+    monkeypatch.setattr(runner, "run_prompt", lambda prompt, agent, options: ran.append(prompt) or original(prompt, agent, options))
+    runner.main(argv + ["--resume"])
+
+    assert ran == ["first"]  # the rerun row lands back in prompt order, ahead of the kept one
+    rows = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    assert [row["query"] for row in rows] == ["first", "second"]
+    assert all("error" not in row for row in rows)
+
+
+def test_run_leaves_the_environment_alone(tmp_path, monkeypatch):
+    monkeypatch.setenv("JUDGE_LOG_PATH", str(tmp_path / "judge.jsonl"))
+    monkeypatch.delenv("M2_INDEX_MODE", raising=False)
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    runner = _load_script()
+    seen = []
+    original = runner.run_prompt
+    monkeypatch.setattr(
+        runner, "run_prompt", lambda *args: seen.append(os.environ.get("M2_INDEX_MODE")) or original(*args)
+    )
+
+    runner.main(["--offline", "--index-mode", "chunks", "--output", str(tmp_path / "out.jsonl"), "--prompt", "q"])
+    assert seen == ["chunks"]
+    assert "M2_INDEX_MODE" not in os.environ and "OPENAI_API_KEY" not in os.environ
+
+
+def test_serial_run_records_judge_errors_and_continues(tmp_path, monkeypatch):
+    monkeypatch.setenv("JUDGE_LOG_PATH", str(tmp_path / "judge.jsonl"))
+    runner = _load_script()
+    judge = runner.get_judge_agent()
+
+    class FlakyJudge:
+        def override(self, **kwargs):
+            return judge.override(**kwargs)
+
+        def run_sync(self, prompt):
+            if "flaky" in prompt:
+                raise RuntimeError("judge down")
+            return judge.run_sync(prompt)
+
+    monkeypatch.setattr(runner, "get_judge_agent", FlakyJudge)
+    output = tmp_path / "out.jsonl"
+    runner.main(["--offline", "--output", str(output), "--prompt", "flaky one", "--prompt", "fine one"])
+
+    rows = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    assert rows[0]["query"] == "flaky one" and rows[0]["error"] == "judge_agent error: judge down"
+    assert rows[1]["judge"]["decision"] == "pass"
+
+
+def test_async_cache_calls_run_off_the_event_loop(tmp_path, monkeypatch):
+    monkeypatch.setenv("JUDGE_LOG_PATH", str(tmp_path / "judge.jsonl"))
+    monkeypatch.setenv("OPENAI_API_KEY", "offline")
+    runner = _load_script()
+    calls = []
+
+    class RecordingCache:
+        def get(self, prompt):
+            calls.append(("get", threading.get_ident()))
+            return None
+
+        def put(self, prompt, answer, references):
+            calls.append(("put", threading.get_ident()))
+
+    rag_agent = runner.get_rag_agent()
+    options = runner.RunOptions(answer_cache=RecordingCache())
+
+    async def run() -> int:
+        with runner.offline_agents(rag_agent):
+            await runner.run_prompts_async(["a", "b"], rag_agent, concurrency=2, options=options)
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(run())
+    assert sorted(name for name, _ in calls) == ["get", "get", "put", "put"]
+    assert all(thread != loop_thread for _, thread in calls)
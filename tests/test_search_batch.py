@@ -0,0 +1,91 @@
+import json
+
+import numpy as np
+
+from src.cli.search_common import SearchBackend, read_queries, run_search_cli, search_many
+from src.db.chunk_index import ChunkEmbeddedIndex
+
+
+class LoopIndex:
+    def __init__(self):
+        self.calls = []
+
+    def search(self, query, k=5):
+        self.calls.append(query)
+        return [{"source": query, "score": 1.0}][:k]
+
+
+class BatchIndex(LoopIndex):
+    def search_batch(self, queries, k=5):
+        self.calls.append(tuple(queries))
+        return [[{"source": q}] for q in queries]
+
+
+def test_read_queries_accepts_jsonl_strings_and_plain_lines(tmp_path):
+    path = tmp_path / "queries.jsonl"
+    path.write_text('{"id": "a", "query": "ideal"}\n"hash table"\n\nplain text query\n42\n{"id": "skip"}\n', encoding="utf-8")
+    assert list(read_queries(path)) == [("a", "ideal"), ("2", "hash table"), ("4", "plain text query"), ("5", "42")]
+
+
+def test_search_many_prefers_vectorized_batch():
+    loop, batch = LoopIndex(), BatchIndex()
+    assert search_many(loop, ["a", "b"], 1) == [[{"source": "a", "score": 1.0}], [{"source": "b", "score": 1.0}]]
+    assert loop.calls == ["a", "b"]
+    search_many(batch, ["a", "b"], 1)
+    assert batch.calls == [("a", "b")]
+
+
+def test_batch_cli_streams_jsonl_and_summary(tmp_path, capsys, monkeypatch):
+    monkeypatch.setenv("M2_QUERY_DAEMON", "0")
+    index = BatchIndex()
+    builds = []
+    backend = SearchBackend(
+        description="fake",
+        default_data_path=tmp_path / "docs.jsonl",
+        default_model=None,
+        create_index=lambda data_path, model: builds.append(data_path) or index,
+        print_results=lambda results, show_scores: None,
+        name="fake",
+    )
+    queries = tmp_path / "queries.txt"
+    queries.write_text("ideal\nring\nmodule\n", encoding="utf-8")
+
+    run_search_cli(backend, ["--queries-file", str(queries), "--output-format", "jsonl", "--batch-size", "2"])
+
+    out, err = capsys.readouterr()
+    records = [json.loads(line) for line in out.splitlines()]
+    assert [(r["id"], r["query"]) for r in records] == [("1", "ideal"), ("2", "ring"), ("3", "module")]
+    assert records[0]["results"] == [{"source": "ideal"}]
+    assert index.calls == [("ideal", "ring"), ("module",)]
+    assert len(builds) == 1
+    assert "Searched 3 queries in 2 batches" in err
+
+
+class FakeEncoder:
+    def encode(self, texts, convert_to_numpy=True, normalize_embeddings=True):
+        vecs = np.array([[text.count("a"), text.count("b"), 1.0] for text in texts], dtype="float32")
+        return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+class FlatIP:
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def search(self, queries, k):
+        scores = queries @ self.vectors.T
+        order = np.argsort(-scores, axis=1)[:, :k]
+        return np.take_along_axis(scores, order, axis=1), order
+
+
+def test_embedding_search_batch_matches_single_searches():
+    index = ChunkEmbeddedIndex.__new__(ChunkEmbeddedIndex)
+    index.model = FakeEncoder()
+    index.docs = [{"text": t, "source": t} for t in ["aaa", "bbb", "ab", "c"]]
+    index.index = FlatIP(index.model.encode([d["text"] for d in index.docs]))
+
+    queries = ["aa", "", "bb b"]
+    batched = index.search_batch(queries, k=2)
+    assert batched[1] == []
+    assert batched[0] == index.search("aa", k=2)
+    assert batched[2] == index.search("bb b", k=2)
+    assert batched[0][0]["source"] == "aaa"
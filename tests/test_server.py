@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import asyncio
+import http.client
+import json
+import socket
+
+from pydantic_ai.models.test import TestModel
+
+import src.tools.search as search_tool
+from src.logging_utils import flush_events
+from src.server import RagServer
+
+
+class EchoIndex:
+    def search(self, query: str, k: int = 5) -> list[dict]:
+        return [{"source": f"{query}-{i}.m2", "headline": query, "score": 1.0 / (i + 1)} for i in range(k)]
+
+
+def _request(port: int, method: str, path: str, body: dict | None = None) -> tuple[int, bytes]:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    payload = json.dumps(body).encode() if body is not None else None
+    conn.request(method, path, body=payload, headers={"Content-Type": "application/json"} if payload else {})
+    response = conn.getresponse()
+    data = response.read()  # http.client decodes the chunked /ask stream
+    conn.close()
+    return response.status, data
+
+
+def _logged(path, event: str) -> list[dict]:
+    flush_events()
+    return [record for record in map(json.loads, path.read_text().splitlines()) if record["event"] == event]
+
+
+def test_server_search_ask_and_health(monkeypatch, tmp_path):
+    from src.agents.rag_agent import rag_agent
+
+    monkeypatch.setattr(search_tool, "index", EchoIndex())
+    model = TestModel(
+        call_tools=["search_docs"],
+        custom_output_args={"answer": "Use monomialIdeal.", "references": ["[monomial-0.m2] monomial"]},
+    )
+
+    async def scenario():
+        server = RagServer(search_workers=2, rag_agent=rag_agent)
+        await server.start("127.0.0.1", 0)
+        await server._load_task
+        port = server.port
+
+        health = await asyncio.to_thread(_request, port, "GET", "/healthz")
+        ready = await asyncio.to_thread(_request, port, "GET", "/readyz")
+        search = await asyncio.to_thread(_request, port, "GET", "/search?q=ideal&k=2")
+        missing = await asyncio.to_thread(_request, port, "GET", "/nope")
+        asks = await asyncio.gather(
+            *(asyncio.to_thread(_request, port, "POST", "/ask", {"query": f"q{i}"}) for i in range(8))
+        )
+        await server.close()
+        return health, ready, search, missing, asks
+
+    with rag_agent.override(model=model):
+        health, ready, search, missing, asks = asyncio.run(scenario())
+
+    assert health[0] == 200 and json.loads(health[1])["status"] == "ok"
+    assert ready[0] == 200 and json.loads(ready[1])["ready"] is True
+    assert search[0] == 200
+    assert [doc["source"] for doc in json.loads(search[1])["results"]] == ["ideal-0.m2", "ideal-1.m2"]
+    assert missing[0] == 404
+
+    for status, body in asks:
+        events = [json.loads(line) for line in body.decode().splitlines()]
+        assert status == 200
+        assert "".join(e["text"] for e in events if e["type"] == "answer") == "Use monomialIdeal."
+        assert events[-1] == {"type": "final", "answer": "Use monomialIdeal.", "references": ["[monomial-0.m2] monomial"]}
+    assert len(_logged(tmp_path / "runs.jsonl", "server_ask")) == 8  # conftest keeps the run log in tmp_path
+
+
+def test_server_ask_parses_flags_and_reports_late_errors_in_stream(monkeypatch, tmp_path):
+    from pydantic_ai.run import AgentRunResultEvent
+
+    from src.agents.rag_agent import rag_agent
+
+    monkeypatch.setattr(search_tool, "index", EchoIndex())
+    model = TestModel(call_tools=["search_docs"], custom_output_args={"answer": "a", "references": ["[q-0.m2] q"]})
+
+    class BrokenResult:
+        @property
+        def output(self):
+            raise RuntimeError("bad output")
+
+    class BrokenAgent:
+        async def run_stream_events(self, *args, **kwargs):
+            yield AgentRunResultEvent(result=BrokenResult())
+
+    async def scenario():
+        server = RagServer(rag_agent=rag_agent)
+        await server.start("127.0.0.1", 0)
+        await server._load_task
+        plain = await asyncio.to_thread(_request, server.port, "POST", "/ask", {"query": "q", "retrieval_first": "false"})
+        server.rag_agent = BrokenAgent()
+        broken = await asyncio.to_thread(_request, server.port, "POST", "/ask", {"query": "q"})
+        await server.close()
+        return plain, broken
+
+    with rag_agent.override(model=model):
+        plain, broken = asyncio.run(scenario())
+
+    assert plain[0] == 200
+    assert [record["mode"] for record in _logged(tmp_path / "runs.jsonl", "server_ask")] == ["tool_first"]
+    assert broken[0] == 200
+    events = [json.loads(line) for line in broken[1].decode().splitlines()]  # one status line, a well-formed stream
+    assert events == [{"type": "error", "error": "RuntimeError: bad output"}]
+
+
+def test_server_reports_not_ready_until_loaded():
+    async def scenario():
+        server = RagServer()
+        server.warm_up = _never_ready  # keep the server in its loading state
+        await server.start("127.0.0.1", 0)
+        port = server.port
+        ready = await asyncio.to_thread(_request, port, "GET", "/readyz")
+        search = await asyncio.to_thread(_request, port, "GET", "/search?q=ideal")
+        health = await asyncio.to_thread(_request, port, "GET", "/healthz")
+        await server.close()
+        return ready, search, health
+
+    ready, search, health = asyncio.run(scenario())
+    assert ready[0] == 503
+    assert search[0] == 503
+    assert health[0] == 200
+
+
+def _raw_status(port: int, data: bytes) -> int:
+    with socket.create_connection(("127.0.0.1", port), timeout=10) as conn:
+        conn.sendall(data)
+        return int(conn.makefile("rb").readline().split()[1])
+
+
+def test_server_rejects_malformed_content_length():
+    async def scenario():
+        server = RagServer()
+        server.warm_up = _never_ready
+        await server.start("127.0.0.1", 0)
+        statuses = [
+            await asyncio.to_thread(_raw_status, server.port, f"POST /ask HTTP/1.1\r\nContent-Length: {value}\r\n\r\n".encode())
+            for value in ("abc", "-5", "1.5")
+        ]
+        await server.close()
+        return statuses
+
+    assert asyncio.run(scenario()) == [400, 400, 400]
+
+
+async def _never_ready() -> None:
+    return None
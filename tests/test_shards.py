@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+
+import pytest
+
+from src.db import index_store
+from src.db.optional_deps import embeddings_available
+from src.db.shards import ShardedIndex, list_shards, merge_top_k
+from src.scripts.build_shards import build_shard
+
+PACKAGES = {
+    "Alpha": "doc ///\nKey\n  alphaIdeal\nHeadline\n  make an alpha ideal from monomials\n///\n",
+    "Beta": "doc ///\nKey\n  betaRing\nHeadline\n  construct a beta polynomial ring\n///\n",
+    "Gamma": "doc ///\nKey\n  gammaModule\nHeadline\n  gamma module of a polynomial ring\n///\n",
+}
+
+
+def make_packages(root):
+    for name, content in PACKAGES.items():
+        package_dir = root / name
+        (package_dir / name).mkdir(parents=True)
+        (package_dir / f"{name}.m2").write_text(content, encoding="utf-8")
+    return root
+
+
+def build_all(packages_root, shards_dir):
+    return {name: build_shard(packages_root / name, shards_dir, max_tokens=50, overlap=5) for name in PACKAGES}
+
+
+def test_merge_top_k_uses_scores_then_rank():
+    scored = merge_top_k([[{"id": "a", "score": 0.9}, {"id": "b", "score": 0.2}], [{"id": "c", "score": 0.5}]], 2)
+    assert [doc["id"] for doc in scored] == ["a", "c"]
+    ranked = merge_top_k([[{"id": "a1"}, {"id": "a2"}], [{"id": "b1"}, {"id": "b2"}]], 3)
+    assert [doc["id"] for doc in ranked] == ["a1", "b1", "a2"]
+
+
+def test_build_shards_and_search_with_package_filter(tmp_path):
+    packages_root, shards_dir = make_packages(tmp_path / "packages"), tmp_path / "shards"
+    metas = build_all(packages_root, shards_dir)
+    assert list_shards(shards_dir) == ["Alpha", "Beta", "Gamma"]
+    assert metas["Beta"]["package"] == "Beta" and metas["Beta"]["count"] == 1
+
+    index = ShardedIndex(shards_dir, workers=3)
+    try:
+        results = index.search("polynomial ring", k=5)
+        assert {doc["package"] for doc in results} >= {"Beta", "Gamma"}
+        assert all(doc["source"].startswith(doc["package"] + "/") for doc in results)
+
+        only_gamma = index.search("polynomial ring", k=5, packages=["gamma"])
+        assert only_gamma and {doc["package"] for doc in only_gamma} == {"Gamma"}
+        assert index.search("polynomial ring", packages=["Missing"]) == []
+
+        batched = index.search_batch(["alpha ideal", "", "beta ring"], k=1)
+        assert [hits[0]["package"] if hits else None for hits in batched] == ["Alpha", None, "Beta"]
+    finally:
+        index.close()
+
+
+def test_rebuild_touches_only_changed_shard(tmp_path):
+    packages_root, shards_dir = make_packages(tmp_path / "packages"), tmp_path / "shards"
+    build_all(packages_root, shards_dir)
+    before = {name: (shards_dir / name / index_store.META_FILE).stat().st_mtime_ns for name in PACKAGES}
+
+    assert build_shard(packages_root / "Alpha", shards_dir) is None  # unchanged sources are skipped
+
+    (packages_root / "Beta" / "Beta.m2").write_text(PACKAGES["Beta"] + "\n-- more docs on beta resolutions\n")
+    meta = build_shard(packages_root / "Beta", shards_dir, max_tokens=50, overlap=5)
+    assert meta is not None
+    after = {name: (shards_dir / name / index_store.META_FILE).stat().st_mtime_ns for name in PACKAGES}
+    assert after["Alpha"] == before["Alpha"] and after["Gamma"] == before["Gamma"]
+    assert after["Beta"] != before["Beta"]
+    assert not (shards_dir / "Beta.building").exists() and not (shards_dir / "Beta.retired").exists()
+
+
+def test_swap_keeps_the_live_shard_until_the_new_one_lands(tmp_path, monkeypatch):
+    packages_root, shards_dir = make_packages(tmp_path / "packages"), tmp_path / "shards"
+    build_all(packages_root, shards_dir)
+    listed = []
+    rename = Path.rename
+
+    def watching_rename(self, target):
+        listed.append(list_shards(shards_dir))
+        return rename(self, target)
+
+    monkeypatch.setattr(Path, "rename", watching_rename)
+    assert build_shard(packages_root / "Beta", shards_dir, force=True) is not None
+    # Beta is retired and replaced by two renames; it is never deleted while it is the live shard.
+    assert listed == [["Alpha", "Beta", "Gamma"], ["Alpha", "Gamma"]]
+    assert list_shards(shards_dir) == ["Alpha", "Beta", "Gamma"]
+
+
+@pytest.mark.skipif(not embeddings_available(), reason="needs sentence-transformers and faiss")
+def test_build_shard_reuses_a_loaded_encoder(tmp_path, monkeypatch):
+    from src.db import chunk_index
+
+    encoder = chunk_index.load_sentence_transformer()(chunk_index.DEFAULT_MODEL)
+    monkeypatch.setattr(chunk_index, "load_sentence_transformer", lambda: pytest.fail("encoder loaded per shard"))
+    packages_root, shards_dir = make_packages(tmp_path / "packages"), tmp_path / "shards"
+    for name in PACKAGES:
+        assert build_shard(packages_root / name, shards_dir, max_tokens=50, overlap=5, model=encoder)["count"] == 1
+
+
+def test_fanout_runs_shards_in_parallel(tmp_path):
+    packages_root, shards_dir = make_packages(tmp_path / "packages"), tmp_path / "shards"
+    build_all(packages_root, shards_dir)
+    index = ShardedIndex(shards_dir, workers=3)
+    barrier = threading.Barrier(3, timeout=5)
+
+    class BarrierShard:
+        def __init__(self, name):
+            self.name = name
+
+        def search(self, query, k=5):
+            barrier.wait()  # only passes if all three shards are searched concurrently
+            return [{"id": self.name}]
+
+    try:
+        index.shards = {name: BarrierShard(name) for name in index.shards}
+        assert [doc["id"] for doc in index.search("anything", k=3)] == ["Alpha", "Beta", "Gamma"]
+    finally:
+        index.close()
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from src.db import index_store
+from src.db.stream_build import IndexSink, stream_embed
+
+pytest.importorskip("faiss")
+
+
+def _encode(texts: list[str]) -> np.ndarray:
+    """Deterministic unit vectors so row i can be matched back to its text."""
+    vectors = np.zeros((len(texts), 8), dtype="float32")
+    for row, text in enumerate(texts):
+        vectors[row, int(text.split("-")[1]) % 8] = 1.0
+    return vectors
+
+
+def test_stream_embed_keeps_rows_aligned(tmp_path):
+    chunks = ({"text": f"chunk-{i}", "source": f"file{i}.m2"} for i in range(50))
+    writer = index_store.DocStoreWriter(tmp_path)
+    sink = IndexSink(writer=writer)
+
+    stats = stream_embed(chunks, _encode, sink, batch_size=4, queue_size=2, workers=3)
+    writer.close(sink.index, {"model": "test"})
+
+    assert stats.chunks == 50
+    assert stats.max_queue_depth <= 2
+    assert sink.index.ntotal == 50
+
+    index, docs, meta = index_store.load_index(tmp_path)
+    assert meta["count"] == 50
+    vectors = index.reconstruct_n(0, index.ntotal)
+    for row, doc in enumerate(docs):
+        assert vectors[row].argmax() == int(doc["text"].split("-")[1]) % 8
+
+
+def test_stream_embed_propagates_encoder_errors():
+    def broken(_texts):
+        raise ValueError("encoder failed")
+
+    with pytest.raises(ValueError):
+        stream_embed(({"text": str(i)} for i in range(20)), broken, IndexSink(), batch_size=2, queue_size=1)
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from src.m2rag.ingest.summary import key_sentences, summarize_chunk, summarize_entry
+from src.tools.summarize import SummarizeDocsArgs, summarize_docs
+
+
+def test_summarize_entry_extracts_usage_and_example():
+    doc = {
+        "headline": "Groebner bases",
+        "usage": "gb I\ngb(I, DegreeLimit => 3)",
+        "description": (
+            "This function computes a Groebner basis of an ideal. "
+            "The Groebner basis depends on the monomial order of the ring. "
+            "Computations can be interrupted and resumed later."
+        ),
+        "examples": "R = QQ[x,y]\ngb ideal(x^2, y^2)",
+    }
+    summary = summarize_entry(doc)
+
+    assert summary["usage"] == "gb I"
+    assert summary["example"] == "R = QQ[x,y]"
+    assert 1 <= len(summary["key_sentences"]) <= 2
+    assert all("Groebner" in s or "Computations" in s for s in summary["key_sentences"])
+
+
+def test_summarize_chunk_reads_sections_from_flat_text():
+    text = "doc /// Key gb Headline computes a Groebner basis Usage gb I Inputs I Example gb ideal(x^2) ///"
+    summary = summarize_chunk(text)
+
+    assert summary["usage"] == "gb I"
+    assert summary["example"] == "gb ideal(x^2)"
+
+
+def test_key_sentences_keeps_original_order():
+    text = "Ideals are central. Alpha beta ideal ring ideal. Unrelated filler sentence here. Ring ideal ring again."
+    picked = key_sentences(text, n=2)
+
+    assert len(picked) == 2
+    assert text.index(picked[0]) < text.index(picked[1])
+
+
+def test_summarize_docs_uses_precomputed_summary_within_budget():
+    docs = [
+        {"headline": f"entry {i}", "summary": {"key_sentences": ["word " * 30], "usage": "f x", "example": ""}}
+        for i in range(5)
+    ]
+    digest = summarize_docs(SummarizeDocsArgs(docs=docs, max_words=80))
+
+    assert digest.count("- **") == 2
+    assert "Usage: `f x`" in digest
+    assert len(digest.split()) <= 80 + 10
+
+
+def test_summarize_docs_falls_back_for_docs_without_summary():
+    digest = summarize_docs(SummarizeDocsArgs(docs=[{"headline": "old", "description": "An older row without a summary."}]))
+
+    assert "- **old** An older row without a summary." in digest
+
+
+def test_search_results_omit_summary_but_summarize_docs_reads_it(monkeypatch):
+    from src.tools import search as search_tool
+    from src.tools.search import SearchDocsArgs, search_docs
+
+    precomputed = {"key_sentences": ["Precomputed digest sentence."], "usage": "gb I", "example": ""}
+
+    class Index:
+        def search(self, query, k=5):
+            return [{"headline": "Groebner bases", "description": "Long text.", "summary": precomputed}]
+
+    monkeypatch.setattr(search_tool, "index", Index())
+    results = search_docs(SearchDocsArgs(query="groebner", k=1))
+
+    assert results == [{"headline": "Groebner bases", "description": "Long text."}]
+    assert "Precomputed digest sentence." in summarize_docs(SummarizeDocsArgs())
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import json
+
+from src.db.symbols import SymbolIndex, query_symbols
+from src.tools import search as search_tool
+from src.tools.search import SearchDocsArgs, search_docs
+
+DOCS = [
+    {"keys": ["monomialIdeal", "monomialIdeal, Matrix"], "headline": "make a monomial ideal", "source": "a.m2", "seealso": ["ideal"]},
+    {"keys": ["ideal"], "headline": "make an ideal", "source": "a.m2", "seealso": ["monomialIdeal", "MutableHashTable"]},
+    {"keys": ["hilbertPolynomial"], "headline": "compute the Hilbert polynomial", "source": "b.m2", "seealso": []},
+    {"keys": ["HashTable"], "headline": "the class of all hash tables", "source": "c.m2", "seealso": ["hashTable"]},
+]
+
+
+def test_query_symbols_prefers_identifiers():
+    assert query_symbols("How do I use monomialIdeal on a Matrix?") == ["monomialIdeal"]
+    assert query_symbols("ideal") == ["ideal"]
+    assert query_symbols("what is the `dim` of a ring") == ["dim"]
+    assert query_symbols("how do I define a monomial ideal") == []
+
+
+def test_lookup_exact_fuzzy_and_related():
+    index = SymbolIndex(DOCS)
+    hits = index.lookup("How do I use monomialIdeal?")
+    assert [(doc["headline"], doc["match"]) for doc in hits] == [("make a monomial ideal", "exact")]
+    assert index.lookup("hashtable")[0]["symbol"] == "HashTable"  # case-insensitive
+
+    fuzzy = index.lookup("what does hilbertPolynomal return")
+    assert [(doc["symbol"], doc["match"]) for doc in fuzzy] == [("hilbertPolynomial", "fuzzy")]
+    assert index.lookup("what does fooBarBaz return") == []
+
+    related = index.lookup("MutableHashTable keys")
+    assert [(doc["headline"], doc["match"]) for doc in related] == [("make an ideal", "related")]
+
+
+def test_saved_table_round_trips_and_rebuilds_when_stale(tmp_path):
+    docs_path, symbols_path = tmp_path / "docs.jsonl", tmp_path / "symbols.json"
+    docs_path.write_text("".join(json.dumps(doc) + "\n" for doc in DOCS), encoding="utf-8")
+    SymbolIndex(DOCS).save(symbols_path)
+
+    loaded = SymbolIndex.load(symbols_path, docs_path)
+    assert loaded.keys["monomialIdeal"] == [0] and loaded.related["MutableHashTable"] == [1]
+
+    symbols_path.write_text(json.dumps({"fingerprint": "stale", "keys": {}, "related": {}}), encoding="utf-8")
+    assert SymbolIndex.load(symbols_path, docs_path).keys["HashTable"] == [3]
+
+
+def test_search_puts_symbol_hits_first_and_skips_encode_when_full(monkeypatch):
+    calls = []
+
+    class VectorIndex:
+        def search(self, query, k=5):
+            calls.append(query)
+            return [{"keys": "monomialIdeal monomialIdeal, Matrix", "headline": "make a monomial ideal", "source": "a.m2"},
+                    {"keys": "ideal", "headline": "make an ideal", "source": "a.m2"}]
+
+    monkeypatch.setattr(search_tool, "index", VectorIndex())
+    monkeypatch.setattr(search_tool, "symbol_index", SymbolIndex(DOCS))
+
+    results = search_docs(SearchDocsArgs(query="monomialIdeal of a matrix", k=3))
+    assert [doc.get("match") for doc in results] == ["exact", None]  # vector duplicate of the symbol hit dropped
+    assert results[1]["headline"] == "make an ideal"
+
+    assert search_docs(SearchDocsArgs(query="monomialIdeal", k=1))[0]["match"] == "exact"
+    assert calls == ["monomialIdeal of a matrix"]  # the second search never reached the vector index
+
+    monkeypatch.setenv("M2_SYMBOL_LOOKUP", "0")
+    assert "match" not in search_docs(SearchDocsArgs(query="monomialIdeal", k=1))[0]
+
+
+def test_weak_symbol_hits_do_not_suppress_vector_search(monkeypatch):
+    docs = DOCS + [{"keys": ["tally, List"], "headline": "tally a list", "source": "d.m2"},
+                   {"keys": ["tally, Set"], "headline": "tally a set", "source": "d.m2"}]
+    vector = [{"keys": "dim", "headline": "compute the Krull dimension", "source": "e.m2"}]
+
+    class VectorIndex:
+        def search(self, query, k=5):
+            return vector
+
+    monkeypatch.setattr(search_tool, "index", VectorIndex())
+    monkeypatch.setattr(search_tool, "symbol_index", SymbolIndex(docs))
+
+    typo = search_docs(SearchDocsArgs(query="hilbertPolynomal", k=1))
+    assert [doc["headline"] for doc in typo] == ["compute the Krull dimension"]
+    overloads = search_docs(SearchDocsArgs(query="tally", k=2))
+    assert [doc.get("match") for doc in overloads] == ["method", None]
+
+
+def test_chunk_mode_merges_symbol_hits_by_source(monkeypatch):
+    chunks = [{"text": "document { Key => monomialIdeal ...", "source": "a.m2", "chunk_id": 0},
+              {"text": "hilbertPolynomial M", "source": "b.m2", "chunk_id": 0}]
+
+    class ChunkIndex:
+        def search(self, query, k=5):
+            return chunks[:k]
+
+    monkeypatch.setattr(search_tool, "index", ChunkIndex())
+    monkeypatch.setattr(search_tool, "symbol_index", SymbolIndex(DOCS))
+
+    results = search_docs(SearchDocsArgs(query="monomialIdeal of a matrix", k=3))
+    assert [(doc["source"], doc.get("match")) for doc in results] == [("a.m2", "exact"), ("b.m2", None)]
+    assert set(results[0]) == {"text", "source", "headline", "match", "symbol"}
+    assert results[0]["text"] == "monomialIdeal, monomialIdeal, Matrix make a monomial ideal"
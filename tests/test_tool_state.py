@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+from pydantic_ai.messages import ModelResponse, ToolCallPart, ToolReturnPart, UserPromptPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+
+import src.tools.search as search_tool
+from src.tools.state import tool_state
+
+
+class SlowEchoIndex:
+    """Returns one hit named after the query, slowly enough for runs to overlap."""
+
+    def search(self, query: str, k: int = 5) -> list[dict]:
+        time.sleep(0.02)
+        return [{"source": f"{query}.m2", "headline": query, "description": ""}]
+
+
+def _prompt_of(messages) -> str:
+    for message in messages:
+        for part in getattr(message, "parts", []):
+            if isinstance(part, UserPromptPart):
+                return str(part.content)
+    raise AssertionError("no user prompt")
+
+
+def search_then_answer(messages, info: AgentInfo) -> ModelResponse:
+    prompt = _prompt_of(messages)
+    returns = [p for m in messages for p in getattr(m, "parts", []) if isinstance(p, ToolReturnPart)]
+    if not returns:
+        return ModelResponse(parts=[ToolCallPart("search_docs", {"query": prompt, "k": 1})])
+    sources = [doc["source"] for doc in returns[-1].content]
+    return ModelResponse(
+        parts=[ToolCallPart(info.output_tools[0].name, {"answer": prompt, "references": sources})]
+    )
+
+
+def test_concurrent_runs_see_only_their_own_results(monkeypatch):
+    from src.agents.rag_agent import rag_agent
+
+    monkeypatch.setattr(search_tool, "index", SlowEchoIndex())
+    prompts = [f"query-{i}" for i in range(20)]
+
+    async def run_one(prompt: str):
+        with tool_state() as state:
+            result = await rag_agent.run(prompt)
+        return result, state
+
+    async def run_all():
+        return await asyncio.gather(*(run_one(p) for p in prompts))
+
+    with rag_agent.override(model=FunctionModel(search_then_answer)):
+        outcomes = asyncio.run(run_all())
+
+    for prompt, (result, state) in zip(prompts, outcomes):
+        assert [doc["source"] for doc in state.search_results] == [f"{prompt}.m2"]
+        assert result.output.references == [f"{prompt}.m2"]
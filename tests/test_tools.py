@@ -18,3 +18,120 @@ def test_summarize_uses_cached_results_when_missing_docs():
 
     assert "Here are the most relevant documentation details" in summary
     assert "- **" in summary
+
+
+def test_async_search_does_not_block_event_loop(monkeypatch):
+    import asyncio
+    import time
+
+    import src.tools.search as search_tool
+    from src.async_utils import LoopLagMonitor
+    from src.tools.search import search_docs_async
+
+    class SlowIndex:
+        def search(self, query, k=5):
+            time.sleep(0.2)  # stands in for encode + FAISS holding the CPU
+            return [{"source": "slow.m2"}]
+
+    monkeypatch.setattr(search_tool, "index", SlowIndex())
+
+    async def measure(blocking: bool):
+        async with LoopLagMonitor(interval=0.01) as lag:
+            if blocking:
+                SlowIndex().search("ideal")
+            else:
+                await search_docs_async(SearchDocsArgs(query="ideal", k=1))
+        return lag.summary()
+
+    assert asyncio.run(measure(blocking=True))["max_ms"] >= 100
+    assert asyncio.run(measure(blocking=False))["max_ms"] < 100
+    assert get_last_search_results() == [{"source": "slow.m2"}]
+
+
+def test_loop_lag_p95_is_nearest_rank():
+    from src.async_utils import LoopLagMonitor
+
+    lag = LoopLagMonitor()
+    lag.samples = [ms / 1000 for ms in range(1, 21)]
+    assert lag.summary()["p95_ms"] == 19.0 and lag.summary()["max_ms"] == 20.0
+
+
+def test_prefetch_is_reused_for_matching_query(monkeypatch):
+    import time
+
+    import src.tools.search as search_tool
+    from src.tools.search import start_prefetch
+    from src.tools.state import tool_state
+
+    calls = []
+
+    class CountingIndex:
+        def search(self, query, k=5):
+            calls.append((query, k))
+            time.sleep(0.05)
+            return [{"source": f"{query}-{i}.m2"} for i in range(k)]
+
+    monkeypatch.setattr(search_tool, "index", CountingIndex())
+
+    with tool_state() as state:
+        start_prefetch("How do I define a monomial ideal?")
+        time.sleep(0.08)  # the model "plans" while the prefetch finishes
+        hit = search_docs(SearchDocsArgs(query="how do i define a monomial ideal", k=2))
+    assert len(calls) == 1
+    assert hit == [{"source": f"How do I define a monomial ideal?-{i}.m2"} for i in range(2)]
+    assert state.prefetch_stats["hits"] == 1
+    assert state.prefetch_stats["saved_ms"] >= 40
+
+    with tool_state() as state:
+        start_prefetch("How do I define a monomial ideal?")
+        search_docs(SearchDocsArgs(query="hilbert polynomial", k=2))
+        search_docs(SearchDocsArgs(query="how do i define a monomial ideal", k=2))  # prefetch already consumed
+    assert state.prefetch_stats == {"hits": 0, "misses": 1, "saved_ms": 0.0}
+
+
+def test_unclaimed_prefetch_is_a_miss_and_cancelled(monkeypatch):
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    import src.tools.search as search_tool
+    from src.tools.search import start_prefetch
+    from src.tools.state import tool_state
+
+    release = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(search_tool, "_executor", pool)
+    busy = pool.submit(release.wait, 1)  # the only search worker is taken, so the prefetch queues
+
+    with tool_state() as state:
+        prefetch = start_prefetch("how do i define a monomial ideal")
+        # The model answers without calling search_docs.
+    release.set()
+    busy.result(timeout=1)
+    pool.shutdown()
+    assert prefetch.future.cancelled()
+    assert state.prefetch is None and state.prefetch_stats == {"hits": 0, "misses": 1, "saved_ms": 0.0}
+
+
+def test_search_passes_package_filter_only_to_sharded_indexes(monkeypatch):
+    import src.tools.search as search_tool
+
+    calls = []
+
+    class PackageIndex:
+        supports_packages = True
+
+        def search(self, query, k=5, packages=None):
+            calls.append(packages)
+            return [{"source": f"{p}/doc.m2"} for p in packages or ["all"]]
+
+    class PlainIndex:
+        def search(self, query, k=5):
+            return [{"source": "plain.m2"}]
+
+    monkeypatch.setattr(search_tool, "index", PackageIndex())
+    assert search_docs(SearchDocsArgs(query="ideal", packages=["Schubert2"])) == [{"source": "Schubert2/doc.m2"}]
+    search_docs(SearchDocsArgs(query="ideal"))
+    assert calls == [["Schubert2"], None]
+
+    monkeypatch.setattr(search_tool, "index", PlainIndex())
+    assert search_docs(SearchDocsArgs(query="ideal", packages=["Schubert2"])) == [{"source": "plain.m2"}]
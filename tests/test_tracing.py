@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+from pydantic_ai.models.test import TestModel
+
+import src.tools.search as search_tool
+from src.cli.trace_summary import summarize_spans
+from src.logging_utils import flush_events
+from src.stats import percentile
+from src.tools.state import tool_state
+from src.tracing import ModelRequestTracker, span, trace_run, traced
+
+
+class TracedEchoIndex:
+    @traced("index.search")
+    def search(self, query: str, k: int = 5) -> list[dict]:
+        with span("encode"):
+            pass
+        return [{"source": f"{query}.m2", "headline": query}]
+
+
+def _spans(path):
+    flush_events()
+    return [r for r in map(json.loads, path.read_text().splitlines()) if r["event"] == "span"]
+
+
+def test_agent_run_emits_nested_spans(monkeypatch, tmp_path):
+    from src.agents.rag_agent import rag_agent
+
+    log_path = tmp_path / "runs.jsonl"
+    monkeypatch.setenv("LOG_PATH", str(log_path))
+    monkeypatch.setattr(search_tool, "index", TracedEchoIndex())
+    model = TestModel(call_tools=["search_docs"], custom_output_args={"answer": "a", "references": ["x"]})
+
+    async def run():
+        with tool_state(), trace_run("run-1"):
+            tracker = ModelRequestTracker()
+            async for event in rag_agent.run_stream_events("ideal"):
+                tracker.on_event(event)
+
+    with rag_agent.override(model=model):
+        asyncio.run(run())
+
+    spans = _spans(log_path)
+    by_name = {}
+    for record in spans:
+        by_name.setdefault(record["name"], []).append(record)
+    assert {r["run_id"] for r in spans} == {"run-1"}
+    assert len(by_name["model.request"]) == 2
+    assert by_name["index.search"][0]["parent_id"] == by_name["search_docs"][0]["span_id"]
+    assert by_name["encode"][0]["parent_id"] == by_name["index.search"][0]["span_id"]
+    assert "validator.ensure_references_present" in by_name
+
+
+def test_spans_outside_a_run_are_not_logged(monkeypatch, tmp_path):
+    log_path = tmp_path / "runs.jsonl"
+    monkeypatch.setenv("LOG_PATH", str(log_path))
+    with span("orphan"):
+        pass
+    flush_events()
+    assert not log_path.exists()
+
+
+def test_summary_percentiles():
+    spans = [{"name": "encode", "duration_ms": float(ms)} for ms in range(1, 101)]
+    spans.append({"name": "encode", "duration_ms": 500.0, "status": "RuntimeError"})
+    row = summarize_spans(spans)["encode"]
+
+    assert row["count"] == 101 and row["errors"] == 1
+    assert row["p50_ms"] == 51.0
+    assert row["p99_ms"] == 100.0
+    assert row["max_ms"] == 500.0
+    assert percentile([], 50) == 0.0
+
+
+def test_percentile_is_nearest_rank():
+    hundred = [float(v) for v in range(1, 101)]
+    assert (percentile(hundred, 50), percentile(hundred, 95), percentile(hundred, 99)) == (50.0, 95.0, 99.0)
+    assert percentile(hundred, 7) == 7.0  # q * n / 100, not q / 100 * n (7.000000000000001)
+    assert percentile(hundred, 100) == 100.0 and percentile(hundred, 0) == 1.0
+    twenty = [float(v) for v in range(1, 21)]
+    assert (percentile(twenty, 50), percentile(twenty, 95), percentile(twenty, 99)) == (10.0, 19.0, 20.0)
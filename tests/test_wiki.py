@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.tools import wiki as wiki_tool
+from src.tools.state import tool_state
+from src.tools.wiki import CircuitBreaker, SearchWikipediaArgs, WikiClient, search_wikipedia_async
+
+PAYLOAD = {
+    "query": {
+        "search": [
+            {"title": "Monomial ideal", "snippet": 'a <span class="searchmatch">monomial</span> ideal'},
+        ]
+    }
+}
+
+
+class StandInWikipedia(BaseHTTPRequestHandler):
+    hits = 0
+    delay = 0.0
+    status = 200
+
+    def do_GET(self):
+        type(self).hits += 1
+        time.sleep(type(self).delay)
+        body = json.dumps(PAYLOAD).encode("utf-8")
+        self.send_response(type(self).status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def wiki_server():
+    StandInWikipedia.hits, StandInWikipedia.delay, StandInWikipedia.status = 0, 0.0, 200
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInWikipedia)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/w/api.php"
+    server.shutdown()
+
+
+def test_results_are_cleaned_and_cached_on_disk(wiki_server, tmp_path):
+    client = WikiClient(endpoint=wiki_server, cache_path=tmp_path / "wiki.json")
+    results = client.search("monomial ideal")
+    assert results[0]["snippet"] == "a monomial ideal"
+    assert results[0]["url"] == "https://en.wikipedia.org/wiki/Monomial_ideal"
+
+    client.search("Monomial  ideal")
+    WikiClient(endpoint=wiki_server, cache_path=tmp_path / "wiki.json").search("monomial ideal")
+    assert StandInWikipedia.hits == 1
+
+
+def test_timeouts_degrade_and_open_the_breaker(wiki_server):
+    StandInWikipedia.delay = 0.5
+    breaker = CircuitBreaker(failure_threshold=2, reset_after=60)
+    client = WikiClient(endpoint=wiki_server, cache_path=None, timeout=(0.5, 0.1), breaker=breaker)
+
+    for _ in range(2):
+        assert client.search("ideal")[0]["title"] == "Wikipedia search failed"
+    assert breaker.is_open
+
+    started = time.perf_counter()
+    assert client.search("ideal")[0]["title"] == "Wikipedia search unavailable"
+    assert time.perf_counter() - started < 0.05
+    assert StandInWikipedia.hits == 2
+
+
+def test_async_search_runs_off_the_loop_and_records_results(wiki_server, tmp_path, monkeypatch):
+    StandInWikipedia.delay = 0.3
+    monkeypatch.setattr(wiki_tool, "_client", WikiClient(endpoint=wiki_server, cache_path=tmp_path / "wiki.json"))
+
+    async def scenario():
+        with tool_state() as state:
+            started = time.perf_counter()
+            first, second = await asyncio.gather(
+                search_wikipedia_async(SearchWikipediaArgs(query="monomial ideal")),
+                search_wikipedia_async(SearchWikipediaArgs(query="hilbert polynomial")),
+            )
+            return first, second, time.perf_counter() - started, state.wiki_results
+
+    first, second, elapsed, recorded = asyncio.run(scenario())
+    assert first[0]["title"] == second[0]["title"] == "Monomial ideal"
+    assert elapsed < 0.55  # the two HTTP calls overlapped in worker threads
+    assert recorded[0]["title"] == "Monomial ideal"  # the tool state keeps the last results for the validator
+    assert StandInWikipedia.hits == 2 and (tmp_path / "wiki.json").exists()